@@ -0,0 +1,67 @@
+"""
+An asyncio event loop that lives as long as the lambda instance.
+
+asyncio.run() creates a loop and closes it when done, taking any connections clients opened on it
+with it.  Lambda reuses the process for warm invocations so running coroutines on a loop kept at
+module level lets clients keep their connection pools between invocations.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Coroutine
+
+
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def loop() -> asyncio.AbstractEventLoop:
+    global _loop
+
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        # For libraries that call asyncio.get_event_loop() when creating clients
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run(coro: Coroutine):
+    """Run the coroutine to completion on the persistent loop and return its result."""
+    return loop().run_until_complete(coro)
+
+
+async def gather(*aws: Awaitable, limit: int | None = None, return_exceptions: bool = False):
+    """
+    asyncio.gather() with at most limit awaitables running at once, e.g. to not exceed a
+    client's connection pool.  Results are in the order given.
+    """
+    if limit is None:
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw: Awaitable):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *(bounded(aw) for aw in aws),
+        return_exceptions=return_exceptions,
+    )
+
+
+def close():
+    """Close the loop, e.g. at the end of tests.  The next run() creates a new one."""
+    global _loop
+
+    if _loop is None or _loop.is_closed():
+        return
+
+    # Like asyncio.run(), cancel what's still running, e.g. an ASGI app's lifespan.
+    if tasks := asyncio.all_tasks(_loop):
+        for task in tasks:
+            task.cancel()
+        _loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    _loop.run_until_complete(_loop.shutdown_asyncgens())
+    _loop.close()
+    _loop = None
+    asyncio.set_event_loop(None)
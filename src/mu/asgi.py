@@ -0,0 +1,182 @@
+"""
+Run ASGI apps for API Gateway HTTP API (v2) and function URL events, which have the same payload.
+
+See: https://asgi.readthedocs.io/en/latest/specs/www.html
+"""
+
+import asyncio
+import base64
+from collections.abc import Callable, Iterable
+import logging
+
+from mu import responses
+
+
+log = logging.getLogger(__name__)
+
+asgi_version = {'version': '3.0', 'spec_version': '2.3'}
+
+
+class LifespanFailed(Exception):
+    pass
+
+
+def scope(event: dict, context, state: dict | None = None) -> dict:
+    """The ASGI HTTP connection scope for the event"""
+    http = event['requestContext']['http']
+    headers = event.get('headers') or {}
+
+    # Payload v2 moves cookies out of the headers
+    header_items = list(headers.items())
+    if cookies := event.get('cookies'):
+        header_items.append(('cookie', '; '.join(cookies)))
+
+    host, _, port = headers.get('host', '').partition(':')
+    scheme = headers.get('x-forwarded-proto', 'https')
+    port = port or headers.get('x-forwarded-port') or ('443' if scheme == 'https' else '80')
+
+    return {
+        'type': 'http',
+        'asgi': asgi_version,
+        'http_version': http.get('protocol', 'HTTP/1.1').split('/')[-1],
+        'method': http['method'],
+        'scheme': scheme,
+        'path': http['path'],
+        'raw_path': event['rawPath'].encode(),
+        'query_string': event.get('rawQueryString', '').encode(),
+        'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in header_items],
+        'client': (http.get('sourceIp', ''), 0),
+        'server': (host, int(port)),
+        # Shallow copy per the lifespan spec so requests can't change the app's state
+        'state': dict(state or {}),
+        'aws.event': event,
+        'aws.context': context,
+    }
+
+
+def request_body(event: dict) -> bytes:
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        return base64.b64decode(body)
+    return body.encode()
+
+
+class HTTPCycle:
+    """One request to the app and the response it sends back."""
+
+    def __init__(self, scope: dict, body: bytes):
+        self.scope = scope
+        self.body = body
+        self.request_sent = False
+        self.status = 500
+        self.headers: list[tuple[bytes, bytes]] = []
+        self.chunks: list[bytes] = []
+        self.complete = asyncio.Event()
+
+    async def receive(self) -> dict:
+        if not self.request_sent:
+            self.request_sent = True
+            return {'type': 'http.request', 'body': self.body, 'more_body': False}
+
+        # Nothing else will arrive.  Apps waiting for a disconnect get one after they respond.
+        await self.complete.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message: dict):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            self.headers = list(message.get('headers', []))
+        elif message['type'] == 'http.response.body':
+            self.chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                self.complete.set()
+
+    async def run(self, app: Callable):
+        await app(self.scope, self.receive, self.send)
+        self.complete.set()
+
+    def response(self, **kwargs) -> dict:
+        headers = [
+            (name.decode('latin-1'), value.decode('latin-1')) for name, value in self.headers
+        ]
+        return responses.response(
+            self.status,
+            headers,
+            b''.join(self.chunks),
+            self.scope['aws.event'].get('headers'),
+            **kwargs,
+        )
+
+
+async def response(
+    app: Callable,
+    event: dict,
+    context,
+    *,
+    state: dict | None = None,
+    base64_content_types: Iterable[str] = responses.base64_content_types,
+    compression: responses.Compression | None = None,
+) -> dict:
+    """Run the app for the event and return the response in the payload v2 format."""
+    cycle = HTTPCycle(scope(event, context, state), request_body(event))
+    await cycle.run(app)
+    return cycle.response(base64_content_types=base64_content_types, compression=compression)
+
+
+class Lifespan:
+    """
+    The ASGI lifespan protocol.  Startup is run once, e.g. during the lambda's init phase, so
+    the app's connection pools and other setup are shared by all invocations.  Lambda doesn't
+    tell the function when an instance is shut down so shutdown() is for local use and tests.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+        # Given to the app in the lifespan scope, shallow copies go in each request's scope.
+        self.state: dict = {}
+        self.started = False
+        self.supported = True
+        self.task: asyncio.Task | None = None
+        self.to_app: asyncio.Queue | None = None
+        self.from_app: asyncio.Queue | None = None
+
+    async def main(self):
+        scope = {'type': 'lifespan', 'asgi': asgi_version, 'state': self.state}
+        try:
+            await self.app(scope, self.to_app.get, self.from_app.put)
+        except Exception as e:
+            # Apps that don't support lifespan raise for the scope type, which is allowed.
+            if not self.started:
+                log.info(f'ASGI app does not support lifespan: {e!r}')
+                self.supported = False
+            else:
+                log.exception('ASGI lifespan raised an exception')
+        finally:
+            # Unblock whoever is waiting on the app
+            await self.from_app.put({'type': 'lifespan.ended'})
+
+    async def event(self, message_type: str):
+        await self.to_app.put({'type': message_type})
+        message = await self.from_app.get()
+        if message['type'].endswith('.failed'):
+            raise LifespanFailed(f'{message_type}: {message.get("message", "")}')
+        return message
+
+    async def startup(self):
+        if self.started:
+            return
+
+        self.to_app = asyncio.Queue()
+        self.from_app = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self.main())
+        await self.event('lifespan.startup')
+        self.started = True
+
+    async def shutdown(self):
+        if not self.started or not self.supported:
+            return
+
+        await self.event('lifespan.shutdown')
+        await self.task
+        self.started = False
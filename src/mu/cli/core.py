@@ -5,7 +5,7 @@ import click
 
 import mu.config
 from mu.config import Config, default_env, load
-from mu.libs import auth, logs, sqs, sts, utils
+from mu.libs import auth, importtime, logs, rollout, sqs, sts, utils
 from mu.libs.lamb import Lambda
 from mu.libs.status import Status
 
@@ -69,35 +69,73 @@ def config(ctx: click.Context, target_env: str, resolve_env: bool):
     utils.print_dict(config.for_print(resolve_env))
 
 
+def rollout_options(click_func):
+    click.option(
+        '--continue-on-error',
+        is_flag=True,
+        help="Don't cancel environments that haven't started when one fails",
+    )(click_func)
+    click.option(
+        '--parallel',
+        default=1,
+        type=click.IntRange(min=1),
+        help='How many environments to work on at once',
+    )(click_func)
+    return click_func
+
+
+def run_rollout(call, envs: list[str], parallel: int, continue_on_error: bool):
+    results = rollout.run(call, envs, parallel=parallel, fail_fast=not continue_on_error)
+
+    if len(envs) > 1:
+        print(rollout.summary(results))
+
+    try:
+        rollout.check(results)
+    except rollout.EnvFailed as e:
+        raise click.ClickException(str(e)) from e
+
+
 @cli.command()
 @click.argument('envs', nargs=-1)
+@rollout_options
 @click.pass_context
-def provision(ctx: click.Context, envs: list[str]):
+def provision(ctx: click.Context, envs: list[str], parallel: int, continue_on_error: bool):
     """Provision lambda function in environment given (or default)"""
-    envs = envs or [None]
+    configs = {config.env: config for config in map(ctx.obj['load_config'], envs or [None])}
 
-    for env in envs:
-        lamb = Lambda(ctx.obj['load_config'](env))
-        lamb.provision()
+    def provision_env(env: str):
+        Lambda(configs[env]).provision()
+
+    run_rollout(provision_env, list(configs), parallel, continue_on_error)
 
 
 @cli.command()
 @click.argument('envs', nargs=-1)
 @click.option('--build', is_flag=True)
+@rollout_options
 @click.pass_context
-def deploy(ctx: click.Context, envs: list[str], build: bool):
+def deploy(
+    ctx: click.Context,
+    envs: list[str],
+    build: bool,
+    parallel: int,
+    continue_on_error: bool,
+):
     """Deploy local image to ecr, update lambda"""
     envs = envs or [mu.config.default_env()]
 
-    configs = [ctx.obj['load_config'](env) for env in envs]
+    configs = {env: ctx.obj['load_config'](env) for env in envs}
 
     if build:
-        service_names = [config.compose_service for config in configs]
+        service_names = [config.compose_service for config in configs.values()]
         utils.compose_build(*service_names)
 
-    for config in configs:
-        lamb = Lambda(config)
-        lamb.deploy(config.env)
+    def deploy_env(env: str):
+        config = configs[env]
+        Lambda(config).deploy(config.env)
+
+    run_rollout(deploy_env, list(configs), parallel, continue_on_error)
 
 
 @cli.command()
@@ -213,6 +251,47 @@ def domain_name(ctx: click.Context, target_env: str, action: str):
     raise RuntimeError(f'Unhandled action: {action}')
 
 
+@cli.command()
+@click.argument('target_env', required=False)
+@click.option('--module', help='Module to import, defaults to the handler in the image CMD')
+@click.option('--subprocess', 'in_subprocess', is_flag=True, help='Use this python, not the image')
+@click.option('--depth', default=4, help='Levels of the import tree to show')
+@click.option('--min-ms', default=1.0, help='Hide imports faster than this')
+@click.option('--json', 'as_json', is_flag=True)
+@click.pass_context
+def profile_import(
+    ctx: click.Context,
+    target_env: str | None,
+    module: str | None,
+    in_subprocess: bool,
+    depth: int,
+    min_ms: float,
+    as_json: bool,
+):
+    """Profile imports of the lambda handler with -X importtime"""
+    config: Config = ctx.obj['load_config'](target_env)
+
+    if not module:
+        # The handler module is the same whether it's imported in the image or a subprocess
+        try:
+            module = importtime.image_handler_module(config.image_name)
+        except ValueError as e:
+            ctx.fail(f'{e}.  Give the handler module with --module.')
+
+    if in_subprocess:
+        output = importtime.run_subprocess(module)
+    else:
+        output = importtime.run_container(config.image_name, module)
+
+    root = importtime.find(importtime.parse(output), module)
+    min_us = int(min_ms * 1000)
+
+    if as_json:
+        print(importtime.report_json(root, min_us))
+    else:
+        print(importtime.report(root, depth, min_us))
+
+
 @cli.command()
 @click.argument('target_env', required=False)
 @click.pass_context
@@ -50,14 +50,21 @@ class Config:
     app_runner_cpus: str | None = None
     app_runner_memory: str | None = None
     aws_config: dict = field(default_factory=dict)
+    task_queues: list[str] = field(default_factory=list)
+    tasks_bucket: bool = False
+    tasks_results: bool = False
     _project_ident: str = ''
     lambda_name: str = 'func'
     lambda_memory: int = 0  # MB
     lambda_timeout: int = 0  # secs
+    _lambda_alias: str | None = None
+    lambda_provisioned_concurrency: int = 0
+    lambda_url_streaming: bool = False
     aws_region: str | None = None
     aws_acct_id: str | None = None
     _deployed_env: dict[str, str] = field(default_factory=dict)
     event_rules: dict[str, dict[str, str]] = field(default_factory=dict)
+    keep_warm: dict = field(default_factory=dict)
     policy_arns: list[str] = field(default_factory=list)
     vpc_subnet_names: list[str] = field(default_factory=list)
     vpc_subnet_name_tag_key: str = 'Name'
@@ -99,6 +106,11 @@ class Config:
     def image_name(self):
         return slug(self._image_name or self.project_ident)
 
+    @property
+    def lambda_alias(self) -> str | None:
+        # Provisioned concurrency has to be on a version or alias, not $LATEST.
+        return self._lambda_alias or ('live' if self.lambda_provisioned_concurrency else None)
+
     @property
     def role_arn(self):
         return f'arn:aws:iam::{self.aws_acct_id}:role/{self.resource_ident}'
@@ -118,6 +130,36 @@ class Config:
     def sqs_resource(self):
         return f'arn:aws:sqs:{self.aws_region}:{self.aws_acct_id}:{self.resource_ident}-*'
 
+    def sqs_queue_arn(self, name: str):
+        return f'arn:aws:sqs:{self.aws_region}:{self.aws_acct_id}:{self.resource_ident}-{name}'
+
+    @property
+    def invoke_arn(self):
+        """What the function URL, event rules, and task queues invoke."""
+        if self.lambda_alias:
+            return f'{self.function_arn}:{self.lambda_alias}'
+        return self.function_arn
+
+    @property
+    def tasks_bucket_name(self):
+        # Bucket names are global, the account id keeps them unique.
+        return f'{self.resource_ident}-{self.aws_acct_id}'
+
+    @property
+    def tasks_bucket_arn(self):
+        return f'arn:aws:s3:::{self.tasks_bucket_name}'
+
+    @property
+    def tasks_results_table(self):
+        return f'{self.resource_ident}-task-results'
+
+    @property
+    def tasks_results_table_arn(self):
+        return (
+            f'arn:aws:dynamodb:{self.aws_region}:{self.aws_acct_id}'
+            f':table/{self.tasks_results_table}'
+        )
+
     @property
     def api_invoke_stmt_id(self):
         return f'{self.resource_ident}-api-invoke'
@@ -125,6 +167,18 @@ class Config:
     def aws_configs(self, kind: str):
         return self.aws_config.get(kind, {})
 
+    @property
+    def sqs_configs(self) -> dict:
+        """SQS queues from the aws config plus the task queues"""
+        sqs_configs = self.aws_configs('sqs')
+        # The lambda consumes the task queues, which requires the queue's visibility timeout to be
+        # at least as long as the function's timeout.
+        task_queues = {
+            name: {'VisibilityTimeout': str(self.lambda_timeout)} | sqs_configs.get(name, {})
+            for name in self.task_queues
+        }
+        return sqs_configs | task_queues
+
     def resolve_env(self, env_val: str):
         if env_val is False:
             return ''
@@ -143,13 +197,22 @@ class Config:
         return self.deployed_env_gen(True)
 
     def deployed_env_gen(self, resolve: bool):
-        return {
-            name: self.resolve_env(val) if resolve else val
-            for name, val in self._deployed_env.items()
-        } | {
+        mu_env = {
             'MU_ENV': self.env,
             'MU_RESOURCE_IDENT': self.resource_ident,
         }
+        if self.lambda_url_streaming:
+            mu_env['MU_URL_STREAMING'] = 'true'
+        if self.tasks_bucket:
+            mu_env['MU_TASKS_BUCKET'] = self.tasks_bucket_name
+        if self.tasks_results:
+            mu_env['MU_TASKS_RESULTS'] = 'dynamodb'
+            mu_env['MU_TASKS_RESULTS_TABLE'] = self.tasks_results_table
+
+        return {
+            name: self.resolve_env(val) if resolve else val
+            for name, val in self._deployed_env.items()
+        } | mu_env
 
     def for_print(self, resolve_env):
         config = asdict(self)
@@ -163,6 +226,9 @@ class Config:
         config['project_ident'] = self.project_ident
         del config['_project_ident']
 
+        config['lambda_alias'] = self.lambda_alias
+        del config['_lambda_alias']
+
         config['lambda_ident'] = self.lambda_ident
         config['resource_ident'] = self.resource_ident
         config['role_arn'] = self.role_arn
@@ -209,10 +275,22 @@ def load(start_at: Path, env: str, mu_fpath: Path | None = None) -> Config:
         action_key=deep_get(config, key_prefix, 'lambda-action-key', default='do-action'),
         _deployed_env=deep_get(config, key_prefix, 'deployed-env', default={}),
         event_rules=deep_get(config, key_prefix, 'event-rules', default={}),
+        keep_warm=deep_get(config, key_prefix, 'keep-warm', default={}),
         lambda_memory=deep_get(config, key_prefix, 'lambda-memory', default=2048),
         lambda_timeout=deep_get(config, key_prefix, 'lambda-timeout', default=900),
+        _lambda_alias=deep_get(config, key_prefix, 'lambda-alias'),
+        lambda_url_streaming=deep_get(config, key_prefix, 'lambda-url-streaming', default=False),
+        lambda_provisioned_concurrency=deep_get(
+            config,
+            key_prefix,
+            'lambda-provisioned-concurrency',
+            default=0,
+        ),
         policy_arns=deep_get(config, key_prefix, 'policy-arns', default=()),
         aws_config=deep_get(config, key_prefix, 'aws', default={}),
+        task_queues=deep_get(config, key_prefix, 'task-queues', default=()),
+        tasks_bucket=deep_get(config, key_prefix, 'tasks-bucket', default=False),
+        tasks_results=deep_get(config, key_prefix, 'tasks-results', default=False),
         compose_service=deep_get(config, key_prefix, 'compose-service', default='app'),
         vpc_subnet_names=deep_get(config, key_prefix, 'vpc-subnet-names', default=()),
         vpc_subnet_name_tag_key=deep_get(
@@ -1,49 +1,258 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+import inspect
+import json
 import logging
 import os
+import time
 
-import awsgi2
-
+from mu import metrics, responses, streaming
+from mu.libs import concurrent
 import mu.tasks
 
 
 log = logging.getLogger(__name__)
 
-base64_content_types = {
-    'application/octet-stream',
-    'image/jpeg',
-    'image/png',
-    'image/x-icon',
-    'application/pdf',
-    'application/vnd.ms-fontobject',
-    'application/x-font-ttf',
-    'font/ttf',
-    'application/font-woff',
-    'font/woff',
-    'font/woff2',
-}
+
+@dataclass(frozen=True)
+class EventType:
+    name: str
+    # A top level key events of this type have
+    key: str
+    # Name of the ActionHandler method called with (event, context)
+    method: str
+    # Further check for events with the key, e.g. when several types share it
+    check: Callable[[dict], bool] | None = None
+
+
+def records_from(source: str) -> Callable[[dict], bool]:
+    def check(event: dict):
+        return bool(event['Records']) and event['Records'][0].get('eventSource') == source
+
+    return check
+
+
+# Checked in order.  Events that aren't any of these are actions.
+event_types = (
+    EventType('task', 'task-path', 'task_event'),
+    # API Gateway HTTP API (v2) and function URL payloads
+    EventType('http', 'rawPath', 'http_event'),
+    EventType('sqs', 'Records', 'sqs_records', records_from('aws:sqs')),
+    EventType('s3', 'Records', 's3_records', records_from('aws:s3')),
+    EventType('eventbridge', 'detail-type', 'eventbridge_event'),
+)
+
+action_event_type = EventType('action', '', 'action_event')
 
 
 class ActionHandler:
     # TODO: create method that will list all possible actions
     wsgi_app = None
-    base64_content_types = base64_content_types
+    # Used instead of wsgi_app when set
+    asgi_app = None
+    # Content types, or patterns like image/*, of response bodies to base64 encode
+    base64_content_types: tuple[str, ...] = responses.base64_content_types
+    # Set to responses.Compression() to compress responses clients accept compressed
+    compression: responses.Compression | None = None
+    action_key = 'do-action'
+    # Services to create task clients for during warmup, e.g. ('lambda', 'sqs')
+    warmup_clients: tuple[str, ...] = ()
+    # Event key sent by the keep-warm rule, the value is how many instances to keep warm
+    keep_warm_key = 'mu-keep-warm'
+    # Each instance pinged is kept busy this long so the pings overlap and need separate instances
+    keep_warm_hold_secs = 0.1
+    event_types: tuple[EventType, ...] = event_types
+    # Per-invocation metrics are emitted here when set, e.g. to metrics.StdoutSink().  Off by
+    # default since CloudWatch bills for the custom metrics.
+    metrics_sink: metrics.Sink | None = None
+    metrics_namespace = 'mu'
+
+    @classmethod
+    def run_warmup(cls):
+        """
+        Warm up this class once per lambda instance.  Called by the first on_event() if not before.
+        Call it in the handler module, after defining the entry handler, to have it done during
+        the init phase: work done then isn't billed to the first request and, with provisioned
+        concurrency, is done before any requests arrive.
+        """
+        # From the class's own dict so warming up a base class doesn't count for its subclasses
+        if cls.__dict__.get('_warmed'):
+            return
+        cls._warmed = True
+
+        # Only in lambda, not when the handler is called by tests or scripts
+        if not os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE'):
+            return
+
+        start = time.perf_counter()
+        try:
+            cls.warmup()
+        except Exception:
+            # Whatever failed will be retried when it's needed by an invocation
+            log.exception('ActionHandler.warmup() caught an unhandled exception')
+            return
+
+        log.info(f'ActionHandler warmup: {(time.perf_counter() - start) * 1000:.0f}ms')
+
+    @classmethod
+    def warmup(cls):
+        """
+        Called during the lambda's init phase.  Override to do other expensive setup, e.g. priming
+        a database connection pool, and call super().
+        """
+        if cls.asgi_app:
+            cls.asgi_lifespan()
+        elif cls.wsgi_app:
+            import awsgi2.wsgienv  # noqa: F401
+
+        for service in cls.warmup_clients:
+            mu.tasks.client(service)
 
     @classmethod
     def on_event(cls, event, context):
         """The entry point for AWS lambda"""
-        try:
-            keys = set(event.keys())
-            wsgi_keys = {'headers', 'requestContext', 'routeKey', 'rawPath'}
-            if wsgi_keys.issubset(keys) and cls.wsgi_app:
-                return cls.wsgi(event, context)
+        # Only the class receiving events is warmed up, not the bases it's derived from
+        if not cls.__dict__.get('_warmed'):
+            cls.run_warmup()
 
-            if {'task-path', 'args', 'kwargs'}.issubset(keys):
-                mu.tasks.call_task(event)
-                return 'Called task'
+        # Before anything else the event needs so keep-warm pings cost as little as possible
+        if cls.keep_warm_key in event:
+            return cls.keep_warm(event, context)
 
-            return cls.on_action('do-action', event, context)
+        start = time.perf_counter()
+        event_type = None
+        error = False
+        try:
+            event_type, method = cls.dispatch(event)
+            return method(event, context)
         except Exception as e:
+            error = True
             return cls.handle_exception(e, event, context)
+        finally:
+            cls.record_metrics(event_type, event, context, time.perf_counter() - start, error)
+
+    @classmethod
+    def record_metrics(
+        cls,
+        event_type: EventType | None,
+        event: dict,
+        context,
+        duration_secs: float,
+        error: bool,
+    ):
+        if cls.metrics_sink is None:
+            return
+
+        try:
+            name = None
+            properties = {}
+            if event_type is None:
+                # dispatch() failed
+                type_name = 'unknown'
+            else:
+                type_name = event_type.name
+                if event_type is action_event_type:
+                    name = event.get(cls.action_key)
+                elif event_type.name == 'task':
+                    name = event.get('task-path')
+                elif event_type.name == 'http':
+                    # Too many distinct values to be a dimension
+                    properties['path'] = event.get('rawPath')
+
+            if request_id := getattr(context, 'aws_request_id', None):
+                properties['requestId'] = request_id
+
+            record = metrics.invocation(
+                cls.metrics_namespace,
+                type_name,
+                name,
+                duration_secs,
+                context,
+                error=error,
+                properties=properties,
+            )
+            cls.metrics_sink.emit(record)
+        except Exception:
+            # Metrics never fail the invocation
+            log.exception('ActionHandler.record_metrics() caught an unhandled exception')
+
+    @classmethod
+    def register_event_type(cls, event_type: EventType):
+        """
+        Handle another type of event, in this class and its subclasses.  It's checked before those
+        already registered.
+        """
+        cls._registered_types = (event_type, *cls.__dict__.get('_registered_types', ()))
+
+        # Subclasses defined already may have built their tables
+        classes = [cls]
+        while classes:
+            klass = classes.pop()
+            klass._dispatch = None
+            classes.extend(klass.__subclasses__())
+
+    @classmethod
+    def dispatch_table(cls) -> tuple[dict[str, list[tuple]], tuple]:
+        """
+        Event key -> [(event type, method), ...] for the event types and the (event type, method)
+        for actions.  Built once per class, on first use, and again after an event type is
+        registered on it or a base.
+        """
+        # From the class's own dict so a subclass doesn't use its parent's table
+        if (table := cls.__dict__.get('_dispatch')) is None:
+            # Registered on the class or its bases, the class's own first
+            registered = [
+                event_type
+                for klass in cls.__mro__
+                for event_type in klass.__dict__.get('_registered_types', ())
+            ]
+
+            by_key: dict[str, list[tuple]] = {}
+            for event_type in (*registered, *cls.event_types):
+                method = getattr(cls, event_type.method)
+                by_key.setdefault(event_type.key, []).append((event_type, method))
+
+            table = cls._dispatch = (
+                by_key,
+                (action_event_type, getattr(cls, action_event_type.method)),
+            )
+        return table
+
+    @classmethod
+    def dispatch(cls, event: dict) -> tuple[EventType, Callable]:
+        """The event's type and the method that handles it"""
+        by_key, action = cls.dispatch_table()
+        for key, handlers in by_key.items():
+            if key in event:
+                for event_type, method in handlers:
+                    if event_type.check is None or event_type.check(event):
+                        return event_type, method
+        return action
+
+    @classmethod
+    def unhandled_event(cls, event_type: str, event, context):
+        msg = f'No handler for {event_type} events'
+        log.error(msg)
+        return cls.diagnostics(event, context, msg)
+
+    @staticmethod
+    def task_event(event, context):
+        mu.tasks.call_task(event)
+        return 'Called task'
+
+    @classmethod
+    def action_event(cls, event, context):
+        return cls.on_action(cls.action_key, event, context)
+
+    @classmethod
+    def s3_records(cls, event, context):
+        """Override to handle S3 event notifications"""
+        return cls.unhandled_event('s3', event, context)
+
+    @classmethod
+    def eventbridge_event(cls, event, context):
+        """Override to handle EventBridge events, other than the rules mu creates for actions"""
+        return cls.unhandled_event('eventbridge', event, context)
 
     @classmethod
     def handle_exception(cls, e: Exception, event, context):
@@ -57,6 +266,41 @@ class ActionHandler:
     def ping(event, context):
         return 'pong'
 
+    @classmethod
+    def keep_warm(cls, event, context):
+        """
+        Keep the number of instances given by the event warm.  This instance pings the others
+        concurrently and is busy while it waits for them, so each ping lands on its own instance.
+        """
+        count = int(event[cls.keep_warm_key])
+        if count <= 1:
+            time.sleep(cls.keep_warm_hold_secs)
+            return {'warm': 1}
+
+        ping = json.dumps({cls.keep_warm_key: 1})
+        pings = dict.fromkeys(range(count - 1), ())
+
+        def invoke():
+            mu.tasks.client_call(
+                'lambda',
+                'invoke',
+                FunctionName=context.invoked_function_arn,
+                Payload=ping,
+            )
+
+        with concurrent.thread_futures(
+            invoke,
+            pings,
+            max_workers=len(pings),
+            cancel_on_exc=False,
+        ) as results:
+            failed = [result.exc for result in results if result.exc]
+
+        if failed:
+            log.warning(f'Keep warm: {len(failed)} of {len(pings)} pings failed: {failed[0]}')
+
+        return {'warm': count - len(failed)}
+
     @staticmethod
     def diagnostics(event, context, error=None):
         try:
@@ -117,21 +361,141 @@ class ActionHandler:
                 'error': msg,
             }
 
-        # Let users specify actions with dashes but be able to map them to method names
-        # (underscores).
-        action = action.replace('-', '_')
-        if action_method := getattr(cls, action, None):
-            return action_method(event, context)
+        if action_method := cls.action_method(action):
+            result = action_method(event, context)
+            if inspect.iscoroutine(result):
+                # Imported here to keep asyncio out of the cold start of handlers without async
+                # actions.
+                from mu import aio
+
+                # Async actions run on the persistent loop so their clients' connections are
+                # reused by warm invocations.
+                return aio.run(result)
+            return result
+
+        return cls._unknown_action(action.replace('-', '_'), event, context)
+
+    @classmethod
+    def action_method(cls, action: str):
+        # Cached per class.  Only actions found are cached so unknown actions in events can't
+        # grow it.
+        if (actions := cls.__dict__.get('_actions')) is None:
+            actions = cls._actions = {}
+
+        if (method := actions.get(action)) is None:
+            # Let users specify actions with dashes but be able to map them to method names
+            # (underscores).
+            method = getattr(cls, action.replace('-', '_'), None)
+            if method is not None:
+                actions[action] = method
 
-        return cls._unknown_action(action, event, context)
+        return method
+
+    @classmethod
+    def sqs_records(cls, event, context):
+        """
+        Handle each record delivered by an SQS event source mapping with sqs_record().
+
+        Records that fail are reported back so only they get retried, which requires the mapping
+        to have ReportBatchItemFailures enabled.  FIFO queues have to keep message order within a
+        group, so once a record fails, the rest of the batch is reported as failed without being
+        processed.
+        """
+        failures = []
+        for record in event['Records']:
+            msg_id = record['messageId']
+            if failures and record.get('eventSourceARN', '').endswith('.fifo'):
+                failures.append({'itemIdentifier': msg_id})
+                continue
+
+            try:
+                cls.sqs_record(record, context)
+            except Exception:
+                log.exception(
+                    'ActionHandler.sqs_records() caught an unhandled exception',
+                    extra={'messageId': msg_id},
+                )
+                failures.append({'itemIdentifier': msg_id})
+
+        if failures:
+            log.warning(f'SQS batch: {len(failures)} of {len(event["Records"])} records failed')
+
+        return {'batchItemFailures': failures}
+
+    @classmethod
+    def sqs_record(cls, record: dict, context):
+        """
+        Dispatch a single SQS record based on its JSON body: a task payload calls the task and a
+        body with the action key calls the action.  Override to handle other message formats.
+        Raise an exception to have the record retried.
+        """
+        body = json.loads(record['body'])
+
+        if 'task-path' in body:
+            return mu.tasks.call_task(body)
+
+        if action := body.get(cls.action_key):
+            if cls.action_method(action) is None:
+                raise ValueError(f'Action `{action}` could not be found on handler class')
+            return cls.on_action(cls.action_key, body, context)
+
+        raise ValueError(f'Unrecognized SQS message: {record["messageId"]}')
+
+    @classmethod
+    def http_event(cls, event, context):
+        if cls.asgi_app:
+            return cls.asgi(event, context)
+        return cls.wsgi(event, context)
+
+    @classmethod
+    def asgi_lifespan(cls):
+        """The app's lifespan, started on first use.  Startup runs once per lambda instance."""
+        # From the class's own dict so a subclass with another app has its own lifespan
+        if (lifespan := cls.__dict__.get('_lifespan')) is None:
+            from mu import aio, asgi
+
+            lifespan = asgi.Lifespan(cls.asgi_app)
+            aio.run(lifespan.startup())
+            cls._lifespan = lifespan
+        return lifespan
+
+    @classmethod
+    def asgi(cls, event, context):
+        from mu import aio, asgi
+
+        lifespan = cls.asgi_lifespan()
+        # On the persistent loop so the app's connections are reused by warm invocations
+        return aio.run(
+            asgi.response(
+                cls.asgi_app,
+                event,
+                context,
+                state=lifespan.state,
+                base64_content_types=cls.base64_content_types,
+                compression=cls.compression,
+            ),
+        )
 
     @classmethod
     def wsgi(cls, event, context):
-        return awsgi2.response(
-            cls.wsgi_app,
-            event,
-            context,
+        if not cls.wsgi_app:
+            return cls.unhandled_event('http', event, context)
+
+        if streaming.enabled(event):
+            # Sent by mu.runtime as the app produces it
+            return streaming.StreamingResponse(cls.wsgi_app, event, context)
+
+        # Only needed by apps with a wsgi_app.  Imported by warmup() for them.
+        from awsgi2.wsgienv import environ
+
+        status, headers, body = responses.call_wsgi(cls.wsgi_app, environ(event, context))
+        return responses.response(
+            int(status.split()[0]),
+            headers,
+            body,
+            event.get('headers'),
             base64_content_types=cls.base64_content_types,
+            compression=cls.compression,
         )
 
     @staticmethod
@@ -28,12 +28,23 @@ def thread_futures(
     *,
     max_workers: int = 5,
     initializer=None,
+    cancel_on_exc: bool = True,
 ):
     """
     Use concurrent.futures with the process pool executor and enhancements to result processing
     and error handling.
+
+    When cancel_on_exc is False, an exception in one future doesn't cancel the others.  Each
+    failure is yielded as a FutureResult with exc set and processing continues.
     """
-    yield _futures_process(cf.ThreadPoolExecutor, call, call_with, max_workers, initializer)
+    yield _futures_process(
+        cf.ThreadPoolExecutor,
+        call,
+        call_with,
+        max_workers,
+        initializer,
+        cancel_on_exc,
+    )
 
 
 def _futures_process(
@@ -42,6 +53,7 @@ def _futures_process(
     call_with: dict,
     max_workers: int,
     initializer: typing.Callable | None,
+    cancel_on_exc: bool = True,
 ):
     exc = None
     cpe = exec_cls(max_workers=max_workers, initializer=initializer)
@@ -57,6 +69,10 @@ def _futures_process(
                 try:
                     yield FutureResult(ident, future.result())
                 except Exception as e:
+                    if not cancel_on_exc:
+                        yield FutureResult(ident, exc=e)
+                        continue
+
                     exc = e
                     log.error(
                         '\n   >>>>   Unhandled exception detected, cancelling futures..',
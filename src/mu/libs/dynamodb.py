@@ -0,0 +1,47 @@
+import logging
+
+import boto3
+
+
+log = logging.getLogger(__name__)
+
+
+class Tables:
+    def __init__(self, b3_sess: boto3.Session):
+        self.b3_sess = b3_sess
+        self.dynamodb = b3_sess.client('dynamodb')
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.dynamodb.describe_table(TableName=name)
+            return True
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            return False
+
+    def ensure(self, name: str, *, key: str, ttl_attr: str | None = None):
+        """Ensure an on-demand table with a string hash key exists."""
+        if self.exists(name):
+            log.info('DynamoDB table existed: %s', name)
+            return
+
+        self.dynamodb.create_table(
+            TableName=name,
+            AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        log.info('DynamoDB table created: %s', name)
+
+        if ttl_attr:
+            self.dynamodb.get_waiter('table_exists').wait(TableName=name)
+            self.dynamodb.update_time_to_live(
+                TableName=name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': ttl_attr},
+            )
+
+    def delete(self, name: str):
+        try:
+            self.dynamodb.delete_table(TableName=name)
+            log.info('DynamoDB table deleted: %s', name)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            log.info('DynamoDB table not found: %s', name)
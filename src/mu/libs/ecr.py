@@ -1,7 +1,6 @@
 import base64
 import json
 import logging
-import time
 
 import arrow
 from blazeutils.strings import case_us2mc
@@ -9,7 +8,7 @@ import boto3
 import docker
 from methodtools import lru_cache
 
-from . import utils
+from . import utils, waiter
 
 
 log = logging.getLogger(__name__)
@@ -47,6 +46,9 @@ class LocalImage:
     def get(self):
         return self.docker.images.get(self.image_name)
 
+    def entrypoint(self) -> list[str]:
+        return self.get().attrs['Config'].get('Entrypoint') or []
+
     def created_utc(self):
         image = self.get()
         return arrow.get(image.attrs['Created']).to('UTC').format('YYYY-MM-DDTHH.mm.ss')
@@ -137,8 +139,9 @@ class Repo:
             imageManifest=manifest,
         )
 
-    def push(self, image_name: str, *, tag_suffix: str | None = None):
-        tag = self.tag_local(image_name, tag_suffix)
+    def push(self, image_name: str, *, tag_suffix: str | None = None, tag: str | None = None):
+        """Push the local image.  Give tag when the image has already been tagged."""
+        tag = tag or self.tag_local(image_name, tag_suffix)
         repo_tag = self.latest_tag(image_name)
 
         if repo_tag == tag:
@@ -183,6 +186,9 @@ class Repos:
         'ecr:BatchCheckLayerAvailability',
     )
 
+    # How long get(wait=True) waits for a new repo to show up
+    wait_backoff = waiter.Backoff(deadline=10)
+
     def __init__(self, b3_sess: boto3.Session):
         self.aws_region: str = b3_sess.region_name
         self.b3_sess = b3_sess
@@ -195,16 +201,22 @@ class Repos:
     def clear(self):
         self.list.cache_clear()
 
-    def get(self, name, wait=False) -> Repo:
+    def get(self, name, wait=False) -> Repo | None:
         if not wait:
             return self.list().get(name)
 
-        for wait_for in (0.1, 0.25, 0.5, 0.75, 1, 1.25, 1.5):
-            repo = self.list().get(name)
-            if repo:
-                return repo
-            time.sleep(wait_for)
+        def clear_and_get():
             self.clear()
+            return self.list().get(name)
+
+        try:
+            return waiter.wait(
+                clear_and_get,
+                waiting_for=f'repo {name} to be created',
+                backoff=self.wait_backoff,
+            )
+        except waiter.WaitTimeout:
+            return None
 
     @lru_cache()
     def list(self) -> dict[str, Repo]:
@@ -0,0 +1,32 @@
+"""
+Fingerprints of what a deploy would change, e.g. the function's configuration.  They're saved as
+tags on the function so the next deploy can skip the parts that haven't changed.
+"""
+
+import hashlib
+import json
+
+
+tag_prefix = 'mu:fingerprint:'
+
+
+def digest(*parts) -> str:
+    data = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def to_tags(fingerprints: dict[str, str]) -> dict[str, str]:
+    return {f'{tag_prefix}{name}': value for name, value in fingerprints.items()}
+
+
+def from_tags(tags: dict[str, str]) -> dict[str, str]:
+    return {
+        name.removeprefix(tag_prefix): value
+        for name, value in tags.items()
+        if name.startswith(tag_prefix)
+    }
+
+
+def unchanged(desired: dict[str, str], live: dict[str, str]) -> set[str]:
+    """Names of the fingerprints that match what's deployed"""
+    return {name for name, value in desired.items() if live.get(name) == value}
@@ -6,7 +6,7 @@ from typing import Self
 import boto3
 from botocore.exceptions import ClientError
 
-from mu.libs import utils
+from mu.libs import waiter
 
 from ..config import Config
 from . import auth, lamb, sts
@@ -88,16 +88,16 @@ class ACMCerts(AWSRecsCRUD):
             if options and options[0].get('ResourceRecord'):
                 return desc
 
-        cert_data = utils.retry(
-            full_cert_desc,
-            count=60,
-            waiting_for='full cert description',
-        )
-
-        if cert_data is None:
+        try:
+            cert_data = waiter.wait(
+                full_cert_desc,
+                waiting_for='full cert description',
+                backoff=waiter.Backoff(max_delay=2, deadline=60),
+            )
+        except waiter.WaitTimeout as e:
             raise RuntimeError(
                 "Waited 60s for certificate validation but it didn't appear. Try again.",
-            )
+            ) from e
         self._list_recs[rec.ident] = cert = ACMCert.from_aws(cert_data)
         return cert
 
@@ -147,6 +147,19 @@ class GatewayAPIs(AWSRecsCRUD):
             ApiId=rec.ApiId,
         )
 
+    def sync_target(self, rec: GatewayAPI, lambda_arn: str):
+        """Point an existing API at lambda_arn, e.g. when the function's alias has changed."""
+        for integration in self.b3c.get_integrations(ApiId=rec.ApiId)['Items']:
+            if integration['IntegrationUri'] == lambda_arn:
+                continue
+
+            self.b3c.update_integration(
+                ApiId=rec.ApiId,
+                IntegrationId=integration['IntegrationId'],
+                IntegrationUri=lambda_arn,
+            )
+            log.info(f'{self.log_prefix} sync target: integration now invokes {lambda_arn}')
+
 
 @dataclass
 class DomainName(AWSRec):
@@ -242,7 +255,8 @@ class Gateway:
         self.b3_sess = b3_sess or auth.b3_sess(config, testing=testing)
 
         self.domain_name = self.config.domain_name
-        self.lambda_arn = config.function_arn
+        # Qualified by the alias when there is one, so requests use its provisioned concurrency
+        self.lambda_arn = config.invoke_arn
         self.api_name = config.resource_ident
 
         self.acm_certs = ACMCerts(self.b3_sess)
@@ -263,7 +277,7 @@ class Gateway:
 
         self.gw_domains.delete(self.domain_name)
         self.gw_apis.delete(self.config.resource_ident)
-        self.func_perms.delete(self.config.api_invoke_stmt_id, self.config.function_arn)
+        self.func_perms.delete(self.config.api_invoke_stmt_id, self.lambda_arn)
 
         if delete_cert:
             self.acm_certs.delete(self.domain_name)
@@ -285,12 +299,13 @@ class Gateway:
 
         gw_api: GatewayAPI = self.gw_apis.ensure(
             self.config.resource_ident,
-            lambda_arn=self.config.function_arn,
+            lambda_arn=self.lambda_arn,
         )
+        self.gw_apis.sync_target(gw_api, self.lambda_arn)
         log.info(f'  - Api Endpoint: {gw_api.ApiEndpoint}')
 
         # TODO: we could be smarter about only replacing if there is a difference
-        self.func_perms.delete(self.config.api_invoke_stmt_id, self.config.function_arn)
+        self.func_perms.delete(self.config.api_invoke_stmt_id, self.lambda_arn)
         self.func_perms.ensure(
             self.config.api_invoke_stmt_id,
             config=self.config,
@@ -0,0 +1,171 @@
+"""
+Profile module imports with python's -X importtime.  The output is on stderr, one line per module
+in the order imports finish, so a module's imports are listed before it:
+
+    import time: self [us] | cumulative | imported package
+    import time:       120 |        120 |   botocore.compat
+    import time:       611 |     276887 | boto3
+"""
+
+from dataclasses import dataclass, field
+import json
+import re
+import subprocess
+import sys
+
+import docker
+
+from mu.libs import logs
+
+
+log = logs.logger()
+
+# Modules known to be slow to import.  Flagged in the output so they stand out.
+heavy_modules = ('mu.config', 'boto3', 'botocore', 'docker', 'arrow')
+
+line_re = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+@dataclass
+class ImportRec:
+    module: str
+    # microseconds, as reported by importtime
+    self_us: int
+    cumulative_us: int
+    children: list['ImportRec'] = field(default_factory=list)
+
+    @property
+    def flagged(self) -> bool:
+        return self.module in heavy_modules
+
+    @property
+    def cumulative_ms(self) -> float:
+        return self.cumulative_us / 1000
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def for_json(self, min_us: int = 0) -> dict:
+        return {
+            'module': self.module,
+            'self_us': self.self_us,
+            'cumulative_us': self.cumulative_us,
+            'flagged': self.flagged,
+            'children': [
+                child.for_json(min_us) for child in self.ranked() if child.cumulative_us >= min_us
+            ],
+        }
+
+    def ranked(self) -> list['ImportRec']:
+        return sorted(self.children, key=lambda rec: rec.cumulative_us, reverse=True)
+
+
+def parse(output: str) -> list[ImportRec]:
+    """Parse importtime output into trees of imports.  Returns the top level imports."""
+    # depth -> imports finished at that depth that are waiting for their parent
+    pending: dict[int, list[ImportRec]] = {}
+
+    for line in output.splitlines():
+        if not (match := line_re.match(line)):
+            continue
+
+        self_us, cumulative_us, indent, module = match.groups()
+        # Top level imports have one space of indent, each level adds two more.
+        depth = (len(indent) - 1) // 2
+        rec = ImportRec(module, int(self_us), int(cumulative_us), pending.pop(depth + 1, []))
+        pending.setdefault(depth, []).append(rec)
+
+    return pending.get(0, [])
+
+
+def find(roots: list[ImportRec], module: str) -> ImportRec:
+    for root in roots:
+        if root.module == module:
+            return root
+    raise ValueError(f'Import of {module} not found in importtime output')
+
+
+def flagged(root: ImportRec) -> list[ImportRec]:
+    return sorted(
+        (rec for rec in root.walk() if rec.flagged),
+        key=lambda rec: rec.cumulative_us,
+        reverse=True,
+    )
+
+
+def handler_module(cmd: list[str]) -> str:
+    """Module of the lambda handler given in the image's CMD, e.g. ['app.lambda_handler']"""
+    if not cmd:
+        raise ValueError('Image has no CMD to get the handler from')
+    return cmd[0].rsplit('.', 1)[0]
+
+
+def image_handler_module(image_name: str) -> str:
+    try:
+        image = docker.from_env().images.get(image_name)
+    except docker.errors.ImageNotFound:
+        raise ValueError(f'Image not found: {image_name}') from None
+    return handler_module(image.attrs['Config']['Cmd'])
+
+
+def run_container(image_name: str, module: str) -> str:
+    """Import the module in the image and return the importtime output."""
+    output: bytes = docker.from_env().containers.run(
+        image_name,
+        ['-X', 'importtime', '-c', f'import {module}'],
+        entrypoint='python',
+        remove=True,
+        stdout=False,
+        stderr=True,
+    )
+    return output.decode()
+
+
+def run_subprocess(module: str) -> str:
+    """Import the module with this python and return the importtime output."""
+    result = subprocess.run(
+        (sys.executable, '-X', 'importtime', '-c', f'import {module}'),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        log.error(result.stderr)
+        raise RuntimeError(f'Importing {module} failed')
+    return result.stderr
+
+
+def tree_lines(rec: ImportRec, max_depth: int, min_us: int, depth: int = 0):
+    flag = '  <-- heavy' if rec.flagged else ''
+    yield f'{rec.cumulative_ms:9.1f}ms  {"  " * depth}{rec.module}{flag}'
+
+    if depth >= max_depth:
+        return
+
+    for child in rec.ranked():
+        if child.cumulative_us >= min_us:
+            yield from tree_lines(child, max_depth, min_us, depth + 1)
+
+
+def report(root: ImportRec, max_depth: int, min_us: int) -> str:
+    lines = ['Cumulative import time:', *tree_lines(root, max_depth, min_us)]
+
+    if heavy := flagged(root):
+        lines.append('')
+        lines.append('Heavy imports:')
+        lines.extend(f'{rec.cumulative_ms:9.1f}ms  {rec.module}' for rec in heavy)
+
+    return '\n'.join(lines)
+
+
+def report_json(root: ImportRec, min_us: int) -> str:
+    return json.dumps(
+        {
+            'module': root.module,
+            'total_us': root.cumulative_us,
+            'flagged': {rec.module: rec.cumulative_us for rec in flagged(root)},
+            'tree': root.for_json(min_us),
+        },
+        indent=2,
+    )
@@ -1,5 +1,8 @@
 from base64 import b64decode
+import concurrent.futures as cf
+import contextvars
 from dataclasses import dataclass
+import functools
 import io
 import itertools
 import json
@@ -18,7 +21,21 @@ from mu.config import Config
 from mu.libs import gateway
 from mu.libs.aws_recs import AWSRec, AWSRecsCRUD
 
-from . import api_gateway, auth, ec2, ecr, iam, sqs, utils
+from . import (
+    api_gateway,
+    auth,
+    dynamodb,
+    ec2,
+    ecr,
+    fingerprints,
+    iam,
+    s3,
+    sqs,
+    steps,
+    sts,
+    utils,
+    waiter,
+)
 
 
 log = logging.getLogger(__name__)
@@ -70,10 +87,45 @@ class Lambda:
 
     lambda_actions = ('lambda:InvokeFunction',)
 
-    def __init__(self, config: Config, b3_sess: boto3.Session | None = None):
+    tasks_bucket_actions = (
+        's3:GetObject',
+        's3:PutObject',
+        's3:DeleteObject',
+    )
+    tasks_results_actions = (
+        'dynamodb:PutItem',
+        'dynamodb:GetItem',
+        'dynamodb:BatchGetItem',
+        'dynamodb:UpdateItem',
+    )
+
+    # Task payloads that spilled over to S3 get deleted when the task succeeds.  This cleans up
+    # after tasks that never did.
+    tasks_bucket_expire_days = 7
+
+    # Published versions kept when using an alias, including the one the alias points to.  Older
+    # versions are deleted so they don't pile up with every deploy.
+    versions_keep = 3
+
+    # Event rule name suffix for the keep-warm config
+    keep_warm_rule = 'keep-warm'
+
+    # How many provisioning steps run at once
+    provision_workers = 6
+
+    # Polling for the function's update and state.  boto's waiters give up after 300s too.
+    status_backoff = waiter.Backoff(first=0.25, max_delay=2, deadline=300)
+
+    def __init__(
+        self,
+        config: Config,
+        b3_sess: boto3.Session | None = None,
+        *,
+        testing=False,
+    ):
         self.config: Config = config
         self.b3_sess = b3_sess = b3_sess or auth.b3_sess(config.aws_region)
-        config.apply_sess(b3_sess)
+        config.apply_sess(b3_sess, testing=testing)
 
         self.ident = config.lambda_name
         self.image_name = config.image_name
@@ -87,42 +139,92 @@ class Lambda:
             self.event_client.exceptions.ResourceNotFoundException,
         )
         self.exists_exc = (self.lc.exceptions.ResourceConflictException,)
-        self.docker = docker.from_env()
+        # Unit tests mock the AWS clients and don't have docker
+        self.docker = None if testing else docker.from_env()
 
         self.roles = iam.Roles(b3_sess)
         self.repos = ecr.Repos(b3_sess)
         self.apis = api_gateway.APIs(b3_sess)
         self.sqs = sqs.SQS(b3_sess)
+        self.buckets = s3.Buckets(b3_sess)
+        self.tables = dynamodb.Tables(b3_sess)
         self.role_name: str = self.config.resource_ident
         self.gateway = gateway.Gateway(config, b3_sess=b3_sess)
 
-    def provision_role(self):
+    def role_steps(self) -> list[steps.Step]:
         role_name = self.role_name
 
-        # Ensure the role exists and give lambda permission to use it.
-        self.roles.ensure_role(
-            role_name,
-            {'Service': 'lambda.amazonaws.com'},
-            self.config.policy_arns,
+        def ensure_role():
+            # Ensure the role exists and give lambda permission to use it.
+            self.roles.ensure_role(
+                role_name,
+                {'Service': 'lambda.amazonaws.com'},
+                self.config.policy_arns,
+            )
+            # Listed once now instead of by each of the policy steps at the same time
+            self.roles.policies.list()
+
+        policies = {
+            # Give permission to create logs
+            'logs': self.logs_policy,
+            # Give permission to get images from the container registry
+            'ecr-repo': iam.policy_doc(*self.repos.policy_actions, resource=self.config.repo_arn),
+            # Give permission to sqs queues
+            'sqs-queues': iam.policy_doc(*self.sqs_actions, resource=self.config.sqs_resource),
+        }
+
+        # Should be able to invoke our function, and its alias for keep-warm pings
+        invoke_arns = {self.config.function_arn, self.config.invoke_arn}
+        policies['lambda'] = iam.policy_doc(
+            *self.lambda_actions,
+            resource=sorted(invoke_arns) if len(invoke_arns) > 1 else self.config.function_arn,
         )
 
-        # Give permission to create logs
-        self.roles.attach_policy(role_name, 'logs', self.logs_policy)
+        if self.config.tasks_bucket:
+            # Task payloads too big to send directly
+            policies['s3-tasks'] = iam.policy_doc(
+                *self.tasks_bucket_actions,
+                resource=f'{self.config.tasks_bucket_arn}/*',
+            )
 
-        # Give permission to get images from the container registry
-        policy = iam.policy_doc(*self.repos.policy_actions, resource=self.config.repo_arn)
-        self.roles.attach_policy(role_name, 'ecr-repo', policy)
+        if self.config.tasks_results:
+            policies['dynamodb-task-results'] = iam.policy_doc(
+                *self.tasks_results_actions,
+                resource=self.config.tasks_results_table_arn,
+            )
 
-        # Give permission to sqs queues
-        policy = iam.policy_doc(*self.sqs_actions, resource=self.config.sqs_resource)
-        self.roles.attach_policy(role_name, 'sqs-queues', policy)
+        # The attachments are independent of each other, only the role has to exist.
+        return [
+            steps.Step('role', ensure_role),
+            *(
+                steps.Step(
+                    f'policy-{ident}',
+                    functools.partial(self.roles.attach_policy, role_name, ident, policy),
+                    after=('role',),
+                )
+                for ident, policy in policies.items()
+            ),
+            # Needed to create network interfaces and other vpc actions when it joins the vpc.
+            steps.Step(
+                'policy-vpc-access',
+                functools.partial(
+                    self.roles.attach_managed_policy,
+                    role_name,
+                    'AWSLambdaVPCAccessExecutionRole',
+                ),
+                after=('role',),
+            ),
+        ]
 
-        # Needed to create network interfaces and other vpc actions when it joins the vpc.
-        self.roles.attach_managed_policy(role_name, 'AWSLambdaVPCAccessExecutionRole')
+    def run_steps(self, provision_steps: list[steps.Step]):
+        # boto3 sessions aren't thread safe so the steps, which share one, mustn't create clients
+        # from it.  Clients are created with the objects that use them, before the steps run.
+        # The account id is looked up with an STS client so that's done now too.
+        sts.account_id(self.b3_sess)
+        steps.run(provision_steps, max_workers=self.provision_workers)
 
-        # Should be able to invoke our function
-        policy = iam.policy_doc(*self.lambda_actions, resource=self.config.function_arn)
-        self.roles.attach_policy(role_name, 'lambda', policy)
+    def provision_role(self):
+        self.run_steps(self.role_steps())
 
     def provision_repo(self):
         # TODO: can probably remove this once testing is fast enough that we don't need to run
@@ -130,32 +232,57 @@ class Lambda:
         # test_ecr.py.
         self.repos.ensure(self.config.resource_ident, self.config.role_arn)
 
-    def provision_aws_config(self):
-        if sqs_configs := self.config.aws_configs('sqs'):
+    def provision_sqs(self):
+        if sqs_configs := self.config.sqs_configs:
             self.sqs.sync_config(self.config.resource_ident, sqs_configs)
         else:
             self.sqs.delete(self.config.resource_ident)
 
+    def provision_tasks_bucket(self):
+        self.buckets.ensure(
+            self.config.tasks_bucket_name,
+            expire_prefix='tasks/',
+            expire_days=self.tasks_bucket_expire_days,
+        )
+
+    def provision_tasks_results(self):
+        # expires_at is set by mu.tasks.DynamoResults
+        self.tables.ensure(self.config.tasks_results_table, key='id', ttl_attr='expires_at')
+
+    def aws_config_steps(self) -> list[steps.Step]:
+        config_steps = [steps.Step('sqs', self.provision_sqs)]
+        if self.config.tasks_bucket:
+            config_steps.append(steps.Step('tasks-bucket', self.provision_tasks_bucket))
+        if self.config.tasks_results:
+            config_steps.append(steps.Step('tasks-results', self.provision_tasks_results))
+        return config_steps
+
+    def provision_aws_config(self):
+        self.run_steps(self.aws_config_steps())
+
     def provision_app_runner(self):
         pass
 
     def provision(self):
         """Provision AWS dependencies for the lambda function."""
 
-        self.provision_role()
-        self.provision_repo()
-        self.provision_aws_config()
-
+        # None of these depend on each other, except for the policies needing the role.
+        provision_steps = [
+            *self.role_steps(),
+            steps.Step('repo', self.provision_repo),
+            *self.aws_config_steps(),
+        ]
         if self.config.domain_name:
-            self.gateway.provision()
+            provision_steps.append(steps.Step('gateway', self.gateway.provision))
+
+        self.run_steps(provision_steps)
 
         log.info(f'Provision finished for: {self.config.lambda_ident}')
 
-    def ensure_func(self, env_name: str, image_uri: str, func_url: str | None):
+    def function_config(self, func_url: str | None) -> dict:
+        """The function's configuration, other than MU_DEPLOYED_AT which changes every time."""
         func_name = self.config.lambda_ident
 
-        log.info('Deploying lambda function')
-
         vpc_config = {'SubnetIds': [], 'SecurityGroupIds': []}
         # TODO: should also be able to add by subnet ids in config, not just names.
         if subnet_names := self.config.vpc_subnet_names:
@@ -179,11 +306,10 @@ class Lambda:
             log.info('Assigning security groups: %s - %s', ','.join(sec_group_names), group_ids)
 
         env_vars = self.config.deployed_env
-        env_vars['MU_DEPLOYED_AT'] = arrow.get().isoformat()
         if func_url:
             env_vars['MU_FUNC_URL'] = func_url
 
-        shared_config = {
+        return {
             'FunctionName': func_name,
             'Role': self.config.role_arn,
             'Timeout': self.config.lambda_timeout,
@@ -199,34 +325,45 @@ class Lambda:
             },
         }
 
-        try:
-            response = self.lc.create_function(
-                PackageType='Image',
-                Code={'ImageUri': image_uri},
-                **shared_config,
-            )
-            log.info('Lambda function created')
-        except self.exists_exc:
-            try:
-                response = self.lc.update_function_configuration(**shared_config)
-                self.wait_updated(func_name)
-
-                self.lc.update_function_code(
-                    FunctionName=func_name,
-                    ImageUri=image_uri,
-                )
+    def deployed_config(self, func_config: dict) -> dict:
+        """The function config as sent to AWS, i.e. with MU_DEPLOYED_AT"""
+        env_vars = func_config['Environment']['Variables']
+        return {
+            **func_config,
+            'Environment': {
+                # Only changes when the configuration does, see deploy()
+                'Variables': env_vars | {'MU_DEPLOYED_AT': arrow.get().isoformat()},
+            },
+        }
 
-                log.info('Lambda function updated')
+    def create_func(self, image_uri: str, func_config: dict):
+        self.lc.create_function(
+            PackageType='Image',
+            Code={'ImageUri': image_uri},
+            **self.deployed_config(func_config),
+        )
+        log.info('Lambda function created')
 
-            except self.lc.exceptions.InvalidParameterValueException as e:
-                # TODO: don't need this if not doing zips
-                needle = "don't provide ImageUri when updating a function with packageType Zip"
-                if needle not in str(e):
-                    raise
+    def update_func_config(self, func_config: dict):
+        self.lc.update_function_configuration(**self.deployed_config(func_config))
+        # The code can't be updated until the configuration update is done
+        self.wait_updated(self.config.lambda_ident)
+        log.info('Lambda function configuration updated')
 
-                raise RuntimeError("Existing function is Zip type, can't update.") from e
+    def update_func_code(self, image_uri: str):
+        try:
+            self.lc.update_function_code(
+                FunctionName=self.config.lambda_ident,
+                ImageUri=image_uri,
+            )
+            log.info('Lambda function code updated')
+        except self.lc.exceptions.InvalidParameterValueException as e:
+            # TODO: don't need this if not doing zips
+            needle = "don't provide ImageUri when updating a function with packageType Zip"
+            if needle not in str(e):
+                raise
 
-        return response['FunctionArn']
+            raise RuntimeError("Existing function is Zip type, can't update.") from e
 
     def delete_permissions(self, func_name):
         """TODO: this never deletes permissions.  Maybe b/c the lambda is already deleted?"""
@@ -265,22 +402,28 @@ class Lambda:
         except self.not_found_exc:
             log.info(f'Lambda function not found: {lambda_name}')
 
-        for rule_ident in self.config.event_rules:
-            rule_name = f'{lambda_name}-{rule_ident}'
+        self.delete_task_queue_mappings()
 
-            try:
-                self.event_client.remove_targets(Rule=rule_name, Ids=['lambda-func'])
+        rule_names = [f'{lambda_name}-{rule_ident}' for rule_ident in self.config.event_rules]
+        # Whether or not keep-warm is still configured
+        rule_names.append(f'{resource_ident}-{self.keep_warm_rule}')
+
+        for rule_name in rule_names:
+            if self.delete_event_rule(rule_name):
                 log.info(f'Event target deleted: {rule_name}')
-            except self.not_found_exc:
+            else:
                 log.info(f'Event target not found: {rule_name}')
 
-            # No exception thrown if the rule doesn't exist.
-            self.event_client.delete_rule(Name=rule_name)
-
         self.roles.delete(resource_ident)
         # self.apis.delete(resource_ident)
         self.sqs.delete(resource_ident)
 
+        if self.config.tasks_bucket:
+            self.buckets.delete(self.config.tasks_bucket_name)
+
+        if self.config.tasks_results:
+            self.tables.delete(self.config.tasks_results_table)
+
         try:
             self.lc.delete_function_url_config(FunctionName=lambda_name)
             log.info('Function URL config deleted')
@@ -294,44 +437,104 @@ class Lambda:
         else:
             log.info(f'Repository not found: {resource_ident}')
 
+    def task_queue_mappings(self, func_arn: str):
+        """Have the function consume the task queues."""
+        for name in self.config.task_queues:
+            queue_arn = self.config.sqs_queue_arn(name)
+            resp = self.lc.list_event_source_mappings(EventSourceArn=queue_arn)
+            if mappings := resp['EventSourceMappings']:
+                mapping = mappings[0]
+                if mapping['FunctionArn'] != func_arn:
+                    # e.g. an alias was configured after the mapping was created
+                    self.lc.update_event_source_mapping(UUID=mapping['UUID'], FunctionName=func_arn)
+                    log.info('Task queue mapping updated: %s', name)
+                else:
+                    log.info('Task queue mapping existed: %s', name)
+                continue
+
+            self.lc.create_event_source_mapping(
+                EventSourceArn=queue_arn,
+                FunctionName=func_arn,
+                BatchSize=10,
+                # Let ActionHandler.sqs_records() report which records failed so the rest of the
+                # batch isn't retried.
+                FunctionResponseTypes=['ReportBatchItemFailures'],
+            )
+            log.info('Task queue mapping created: %s', name)
+
+    def delete_task_queue_mappings(self):
+        for name in self.config.task_queues:
+            queue_arn = self.config.sqs_queue_arn(name)
+            resp = self.lc.list_event_source_mappings(EventSourceArn=queue_arn)
+            for mapping in resp['EventSourceMappings']:
+                self.lc.delete_event_source_mapping(UUID=mapping['UUID'])
+                log.info('Task queue mapping deleted: %s', name)
+
     def event_rules(self, env_name, func_arn):
         name_prefix = self.config.resource_ident
         for rule_ident, config in self.config.event_rules.items():
             rule_name = f'{name_prefix}-{rule_ident}'
-            log.info('Adding event schedule: %s', rule_name)
+            self.event_rule(rule_name, config, {'do-action': config['action']}, func_arn)
+
+        rule_name = f'{name_prefix}-{self.keep_warm_rule}'
+        if keep_warm := self.config.keep_warm:
+            # Handled by ActionHandler.keep_warm()
+            lambda_event = {'mu-keep-warm': keep_warm.get('concurrency', 1)}
+            self.event_rule(rule_name, keep_warm, lambda_event, func_arn)
+        elif self.delete_event_rule(rule_name):
+            # Keep-warm was removed from the config.  The rule would keep pinging otherwise.
+            try:  # noqa: SIM105
+                self.lc.remove_permission(FunctionName=func_arn, StatementId=rule_name)
+            except self.not_found_exc:
+                pass
+            log.info('Deleted event schedule: %s', rule_name)
 
-            # TODO: better error handling
-            assert 'rate' not in config or 'cron' not in config
-            assert 'rate' in config or 'cron' in config
+    def event_rule(self, rule_name: str, config: dict, lambda_event: dict, func_arn: str):
+        log.info('Adding event schedule: %s', rule_name)
 
-            resp = self.event_client.put_rule(
-                Name=rule_name,
-                State=config.get('state', 'enabled').upper(),
-                ScheduleExpression=(
-                    f'rate({config["rate"]})' if 'rate' in config else f'cron({config["cron"]})'
-                ),
-            )
-            rule_arn = resp['RuleArn']
+        # TODO: better error handling
+        assert 'rate' not in config or 'cron' not in config
+        assert 'rate' in config or 'cron' in config
 
-            lambda_event = {'do-action': config['action']}
-            self.event_client.put_targets(
-                Rule=rule_name,
-                Targets=[{'Id': 'lambda-func', 'Arn': func_arn, 'Input': json.dumps(lambda_event)}],
+        resp = self.event_client.put_rule(
+            Name=rule_name,
+            State=config.get('state', 'enabled').upper(),
+            ScheduleExpression=(
+                f'rate({config["rate"]})' if 'rate' in config else f'cron({config["cron"]})'
+            ),
+        )
+        rule_arn = resp['RuleArn']
+
+        self.event_client.put_targets(
+            Rule=rule_name,
+            Targets=[{'Id': 'lambda-func', 'Arn': func_arn, 'Input': json.dumps(lambda_event)}],
+        )
+
+        try:  # noqa: SIM105
+            self.lc.add_permission(
+                FunctionName=func_arn,
+                StatementId=rule_name,
+                Action='lambda:InvokeFunction',
+                Principal='events.amazonaws.com',
+                SourceArn=rule_arn,
             )
+        except self.exists_exc:
+            # TODO: do we need to be smarter about re-creating this?
+            pass
 
-            try:  # noqa: SIM105
-                self.lc.add_permission(
-                    FunctionName=func_arn,
-                    StatementId=rule_name,
-                    Action='lambda:InvokeFunction',
-                    Principal='events.amazonaws.com',
-                    SourceArn=rule_arn,
-                )
-            except self.exists_exc:
-                # TODO: do we need to be smarter about re-creating this?
-                pass
+        log.info('Rule arn: %s', rule_arn)
+
+    def delete_event_rule(self, rule_name: str) -> bool:
+        """Delete the rule and its target.  False when there was no target to delete."""
+        try:
+            self.event_client.remove_targets(Rule=rule_name, Ids=['lambda-func'])
+            found = True
+        except self.not_found_exc:
+            found = False
 
-            log.info('Rule arn: %s', rule_arn)
+        # No exception thrown if the rule doesn't exist.
+        self.event_client.delete_rule(Name=rule_name)
+        return found
 
     # def api_gateway(self, func_arn: str) -> api_gateway.APIEndpoint:
     #     api: api_gateway.APIEndpoint = self.apis.ensure(self.config.api_name(env), func_arn)
@@ -352,15 +555,30 @@ class Lambda:
     #     return api
 
     def function_url(self, func_arn):
+        # When using an alias, the URL invokes the alias
+        qualifier = {'Qualifier': alias} if (alias := self.config.lambda_alias) else {}
+        # Streamed responses are sent by mu.runtime, deploy() checks the image uses it
+        invoke_mode = 'RESPONSE_STREAM' if self.config.lambda_url_streaming else 'BUFFERED'
+
         try:
             resp = self.lc.create_function_url_config(
                 FunctionName=func_arn,
                 AuthType='NONE',
+                InvokeMode=invoke_mode,
+                **qualifier,
             )
             log.info('Function url config created')
         except self.exists_exc:
-            resp = self.lc.get_function_url_config(FunctionName=func_arn)
+            resp = self.lc.get_function_url_config(FunctionName=func_arn, **qualifier)
             log.info('Function url config existed')
+
+            if resp.get('InvokeMode', 'BUFFERED') != invoke_mode:
+                self.lc.update_function_url_config(
+                    FunctionName=func_arn,
+                    InvokeMode=invoke_mode,
+                    **qualifier,
+                )
+                log.info('Function url invoke mode updated: %s', invoke_mode)
         except self.not_found_exc:
             return None
 
@@ -376,6 +594,7 @@ class Lambda:
                 Action='lambda:InvokeFunctionUrl',
                 Principal='*',
                 FunctionUrlAuthType='NONE',
+                **qualifier,
             )
             log.info('Function url config permission added')
         except self.exists_exc:
@@ -384,6 +603,36 @@ class Lambda:
 
         return resp['FunctionUrl']
 
+    def runs_mu_runtime(self, image_name: str) -> bool:
+        """Whether the image's entrypoint is mu.runtime, which sends streamed responses."""
+        return 'mu.runtime' in ecr.LocalImage(image_name).entrypoint()
+
+    def desired_fingerprints(self, func_config: dict, image_uri: str) -> dict[str, str]:
+        """Fingerprint of each part of the deploy that can be skipped when unchanged."""
+        return {
+            'config': fingerprints.digest(func_config),
+            # Tags are immutable in the repo so the URI identifies the image.
+            'code': fingerprints.digest(image_uri),
+            'triggers': fingerprints.digest(
+                self.config.event_rules,
+                self.config.keep_warm,
+                self.config.task_queues,
+                self.config.invoke_arn,
+            ),
+            'alias': fingerprints.digest(
+                self.config.lambda_alias,
+                self.config.lambda_provisioned_concurrency,
+            ),
+        }
+
+    def deployed_fingerprints(self, func_arn: str) -> dict[str, str] | None:
+        """None when the function doesn't exist"""
+        try:
+            tags = self.lc.list_tags(Resource=func_arn)['Tags']
+        except self.not_found_exc:
+            return None
+        return fingerprints.from_tags(tags)
+
     def deploy(self, env):
         repo: ecr.Repo = self.repos.get(self.config.resource_ident)
         if not repo:
@@ -395,28 +644,97 @@ class Lambda:
 
         func_ident = self.config.lambda_ident
         func_arn = self.config.function_arn
-        func_url = self.function_url(func_arn)
-        image_tag: str = repo.push(self.config.image_name)
+        image_name = self.config.image_name
+
+        if self.config.lambda_url_streaming and not self.runs_mu_runtime(image_name):
+            # Lambda's runtime would send its buffered response as the body of the stream
+            log.error(
+                'lambda-url-streaming needs the image entrypoint to be mu.runtime: %s',
+                image_name,
+            )
+            return
+
+        image_tag = repo.tag_local(image_name)
         image_uri = f'{repo.uri}:{image_tag}'
-        self.ensure_func(env, image_uri, func_url)
 
-        # If the function was just created, the URL wasn't assigned.  Update the config to get the
-        # URL into the environment.  Slows down the first deploy but keeps the app from having to
-        # make an API to call get this info (and the permission ramifications that result).
-        if func_url is None:
-            log.info('Updating function to include function URL variable...')
-            self.wait_updated(func_ident)
+        # The push is mostly spent waiting on docker.  The function's configuration and triggers
+        # are updated meanwhile, only the code update needs the image to be in the repo.
+        with cf.ThreadPoolExecutor(max_workers=1) as executor:
+            # Copy the context so context vars, e.g. the env log prefix, carry over
+            ctx = contextvars.copy_context()
+            pushed = executor.submit(ctx.run, repo.push, image_name, tag=image_tag)
+
+            log.info('Deploying lambda function')
+            deployed = self.deployed_fingerprints(func_arn)
+
+            created = deployed is None
+            if created:
+                # A new function needs the image to create it
+                pushed.result()
+                self.create_func(image_uri, self.function_config(None))
+                self.wait_updated(func_ident)
+
             func_url = self.function_url(func_arn)
-            self.ensure_func(env, image_uri, func_url)
+            if func_url is None and self.config.lambda_alias:
+                # The alias is new.  The URL is for the alias, so the alias has to exist before
+                # the URL can be created.
+                self.wait_updated(func_ident)
+                self.publish_alias(func_ident)
+                func_url = self.function_url(func_arn)
+
+            func_config = self.function_config(func_url)
+            desired = self.desired_fingerprints(func_config, image_uri)
+            unchanged = fingerprints.unchanged(desired, deployed or {})
+            if created:
+                # Created with the image
+                unchanged.add('code')
+
+            if 'config' in unchanged:
+                log.info('Lambda function configuration unchanged')
+            else:
+                # For a new function, this adds the URL to the environment so the app doesn't
+                # have to make an API call to get it (and the permission ramifications that
+                # result).
+                self.update_func_config(func_config)
+
+            invoke_arn = self.config.invoke_arn
+            if 'triggers' in unchanged:
+                log.info('Event rules and task queue mappings unchanged')
+            else:
+                self.event_rules(env, invoke_arn)
+                self.task_queue_mappings(invoke_arn)
+            # TODO: offer api gateway as a config option
+            # api = self.api_gateway(env, func_arn)
 
-        self.event_rules(env, func_arn)
-        # TODO: offer api gateway as a config option
-        # api = self.api_gateway(env, func_arn)
+            if 'code' in unchanged:
+                log.info('Lambda function image unchanged')
+            else:
+                # Only the code update has to wait on the push
+                pushed.result()
+                self.update_func_code(image_uri)
+
+            # Surface push errors even when the code didn't need updating
+            pushed.result()
 
-        # The newly deployed app takes a bit to become active.  Wait for it to avoid prompt
-        # testing of the newly deployed changes from getting an older not-updated lambda.  Not fun.
-        self.wait_updated(func_ident)
-        self.wait_active(func_ident)
+        if not {'config', 'code'} <= unchanged:
+            # The newly deployed app takes a bit to become active.  Wait for it to avoid prompt
+            # testing of the newly deployed changes from getting an older not-updated lambda.
+            self.wait_updated(func_ident)
+            self.wait_active(func_ident)
+
+            if self.config.lambda_alias:
+                self.publish_alias(func_ident)
+        elif self.config.lambda_alias and 'alias' not in unchanged:
+            # Same version, only the provisioned concurrency changed
+            self.provisioned_concurrency(func_ident)
+        else:
+            log.info('Lambda function unchanged, not waiting or publishing')
+
+        if not created and 'alias' not in unchanged:
+            self.remove_stale_concurrency(func_ident)
+
+        # Saved last so a failed deploy is redone in full next time
+        self.lc.tag_resource(Resource=func_arn, Tags=fingerprints.to_tags(desired))
 
         spacing = '\n' + ' ' * 13
         log.info(f'Repo name:{spacing}%s', repo.name)
@@ -424,15 +742,109 @@ class Lambda:
         log.info(f'Function name:{spacing}%s', func_ident)
         log.info(f'Function URL:{spacing}%s', func_url)
 
+    def publish_alias(self, func_name: str) -> str:
+        """Publish $LATEST as a new version and move the alias to it."""
+        alias = self.config.lambda_alias
+        version = self.lc.publish_version(FunctionName=func_name)['Version']
+        log.info('Lambda version published: %s', version)
+
+        try:
+            self.lc.update_alias(FunctionName=func_name, Name=alias, FunctionVersion=version)
+            log.info('Lambda alias updated: %s -> %s', alias, version)
+        except self.not_found_exc:
+            self.lc.create_alias(FunctionName=func_name, Name=alias, FunctionVersion=version)
+            log.info('Lambda alias created: %s -> %s', alias, version)
+
+        self.provisioned_concurrency(func_name)
+        self.prune_versions(func_name, int(version))
+
+        return version
+
+    def provisioned_concurrency(self, func_name: str):
+        alias = self.config.lambda_alias
+
+        if not (count := self.config.lambda_provisioned_concurrency):
+            try:
+                self.lc.delete_provisioned_concurrency_config(
+                    FunctionName=func_name,
+                    Qualifier=alias,
+                )
+                log.info('Provisioned concurrency removed: %s', alias)
+            except self.not_found_exc:
+                pass
+            return
+
+        # Setting it on the alias moves the warm instances to the new version.  Lambda keeps the
+        # old version's instances serving until the new ones are ready.
+        self.lc.put_provisioned_concurrency_config(
+            FunctionName=func_name,
+            Qualifier=alias,
+            ProvisionedConcurrentExecutions=count,
+        )
+        log.info('Provisioned concurrency set: %s -> %s (see status for allocation)', alias, count)
+
+    def remove_stale_concurrency(self, func_name: str):
+        """
+        Remove provisioned concurrency from aliases the config no longer provisions.  E.g. when
+        lambda-provisioned-concurrency is removed, the config has no alias anymore but the one it
+        implied still has its instances provisioned, and billed.
+        """
+        wanted = self.config.lambda_alias if self.config.lambda_provisioned_concurrency else None
+        configs = self.lc.list_provisioned_concurrency_configs(FunctionName=func_name)
+        for pc_config in configs['ProvisionedConcurrencyConfigs']:
+            alias = pc_config['FunctionArn'].rsplit(':', 1)[1]
+            if alias == wanted:
+                continue
+
+            try:
+                self.lc.delete_provisioned_concurrency_config(
+                    FunctionName=func_name,
+                    Qualifier=alias,
+                )
+                log.info('Provisioned concurrency removed: %s', alias)
+            except self.not_found_exc:
+                pass
+
+    def prune_versions(self, func_name: str, current: int):
+        paginator = self.lc.get_paginator('list_versions_by_function')
+        versions = [
+            int(rec['Version'])
+            for page in paginator.paginate(FunctionName=func_name)
+            for rec in page['Versions']
+            if rec['Version'] != '$LATEST'
+        ]
+        for version in versions:
+            if version <= current - self.versions_keep:
+                self.lc.delete_function(FunctionName=func_name, Qualifier=str(version))
+                log.info('Lambda version deleted: %s', version)
+
+    def wait_status(self, lambda_name: str, key: str, ready: str, waiting_for: str):
+        """
+        Poll the function's config until key is ready.  Does what boto's function waiters do but
+        they poll every 1-5 seconds and updates are often done sooner.
+        """
+
+        def is_ready():
+            config = self.lc.get_function_configuration(FunctionName=lambda_name)
+            if config.get(key) == 'Failed':
+                reason = config.get(f'{key}Reason', 'unknown')
+                raise RuntimeError(f'Lambda {lambda_name} {waiting_for} failed: {reason}')
+            return config.get(key) == ready
+
+        waiter.wait(
+            is_ready,
+            waiting_for=waiting_for,
+            backoff=self.status_backoff,
+            progress=None,
+        )
+
     def wait_updated(self, lambda_name: str):
         log.info('Waiting for lambda to be updated...')
-        waiter = self.lc.get_waiter('function_updated_v2')
-        waiter.wait(FunctionName=lambda_name)
+        self.wait_status(lambda_name, 'LastUpdateStatus', 'Successful', 'update')
 
     def wait_active(self, lambda_name: str):
         log.info('Waiting for lambda to be active...')
-        waiter = self.lc.get_waiter('function_active_v2')
-        waiter.wait(FunctionName=lambda_name)
+        self.wait_status(lambda_name, 'State', 'Active', 'active')
 
     def invoke(self, action: str, action_args: list):
         event = {self.config.action_key: action, 'action-args': action_args}
@@ -684,16 +1096,44 @@ class FunctionURLConfigs(AWSRecsCRUD):
     client_name: str = 'lambda'
     rec_cls: type[FunctionURLConfig] = FunctionURLConfig
 
-    def get(self, function_arn: str):
+    def get(self, function_arn: str, qualifier: str | None = None):
         """Function URL Configs have a "list" mechanism but there can only be one of them per
         lambda function and they have no identifier of their own other than the URL.  But you get
         and delete them by the function arn."""
-        return super().get(function_arn, function_arn)
+        ident = f'{function_arn}:{qualifier}' if qualifier else function_arn
+        return super().get(ident, function_arn)
 
     def client_list(self, function_arn):
         return self.b3c.list_function_url_configs(FunctionName=function_arn)['FunctionUrlConfigs']
 
 
+@dataclass
+class ProvisionedConcurrency(AWSRec):
+    FunctionArn: str
+    RequestedProvisionedConcurrentExecutions: int
+    AvailableProvisionedConcurrentExecutions: int = 0
+    AllocatedProvisionedConcurrentExecutions: int = 0
+    Status: str = ''
+    StatusReason: str = ''
+
+    @property
+    def ident(self):
+        return self.FunctionArn
+
+
+class ProvisionedConcurrencies(AWSRecsCRUD):
+    client_name: str = 'lambda'
+    rec_cls: type[ProvisionedConcurrency] = ProvisionedConcurrency
+
+    def get(self, function_arn: str, qualifier: str):
+        return super().get(f'{function_arn}:{qualifier}', function_arn)
+
+    def client_list(self, function_arn):
+        return self.b3c.list_provisioned_concurrency_configs(FunctionName=function_arn)[
+            'ProvisionedConcurrencyConfigs'
+        ]
+
+
 @dataclass
 class PolicyStatement(AWSRec):
     Sid: str
@@ -713,7 +1153,7 @@ class FunctionPermissions(AWSRecsCRUD):
     rec_cls: type[PolicyStatement] = PolicyStatement
 
     def ensure(self, statement_id: str, *, config: Config, **kwargs):
-        return super().ensure(statement_id, config.function_arn, config=config, **kwargs)
+        return super().ensure(statement_id, config.invoke_arn, config=config, **kwargs)
 
     def client_list(self, function_arn: str):
         try:
@@ -737,7 +1177,8 @@ class FunctionPermissions(AWSRecsCRUD):
             assert api_key
             self.b3c.add_permission(
                 StatementId=statement_id,
-                FunctionName=config.function_arn,
+                # The permission has to be on the alias that's invoked, when there is one
+                FunctionName=config.invoke_arn,
                 **self._perm_api_invoke(config, api_key),
             )
         else:
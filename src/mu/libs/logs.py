@@ -2,9 +2,6 @@ from enum import Enum
 import inspect
 import logging
 
-import click
-import colorlog
-
 
 _logs_init = False
 
@@ -16,6 +13,9 @@ class LogLevel(Enum):
 
 
 def init_logging(log_level: str):
+    # CLI only, not imported at module level to keep it out of the lambda's cold start
+    import colorlog
+
     global _logs_init
     assert not _logs_init
 
@@ -45,6 +45,8 @@ def init_logging(log_level: str):
 
 
 def click_options(click_func):
+    import click
+
     click.option('--quiet', 'log_level', flag_value=LogLevel.quiet.name, help='WARN+ logging')(
         click_func,
     )
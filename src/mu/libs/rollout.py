@@ -0,0 +1,129 @@
+"""
+Run deploy or provision for several environments, optionally concurrently.  Most of the time of
+each is spent waiting on AWS and docker pushes so environments overlap well.
+"""
+
+from collections.abc import Callable
+import contextvars
+from dataclasses import dataclass
+import logging
+import threading
+import time
+
+from mu.libs import concurrent, logs
+
+
+log = logs.logger()
+
+# The environment the current thread is working on, shown in front of its log messages
+current_env: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    'current_env',
+    default=None,
+)
+
+
+class EnvPrefixFilter(logging.Filter):
+    """Prefix log messages with the environment they're for."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        env = current_env.get()
+        if env and not getattr(record, 'env_prefixed', False):
+            record.msg = f'[{env}] {record.msg}'
+            # The same record goes to each handler
+            record.env_prefixed = True
+        return True
+
+
+@dataclass
+class EnvResult:
+    env: str
+    # ok, failed, or cancelled (didn't start because another env failed)
+    status: str = 'cancelled'
+    secs: float | None = None
+    error: Exception | None = None
+
+
+class EnvFailed(Exception):
+    pass
+
+
+def run_env(
+    call: Callable[[str], None],
+    env: str,
+    results: dict[str, EnvResult],
+    stop: threading.Event | None,
+):
+    if stop is not None and stop.is_set():
+        # Another env failed
+        return
+
+    token = current_env.set(env)
+    start = time.perf_counter()
+    result = results[env]
+    try:
+        call(env)
+        result.status = 'ok'
+    except Exception as e:
+        log.exception(f'{e.__class__.__name__}: {e}')
+        result.status = 'failed'
+        result.error = e
+        if stop is not None:
+            stop.set()
+        raise
+    finally:
+        result.secs = time.perf_counter() - start
+        current_env.reset(token)
+
+
+def run(
+    call: Callable[[str], None],
+    envs: list[str],
+    *,
+    parallel: int = 1,
+    fail_fast: bool = True,
+) -> list[EnvResult]:
+    """
+    Call with each env, at most parallel at once.  With fail_fast, envs that haven't started
+    when one fails are cancelled.  Returns the result of each env, in the order given.
+    """
+    results = {env: EnvResult(env) for env in envs}
+    # Checked by each env before it starts.  Cancelling futures would race with the executor
+    # starting the next one.
+    stop = threading.Event() if fail_fast else None
+
+    prefix_filter = EnvPrefixFilter()
+    handlers = logging.getLogger().handlers
+    if len(envs) > 1:
+        for handler in handlers:
+            handler.addFilter(prefix_filter)
+
+    try:
+        with concurrent.thread_futures(
+            run_env,
+            {env: (call, env, results, stop) for env in envs},
+            max_workers=max(parallel, 1),
+            cancel_on_exc=False,
+        ) as futures:
+            # Outcomes are recorded by run_env(), this waits for them.
+            for _ in futures:
+                pass
+    finally:
+        for handler in handlers:
+            handler.removeFilter(prefix_filter)
+
+    return list(results.values())
+
+
+def summary(results: list[EnvResult]) -> str:
+    width = max(len(result.env) for result in results)
+    lines = []
+    for result in results:
+        secs = '' if result.secs is None else f'{result.secs:7.1f}s'
+        error = f'  {result.error.__class__.__name__}: {result.error}' if result.error else ''
+        lines.append(f'{result.env:<{width}}  {result.status:<9}  {secs:>8}{error}'.rstrip())
+    return '\n'.join(lines)
+
+
+def check(results: list[EnvResult]):
+    if failed := [result.env for result in results if result.status != 'ok']:
+        raise EnvFailed(f'Not completed: {", ".join(failed)}')
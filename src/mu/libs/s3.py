@@ -0,0 +1,64 @@
+import logging
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+log = logging.getLogger(__name__)
+
+
+class Buckets:
+    def __init__(self, b3_sess: boto3.Session):
+        self.b3_sess = b3_sess
+        self.s3 = b3_sess.client('s3')
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.s3.head_bucket(Bucket=name)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchBucket'):
+                raise
+            return False
+
+    def ensure(self, name: str, *, expire_prefix: str, expire_days: int):
+        """Ensure the bucket exists and objects under expire_prefix get cleaned up."""
+        if self.exists(name):
+            log.info('S3 bucket existed: %s', name)
+        else:
+            region = self.b3_sess.region_name
+            # us-east-1 is the default location and AWS errors if it's given explicitly
+            location = (
+                {'CreateBucketConfiguration': {'LocationConstraint': region}}
+                if region != 'us-east-1'
+                else {}
+            )
+            self.s3.create_bucket(Bucket=name, **location)
+            log.info('S3 bucket created: %s', name)
+
+        self.s3.put_bucket_lifecycle_configuration(
+            Bucket=name,
+            LifecycleConfiguration={
+                'Rules': [
+                    {
+                        'ID': f'expire-{expire_prefix.strip("/")}',
+                        'Filter': {'Prefix': expire_prefix},
+                        'Status': 'Enabled',
+                        'Expiration': {'Days': expire_days},
+                    },
+                ],
+            },
+        )
+
+    def delete(self, name: str):
+        if not self.exists(name):
+            log.info('S3 bucket not found: %s', name)
+            return
+
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=name):
+            if objects := [{'Key': obj['Key']} for obj in page.get('Contents', ())]:
+                self.s3.delete_objects(Bucket=name, Delete={'Objects': objects})
+
+        self.s3.delete_bucket(Bucket=name)
+        log.info('S3 bucket deleted: %s', name)
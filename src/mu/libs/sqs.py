@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import InitVar, dataclass
 import functools
 import logging
 
@@ -14,11 +14,19 @@ log = logging.getLogger(__name__)
 @dataclass
 class Queue(B3DataClass):
     name: str
+    # Queues made by SQS share its client.  Clients are created from the session up front since
+    # sessions aren't thread safe, e.g. for provisioning steps.
+    sqs_client: InitVar[object | None] = None
+
+    def __post_init__(self, b3_sess, sqs_client):
+        super().__post_init__(b3_sess)
+        if sqs_client is not None:
+            self.sqs = sqs_client
 
     @classmethod
-    def from_url(cls, b3_sess: boto3.Session, url: str):
+    def from_url(cls, b3_sess: boto3.Session, url: str, sqs_client=None):
         name = url.split('/')[-1]
-        return cls(b3_sess, name)
+        return cls(b3_sess, name, sqs_client)
 
     @functools.cached_property
     def sqs(self):
@@ -58,12 +66,12 @@ class SQS:
         self.sqs = b3_sess.client('sqs')
 
     def get(self, name: str):
-        queue = Queue(self.b3_sess, name)
+        queue = Queue(self.b3_sess, name, self.sqs)
         return queue if queue.exists() else None
 
     def list(self, name_prefix: str | None = None) -> dict[str, Queue]:
         resp = self.sqs.list_queues(QueueNamePrefix=name_prefix)
-        queues = [Queue.from_url(self.b3_sess, url) for url in resp.get('QueueUrls', ())]
+        queues = [Queue.from_url(self.b3_sess, url, self.sqs) for url in resp.get('QueueUrls', ())]
         return {q.name: q for q in queues}
 
     def delete(self, name_prefix: str):
@@ -84,7 +92,7 @@ class SQS:
 
         for name, attrs in aws_config.items():
             full_name = f'{func_name}-{name}'
-            retval[full_name] = queue = Queue(self.b3_sess, full_name)
+            retval[full_name] = queue = Queue(self.b3_sess, full_name, self.sqs)
 
             if queue.exists():
                 if attrs:
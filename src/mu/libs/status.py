@@ -14,6 +14,7 @@ class Status:
 
         self.lambda_func: aws_recs.LambdaFunc | None = None
         self.lambda_url: aws_recs.FunctionURLConfig | None = None
+        self.provisioned: lamb.ProvisionedConcurrency | None = None
         self.gw_api: gateway.GatewayAPI | None = None
         self.acm_cert: gateway.ACMCert | None = None
         self.gw_domain_name: gateway.DomainName | None = None
@@ -40,7 +41,16 @@ class Status:
     def fetch_lambda(self):
         self.lambda_func = lamb.Functions(self.b3_sess).get(self.config.lambda_ident)
         if self.lambda_func:
-            self.lambda_url = lamb.FunctionURLConfigs(self.b3_sess).get(self.config.function_arn)
+            self.lambda_url = lamb.FunctionURLConfigs(self.b3_sess).get(
+                self.config.function_arn,
+                self.config.lambda_alias,
+            )
+
+        if self.lambda_func and self.config.lambda_provisioned_concurrency:
+            self.provisioned = lamb.ProvisionedConcurrencies(self.b3_sess).get(
+                self.config.function_arn,
+                self.config.lambda_alias,
+            )
 
     def fetch_gateway_api(self):
         if not self.config.domain_name:
@@ -72,6 +82,21 @@ class Status:
             f'{indent}{self.lambda_url.FunctionUrl if self.lambda_url else None}\n',
         )
 
+        if self.config.lambda_alias:
+            results.write(f'Lambda Alias:\n{indent}{self.config.lambda_alias}\n')
+
+        if self.config.lambda_provisioned_concurrency:
+            pc = self.provisioned
+            results.write(
+                'Provisioned Concurrency:\n'
+                f'{indent}Status: {pc.Status if pc else None}\n'
+                f'{indent}Requested: {self.config.lambda_provisioned_concurrency}\n'
+                f'{indent}Allocated: {pc.AllocatedProvisionedConcurrentExecutions if pc else 0}\n'
+                f'{indent}Available: {pc.AvailableProvisionedConcurrentExecutions if pc else 0}\n',
+            )
+            if pc and pc.StatusReason:
+                results.write(f'{indent}Reason: {pc.StatusReason}\n')
+
         if self.config.domain_name:
             results.write(
                 f'Domain:\n{indent}Name:\n{indent * 2}{self.config.domain_name}\n',
@@ -0,0 +1,116 @@
+"""
+Run steps that depend on each other, e.g. provisioning, with independent steps running at the
+same time.
+"""
+
+from collections.abc import Callable
+import concurrent.futures as cf
+import contextvars
+from dataclasses import dataclass
+import time
+import typing
+
+from mu.libs import logs
+
+
+log = logs.logger()
+
+
+@dataclass
+class Step:
+    name: str
+    call: Callable[[], typing.Any]
+    # Names of the steps that have to finish first
+    after: tuple[str, ...] = ()
+
+
+@dataclass
+class StepResult:
+    name: str
+    # ok, failed, or skipped (didn't start because a step failed)
+    status: str = 'skipped'
+    secs: float | None = None
+    error: Exception | None = None
+
+
+def check(steps: list[Step]):
+    """Raise ValueError for unknown or circular dependencies."""
+    by_name = {step.name: step for step in steps}
+    if len(by_name) != len(steps):
+        raise ValueError('Step names must be unique')
+
+    for step in steps:
+        if unknown := set(step.after) - set(by_name):
+            raise ValueError(f'Step {step.name} is after unknown steps: {sorted(unknown)}')
+
+    # Remove steps whose dependencies are done until none are left
+    pending = {step.name: set(step.after) for step in steps}
+    while pending:
+        ready = {name for name, after in pending.items() if not after}
+        if not ready:
+            raise ValueError(f'Steps have circular dependencies: {sorted(pending)}')
+        pending = {name: after - ready for name, after in pending.items() if name not in ready}
+
+
+def run(steps: list[Step], *, max_workers: int = 4) -> list[StepResult]:
+    """
+    Run each step once the steps it's after are done, at most max_workers at once.  When a step
+    fails, no more steps are started and, once the running steps finish, the exception is
+    raised.  Returns the result of each step in the order given.
+    """
+    check(steps)
+
+    results = {step.name: StepResult(step.name) for step in steps}
+    waiting = list(steps)
+    done: set[str] = set()
+    error: Exception | None = None
+
+    def timed(step: Step):
+        start = time.perf_counter()
+        try:
+            step.call()
+        finally:
+            results[step.name].secs = time.perf_counter() - start
+
+    with cf.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running: dict[cf.Future, Step] = {}
+
+        while waiting or running:
+            if error is None:
+                for step in [step for step in waiting if done.issuperset(step.after)]:
+                    waiting.remove(step)
+                    # Copy the context so context vars, e.g. the env log prefix, carry over
+                    ctx = contextvars.copy_context()
+                    running[executor.submit(ctx.run, timed, step)] = step
+
+            if not running:
+                break
+
+            finished, _ = cf.wait(running, return_when=cf.FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                result = results[step.name]
+                if exc := future.exception():
+                    log.error(f'Step failed: {step.name}: {exc.__class__.__name__}: {exc}')
+                    result.status = 'failed'
+                    result.error = exc
+                    error = error or exc
+                else:
+                    result.status = 'ok'
+                    done.add(step.name)
+
+    log.info('Step timings:\n' + timings(list(results.values())))
+
+    if error is not None:
+        raise error
+
+    return list(results.values())
+
+
+def timings(results: list[StepResult]) -> str:
+    width = max(len(result.name) for result in results)
+    return '\n'.join(
+        f'  {result.name:<{width}}  {result.status:<7}'
+        + ('' if result.secs is None else f'  {result.secs:6.2f}s')
+        for result in results
+    )
@@ -10,13 +10,14 @@ import pprint
 import shlex
 import subprocess
 import tempfile
-import time
 import uuid
 
 import arrow
 import boto3
 from cryptography.fernet import Fernet
 
+from mu.libs import waiter
+
 
 log = logging.getLogger(__name__)
 
@@ -105,7 +106,7 @@ def print_dict(d, indent=0):
 
 
 class RetryingAction:
-    wait_seq = (0.1, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 2.5, 3, 5, None)
+    backoff = waiter.Backoff(deadline=15)
     exc_type: Exception = None
     exc_contains: str = ''
     waiting_for: str = ''
@@ -116,28 +117,26 @@ class RetryingAction:
 
     @classmethod
     def run(cls, *args, **kwargs):
-        for wait_for in cls.wait_seq:
-            try:
-                return cls.act(*args, **kwargs)
-            except cls.exc_type as exc:
-                if cls.exc_contains not in str(exc) or wait_for is None:
-                    raise
-                log.info(f'Waiting {wait_for}s for {cls.waiting_for}')
-                time.sleep(wait_for)
-
-
-def wait_seq(count, secs):
-    extra = [secs] * count
-    return (0.1, 0.25, 0.5, 0.75, 1, *extra)
+        return waiter.wait(
+            lambda: cls.act(*args, **kwargs),
+            waiting_for=cls.waiting_for,
+            backoff=cls.backoff,
+            ready=lambda result: True,
+            retry_on=(cls.exc_type,),
+            retry_if=lambda exc: cls.exc_contains in str(exc),
+        )
 
 
 def retry(func, *args, waiting_for, secs=1, count=30, **kwargs):
-    for wait_for in wait_seq(count, secs):
-        result = func(*args, **kwargs)
-        if result:
-            return result
-        log.info(f'Waiting {wait_for}s for {waiting_for}')
-        time.sleep(wait_for)
+    """
+    Call func until its result is truthy, waiting up to secs between calls.  None if it isn't
+    within about count * secs.
+    """
+    backoff = waiter.Backoff(max_delay=secs, deadline=count * secs)
+    try:
+        return waiter.wait(lambda: func(*args, **kwargs), waiting_for=waiting_for, backoff=backoff)
+    except waiter.WaitTimeout:
+        return None
 
 
 def compose_build(*service_names):
@@ -0,0 +1,97 @@
+"""
+Poll until something is ready, e.g. a resource AWS just created.  Most things are ready within a
+second or two so polling starts fast, then backs off exponentially (with jitter, so concurrent
+waiters don't poll in lockstep) up to an overall deadline.
+"""
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+import random
+import time
+
+from mu.libs import logs
+
+
+log = logs.logger()
+
+
+class WaitTimeout(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Backoff:
+    # Seconds before the second check
+    first: float = 0.1
+    factor: float = 1.5
+    # Longest wait between checks
+    max_delay: float = 5
+    # Each delay is randomly adjusted by up to this fraction of itself
+    jitter: float = 0.2
+    # Give up after this many seconds
+    deadline: float = 60
+
+    def delays(self) -> Iterator[float]:
+        delay = self.first
+        while True:
+            yield delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(delay * self.factor, self.max_delay)
+
+
+@dataclass
+class Progress:
+    waiting_for: str
+    # Checks made so far
+    attempt: int
+    elapsed: float
+    # Seconds until the next check
+    delay: float
+    # Raised by the last check when it was retried
+    error: Exception | None = None
+
+
+def log_progress(progress: Progress):
+    log.info(f'Waiting {progress.delay:.2f}s for {progress.waiting_for}')
+
+
+def wait[T](
+    check: Callable[[], T],
+    *,
+    waiting_for: str,
+    backoff: Backoff = Backoff(),  # noqa: B008
+    ready: Callable[[T], bool] = bool,
+    retry_on: tuple[type[Exception], ...] = (),
+    retry_if: Callable[[Exception], bool] | None = None,
+    progress: Callable[[Progress], None] | None = log_progress,
+) -> T:
+    """
+    Call check until its result is ready and return the result.  Exceptions of the retry_on types
+    (for which retry_if is true, when given) count as not ready.  progress is called before each
+    wait.
+
+    Raises WaitTimeout when still not ready at the deadline, or the last check's exception when it
+    raised.
+    """
+    start = time.monotonic()
+    for attempt, delay in enumerate(backoff.delays(), start=1):
+        error = None
+        try:
+            result = check()
+            if ready(result):
+                return result
+        except retry_on as e:
+            if retry_if and not retry_if(e):
+                raise
+            error = e
+
+        elapsed = time.monotonic() - start
+        if (remaining := backoff.deadline - elapsed) <= 0:
+            if error:
+                raise error
+            raise WaitTimeout(f'Gave up waiting {elapsed:.1f}s for {waiting_for}')
+
+        # Check once more at the deadline
+        delay = min(delay, remaining)
+        if progress:
+            progress(Progress(waiting_for, attempt, elapsed, delay, error))
+        time.sleep(delay)
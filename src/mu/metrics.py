@@ -0,0 +1,122 @@
+"""
+Per-invocation metrics as CloudWatch Embedded Metric Format (EMF) log lines.  CloudWatch derives
+the metrics from the function's logs, no API calls or extra latency needed.
+
+See: https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/
+    CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+
+import json
+import resource
+import sys
+import time
+
+
+# Cleared by the first invocation the instance handles
+_cold = True
+
+
+class Sink:
+    """Where EMF records go."""
+
+    def emit(self, record: dict):
+        raise NotImplementedError
+
+
+class StdoutSink(Sink):
+    """Lambda sends stdout to CloudWatch logs.  EMF lines must be the JSON alone, so not logged."""
+
+    def emit(self, record: dict):
+        sys.stdout.write(json.dumps(record, default=str) + '\n')
+        sys.stdout.flush()
+
+
+class MemorySink(Sink):
+    """Keeps records, for tests."""
+
+    def __init__(self):
+        self.records: list[dict] = []
+
+    def emit(self, record: dict):
+        self.records.append(record)
+
+    def metrics(self) -> list[dict]:
+        """The metric values and properties of each record, without the EMF metadata"""
+        return [{k: v for k, v in rec.items() if k != '_aws'} for rec in self.records]
+
+
+def cold_start() -> bool:
+    """True for the first invocation handled by this instance"""
+    global _cold
+
+    cold, _cold = _cold, False
+    return cold
+
+
+def max_rss_mb() -> float:
+    # KB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def remaining_ms(context) -> int | None:
+    try:
+        return context.get_remaining_time_in_millis()
+    except AttributeError:
+        # Not a lambda context, e.g. local invokes and tests
+        return None
+
+
+def emf(
+    namespace: str,
+    dimensions: dict[str, str],
+    metrics: dict[str, tuple[float, str]],
+    properties: dict | None = None,
+) -> dict:
+    """
+    An EMF record.  metrics is name -> (value, unit).  Metrics are reported for each prefix of the
+    dimensions, e.g. by EventType and by EventType and Name.
+    """
+    names = list(dimensions)
+    return {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [
+                {
+                    'Namespace': namespace,
+                    'Dimensions': [names[:i] for i in range(1, len(names) + 1)],
+                    'Metrics': [
+                        {'Name': name, 'Unit': unit} for name, (_, unit) in metrics.items()
+                    ],
+                },
+            ],
+        },
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()},
+        **(properties or {}),
+    }
+
+
+def invocation(
+    namespace: str,
+    event_type: str,
+    name: str | None,
+    duration_secs: float,
+    context,
+    *,
+    error: bool = False,
+    properties: dict | None = None,
+) -> dict:
+    dimensions = {'EventType': event_type}
+    if name:
+        dimensions['Name'] = name
+
+    metrics = {
+        'Duration': (round(duration_secs * 1000, 3), 'Milliseconds'),
+        'ColdStart': (int(cold_start()), 'Count'),
+        'Errors': (int(error), 'Count'),
+        'MaxRSS': (round(max_rss_mb(), 1), 'Megabytes'),
+    }
+    if (remaining := remaining_ms(context)) is not None:
+        metrics['RemainingTime'] = (remaining, 'Milliseconds')
+
+    return emf(namespace, dimensions, metrics, properties)
@@ -0,0 +1,229 @@
+"""
+HTTP responses in the API Gateway HTTP API (v2) / function URL payload format, shared by the WSGI
+and ASGI paths: which bodies are base64 encoded and optional compression.
+"""
+
+import base64
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+import fnmatch
+import gzip
+
+
+# Content types, or patterns, of bodies that are base64 encoded in the response.  Text types
+# below are checked first so, e.g., application/vnd.api+json isn't encoded.
+base64_content_types = (
+    'application/octet-stream',
+    'application/pdf',
+    'application/zip',
+    'application/gzip',
+    'application/x-*',
+    'application/vnd.*',
+    'application/font-*',
+    'image/*',
+    'audio/*',
+    'video/*',
+    'font/*',
+)
+
+text_content_types = (
+    'text/*',
+    'application/json',
+    'application/*+json',
+    'application/xml',
+    'application/*+xml',
+    'application/javascript',
+    'image/svg+xml',
+)
+
+
+def mime_type(content_type: str) -> str:
+    """The type without parameters, e.g. text/csv for 'text/csv; charset=utf-8'"""
+    return content_type.split(';', 1)[0].strip().lower()
+
+
+def matches(content_type: str | None, patterns: Iterable[str]) -> bool:
+    if not content_type:
+        return False
+    mime = mime_type(content_type)
+    return any(fnmatch.fnmatchcase(mime, pattern.lower()) for pattern in patterns)
+
+
+def is_binary(content_type: str | None, patterns: Iterable[str]) -> bool:
+    return not matches(content_type, text_content_types) and matches(content_type, patterns)
+
+
+def accept_encodings(accept_encoding: str | None) -> dict[str, float]:
+    """Encoding -> q value from an Accept-Encoding header"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, *params = (part.strip() for part in item.split(';'))
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.lower()] = q
+    return accepted
+
+
+def brotli_compress(body: bytes) -> bytes:
+    # Optional dependency, see Compression.available()
+    import brotli
+
+    return brotli.compress(body)
+
+
+def gzip_compress(body: bytes) -> bytes:
+    # Level 6 is most of the size reduction of 9 for much less time
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+compressors: dict[str, Callable[[bytes], bytes]] = {
+    'br': brotli_compress,
+    'gzip': gzip_compress,
+}
+
+
+@dataclass
+class Compression:
+    """Compress response bodies the client accepts.  Set ActionHandler.compression to enable."""
+
+    # Smaller bodies aren't worth compressing
+    min_size: int = 1024
+    # In order of preference
+    encodings: tuple[str, ...] = ('br', 'gzip')
+    content_types: tuple[str, ...] = text_content_types
+
+    @staticmethod
+    def available(encoding: str) -> bool:
+        if encoding != 'br':
+            return encoding in compressors
+
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def encoding(self, accept_encoding: str | None) -> str | None:
+        accepted = accept_encodings(accept_encoding)
+        for encoding in self.encodings:
+            q = accepted.get(encoding, accepted.get('*', 0))
+            if q > 0 and self.available(encoding):
+                return encoding
+        return None
+
+    def compress(self, headers: dict[str, str], body: bytes, accept_encoding: str | None):
+        """The body, compressed if it should be.  Updates the headers when it is."""
+        if (
+            len(body) < self.min_size
+            or header(headers, 'content-encoding') is not None
+            or not matches(header(headers, 'content-type'), self.content_types)
+        ):
+            return body
+
+        if (encoding := self.encoding(accept_encoding)) is None:
+            return body
+
+        body = compressors[encoding](body)
+        pop_header(headers, 'content-length')
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = ', '.join(filter(None, (pop_header(headers, 'vary'), 'Accept-Encoding')))
+        return body
+
+
+def header(headers: dict[str, str], name: str) -> str | None:
+    """Case insensitive header lookup"""
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def pop_header(headers: dict[str, str], name: str) -> str | None:
+    name = name.lower()
+    for key in list(headers):
+        if key.lower() == name:
+            return headers.pop(key)
+    return None
+
+
+def split_cookies(headers: Iterable[tuple[str, str]]) -> tuple[dict[str, str], list[str]]:
+    """
+    Response headers as a dict, repeated headers joined, and the Set-Cookie values which the
+    payload format has separately.
+    """
+    resp_headers: dict[str, str] = {}
+    cookies = []
+    for name, value in headers:
+        if name.lower() == 'set-cookie':
+            cookies.append(value)
+        elif name in resp_headers:
+            resp_headers[name] = f'{resp_headers[name]}, {value}'
+        else:
+            resp_headers[name] = value
+    return resp_headers, cookies
+
+
+def call_wsgi(app: Callable, environ: dict) -> tuple[str, list[tuple[str, str]], bytes]:
+    """Call the WSGI app and return its status line, headers, and body."""
+    started: dict = {}
+    chunks: list[bytes] = []
+
+    def start_response(status: str, headers: list[tuple[str, str]], exc_info=None):
+        # Nothing is sent until the app is done so an error response can always replace the
+        # headers.
+        started.update(status=status, headers=headers)
+        return chunks.append
+
+    output = app(environ, start_response)
+    try:
+        chunks.extend(output)
+    finally:
+        if hasattr(output, 'close'):
+            output.close()
+
+    return started['status'], started['headers'], b''.join(chunks)
+
+
+def response(
+    status: int,
+    headers: Iterable[tuple[str, str]],
+    body: bytes,
+    request_headers: dict | None,
+    *,
+    base64_content_types: Iterable[str] = base64_content_types,
+    compression: Compression | None = None,
+) -> dict:
+    """The lambda response for the app's response"""
+    resp_headers, cookies = split_cookies(headers)
+
+    if compression:
+        accept_encoding = header(request_headers or {}, 'accept-encoding')
+        body = compression.compress(resp_headers, body, accept_encoding)
+
+    is_b64 = header(resp_headers, 'content-encoding') is not None or is_binary(
+        header(resp_headers, 'content-type'),
+        base64_content_types,
+    )
+    text = None
+    if not is_b64:
+        try:
+            text = body.decode()
+        except UnicodeDecodeError:
+            # Mislabeled or unlabeled binary content
+            is_b64 = True
+
+    resp = {
+        'statusCode': status,
+        'headers': resp_headers,
+        'isBase64Encoded': is_b64,
+        'body': base64.b64encode(body).decode() if is_b64 else text,
+    }
+    if cookies:
+        resp['cookies'] = cookies
+    return resp
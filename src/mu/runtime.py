@@ -0,0 +1,262 @@
+"""
+Lambda runtime, i.e. the loop that gets events from Lambda and sends back responses, that can
+stream responses.  Lambda's python runtime buffers them.
+
+Use it by setting the image's entrypoint, the handler is still given by CMD:
+
+    ENTRYPOINT ["/var/lang/bin/python", "-m", "mu.runtime"]
+    CMD ["app.lambda_handler"]
+
+See: https://docs.aws.amazon.com/lambda/latest/dg/runtimes-api.html
+"""
+
+import base64
+import datetime as dt
+import http.client
+import importlib
+import json
+import logging
+import os
+from os import environ
+from pathlib import Path
+import sys
+import time
+import traceback
+
+from mu import streaming
+
+
+log = logging.getLogger(__name__)
+
+api_version = '2018-06-01'
+
+# Runtime interface emulator in the AWS base images.  Used to run locally, like the images'
+# default entrypoint does.
+rie_fpath = Path('/usr/local/bin/aws-lambda-rie')
+
+# LogRecord attributes, anything else was given with extra=
+log_record_attrs = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message'}
+
+
+class Context:
+    """The context given to the handler, same attributes as Lambda's python runtime."""
+
+    def __init__(self, headers):
+        self.aws_request_id: str = headers['Lambda-Runtime-Aws-Request-Id']
+        self.invoked_function_arn: str | None = headers.get('Lambda-Runtime-Invoked-Function-Arn')
+        self.deadline_ms = int(headers.get('Lambda-Runtime-Deadline-Ms') or 0)
+        self.function_name = environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        self.function_version = environ.get('AWS_LAMBDA_FUNCTION_VERSION')
+        self.memory_limit_in_mb = environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+        self.log_group_name = environ.get('AWS_LAMBDA_LOG_GROUP_NAME')
+        self.log_stream_name = environ.get('AWS_LAMBDA_LOG_STREAM_NAME')
+
+        identity = headers.get('Lambda-Runtime-Cognito-Identity')
+        self.identity = json.loads(identity) if identity else None
+        client_context = headers.get('Lambda-Runtime-Client-Context')
+        self.client_context = json.loads(client_context) if client_context else None
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(self.deadline_ms - int(time.time() * 1000), 0)
+
+
+def error_body(exc: BaseException) -> dict:
+    return {
+        'errorMessage': str(exc),
+        'errorType': type(exc).__name__,
+        'stackTrace': traceback.format_tb(exc.__traceback__),
+    }
+
+
+class JSONFormatter(logging.Formatter):
+    """Log records as JSON, like Lambda's python runtime does when the log format is JSON."""
+
+    request_id: str | None = None
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'timestamp': dt.datetime.fromtimestamp(record.created, dt.UTC).strftime(
+                '%Y-%m-%dT%H:%M:%S.%f',
+            )[:-3]
+            + 'Z',
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'requestId': self.request_id,
+        }
+        if record.exc_info and record.exc_info[1]:
+            data.update(error_body(record.exc_info[1]))
+
+        data.update(
+            (key, value) for key, value in vars(record).items() if key not in log_record_attrs
+        )
+        return json.dumps(data, default=str)
+
+
+class ChunkedWriter(streaming.Writer):
+    """Writes a streamed response to the runtime API with chunked transfer encoding."""
+
+    def __init__(self, conn: http.client.HTTPConnection):
+        self.conn = conn
+
+    def write(self, data: bytes):
+        # A zero length chunk would end the body
+        if data:
+            self.conn.send(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def close(self, exc: Exception | None = None):
+        trailers = b''
+        if exc is not None:
+            # Errors after the response started are reported in the trailers
+            error = base64.b64encode(json.dumps(error_body(exc)).encode()).decode()
+            trailers = (
+                f'Lambda-Runtime-Function-Error-Type: {type(exc).__name__}\r\n'
+                f'Lambda-Runtime-Function-Error-Body: {error}\r\n'
+            ).encode()
+        self.conn.send(b'0\r\n' + trailers + b'\r\n')
+
+
+class RuntimeAPI:
+    def __init__(self, host: str):
+        # One invocation at a time, so one connection, kept alive between invocations.
+        self.conn = http.client.HTTPConnection(host)
+
+    def path(self, path: str) -> str:
+        return f'/{api_version}/runtime/{path}'
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers=None):
+        self.conn.request(method, self.path(path), body=body, headers=headers or {})
+        resp = self.conn.getresponse()
+        data = resp.read()
+        if resp.status >= 300:
+            raise RuntimeError(f'Runtime API {method} {path}: {resp.status} {data!r}')
+        return resp, data
+
+    def next(self) -> tuple[dict, Context]:
+        resp, data = self.request('GET', 'invocation/next')
+        context = Context(resp.headers)
+        if trace_id := resp.headers.get('Lambda-Runtime-Trace-Id'):
+            os.environ['_X_AMZN_TRACE_ID'] = trace_id
+        return json.loads(data), context
+
+    def respond(self, request_id: str, body: bytes):
+        self.request('POST', f'invocation/{request_id}/response', body)
+
+    def respond_stream(self, request_id: str, response: streaming.StreamingResponse):
+        self.conn.putrequest('POST', self.path(f'invocation/{request_id}/response'))
+        self.conn.putheader('Lambda-Runtime-Function-Response-Mode', 'streaming')
+        self.conn.putheader('Transfer-Encoding', 'chunked')
+        self.conn.putheader('Content-Type', streaming.content_type)
+        self.conn.putheader(
+            'Trailer',
+            'Lambda-Runtime-Function-Error-Type, Lambda-Runtime-Function-Error-Body',
+        )
+        self.conn.endheaders()
+
+        try:
+            response.write_to(ChunkedWriter(self.conn))
+        except Exception:
+            # The writer reported it in the trailers
+            log.exception('Streamed response failed')
+        finally:
+            # Read the runtime API's reply even when the stream failed so the connection can be
+            # used for the next invocation.
+            self.conn.getresponse().read()
+
+    def error(self, request_id: str, exc: Exception):
+        self.request(
+            'POST',
+            f'invocation/{request_id}/error',
+            json.dumps(error_body(exc)).encode(),
+            {'Lambda-Runtime-Function-Error-Type': type(exc).__name__},
+        )
+
+    def init_error(self, exc: Exception):
+        self.request(
+            'POST',
+            'init/error',
+            json.dumps(error_body(exc)).encode(),
+            {'Lambda-Runtime-Function-Error-Type': type(exc).__name__},
+        )
+
+
+def load_handler(spec: str):
+    """The handler function given as module.function, like Lambda's CMD"""
+    mod_path, func_name = spec.rsplit('.', 1)
+    return getattr(importlib.import_module(mod_path), func_name)
+
+
+def invoke(api: RuntimeAPI, handler, event: dict, context: Context):
+    request_id = context.aws_request_id
+    try:
+        result = handler(event, context)
+    except Exception as e:
+        log.exception('Handler raised an unhandled exception')
+        api.error(request_id, e)
+        return
+
+    if isinstance(result, streaming.StreamingResponse):
+        api.respond_stream(request_id, result)
+        return
+
+    try:
+        body = json.dumps(result).encode()
+    except (TypeError, ValueError) as e:
+        log.exception('Handler result could not be serialized to JSON')
+        api.error(request_id, e)
+        return
+
+    api.respond(request_id, body)
+
+
+def run(api: RuntimeAPI, handler, formatter: JSONFormatter, max_invokes: int | None = None):
+    invokes = 0
+    while max_invokes is None or invokes < max_invokes:
+        event, context = api.next()
+        formatter.request_id = context.aws_request_id
+        try:
+            invoke(api, handler, event, context)
+        except Exception:
+            # e.g. the runtime API rejected the response.  Lambda fails the invocation when it
+            # times out, this instance keeps serving the next ones.
+            log.exception('Invocation not completed: %s', context.aws_request_id)
+            # Start the next request on a fresh connection
+            api.conn.close()
+        invokes += 1
+
+
+def init_logging() -> JSONFormatter:
+    formatter = JSONFormatter()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(environ.get('AWS_LAMBDA_LOG_LEVEL', 'INFO'))
+    return formatter
+
+
+def main(argv: list[str]):
+    handler_spec = argv[0]
+
+    if not (api_host := environ.get('AWS_LAMBDA_RUNTIME_API')):
+        # Not in Lambda, run under the emulator which provides the runtime API locally.
+        if not rie_fpath.exists():
+            sys.exit('AWS_LAMBDA_RUNTIME_API is not set and the runtime emulator was not found')
+        os.execv(rie_fpath, [rie_fpath, sys.executable, '-m', 'mu.runtime', handler_spec])
+
+    formatter = init_logging()
+    streaming.runtime_supported = True
+    api = RuntimeAPI(api_host)
+
+    try:
+        handler = load_handler(handler_spec)
+    except Exception as e:
+        log.exception(f'Loading handler failed: {handler_spec}')
+        api.init_error(e)
+        sys.exit(1)
+
+    run(api, handler, formatter)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,150 @@
+"""
+Streamed responses for WSGI apps behind a function URL with InvokeMode RESPONSE_STREAM.
+
+The WSGI response is written as the app produces it instead of being buffered, base64 encoded,
+and returned.  Lambda's python runtime doesn't stream responses, mu.runtime does.  A streamed HTTP
+response is a JSON prelude with the status and headers, eight null bytes, and then the body.
+"""
+
+from collections.abc import Callable, Iterable
+import json
+import logging
+from os import environ
+import threading
+
+from mu import responses
+
+
+log = logging.getLogger(__name__)
+
+
+# Content type of the streamed response Lambda expects for function URLs
+content_type = 'application/vnd.awslambda.http-integration-response'
+delimiter = b'\0' * 8
+
+# Set by mu.runtime, which knows how to send a StreamingResponse
+runtime_supported = False
+
+_warned = threading.Event()
+
+
+class Writer:
+    """Where streamed response bytes go, e.g. the runtime API."""
+
+    def write(self, data: bytes):
+        raise NotImplementedError
+
+    def close(self, exc: Exception | None = None):
+        raise NotImplementedError
+
+
+class MemoryWriter(Writer):
+    """Stand-in for the runtime API that keeps what's written.  For tests and local use."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.closed = False
+        self.exc: Exception | None = None
+
+    def write(self, data: bytes):
+        self.chunks.append(data)
+
+    def close(self, exc: Exception | None = None):
+        self.closed = True
+        self.exc = exc
+
+    def prelude(self) -> dict:
+        prelude, _ = b''.join(self.chunks).split(delimiter, 1)
+        return json.loads(prelude)
+
+    def body(self) -> bytes:
+        _, body = b''.join(self.chunks).split(delimiter, 1)
+        return body
+
+
+def function_url_event(event: dict) -> bool:
+    # API Gateway HTTP API events have the same format, only the domain tells them apart
+    return '.lambda-url.' in event.get('requestContext', {}).get('domainName', '')
+
+
+def enabled(event: dict) -> bool:
+    """
+    True when the event is from the function URL, streaming is configured for it, and the runtime
+    can stream.
+    """
+    if environ.get('MU_URL_STREAMING') != 'true' or not function_url_event(event):
+        return False
+
+    if not runtime_supported:
+        if not _warned.is_set():
+            _warned.set()
+            log.warning(
+                'MU_URL_STREAMING is set but the runtime is not mu.runtime, responses will not'
+                ' be streamed',
+            )
+        return False
+
+    return True
+
+
+def prelude(status_line: str, headers: list[tuple[str, str]]) -> bytes:
+    resp_headers, cookies = responses.split_cookies(headers)
+    data = {
+        'statusCode': int(status_line.split()[0]),
+        'headers': resp_headers,
+        'cookies': cookies,
+    }
+    return json.dumps(data).encode() + delimiter
+
+
+class StreamingResponse:
+    """A WSGI app's response to an event, written to a Writer as the app produces it."""
+
+    def __init__(self, app: Callable, event: dict, context):
+        # Part of awsgi2 but not its public API
+        from awsgi2.wsgienv import environ as wsgi_environ
+
+        self.app = app
+        self.environ = wsgi_environ(event, context)
+        self.status_line: str | None = None
+        self.headers: list[tuple[str, str]] = []
+        self.headers_sent = False
+        self.writer: Writer | None = None
+
+    def start_response(self, status: str, headers: list[tuple[str, str]], exc_info=None):
+        if exc_info and self.headers_sent:
+            # Too late to change the status, the error ends the stream.
+            raise exc_info[1].with_traceback(exc_info[2])
+
+        self.status_line = status
+        self.headers = headers
+        return self.write
+
+    def write(self, data: bytes):
+        if not self.headers_sent:
+            self.writer.write(prelude(self.status_line, self.headers))
+            self.headers_sent = True
+
+        if data:
+            self.writer.write(data)
+
+    def write_to(self, writer: Writer):
+        self.writer = writer
+        output: Iterable[bytes] = ()
+        try:
+            output = self.app(self.environ, self.start_response)
+            for chunk in output:
+                # WSGI: headers are sent with the first non-empty chunk
+                if chunk:
+                    self.write(chunk)
+
+            # Sends the prelude if the body was empty
+            self.write(b'')
+        except Exception as e:
+            writer.close(e)
+            raise
+        finally:
+            if hasattr(output, 'close'):
+                output.close()
+
+        writer.close()
@@ -1,18 +1,537 @@
+import atexit
+import base64
+from collections.abc import Callable, Iterable, Sequence
+import concurrent.futures as cf
+import copy
+from dataclasses import dataclass, field
 import datetime as dt
+from decimal import Decimal
+import functools
 import importlib
 import inspect
 import json
 import logging
 from os import environ
+import threading
+import time
+import traceback
+import uuid
+import zlib
 
-from mu.libs import auth
+from mu.libs import concurrent
 
 
 log = logging.getLogger(__name__)
 
+_clients: dict[tuple, object] = {}
+_clients_lock = threading.Lock()
 
-def client():
-    return auth.b3_sess().client('lambda')
+_local_executor = None
+_local_executor_lock = threading.Lock()
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+backends = ('lambda', 'thread', 'process')
+
+# Opt-in encoding for task args: compressed JSON which round trips the types handled by
+# json_tag().  The version marker lets the format change without breaking in-flight tasks.
+zjson_version = 'zjson1'
+encodings = ('json', 'zjson')
+
+# Payloads bigger than this are written to the tasks bucket and the task is sent a pointer to them.
+# Async invokes and SQS messages are limited to 256 KB, this leaves room for the rest of the
+# request.
+spillover_bytes = 240 * 1024
+
+# task path -> function, populated by @task
+_registry: dict[str, Callable] = {}
+
+expired_creds_codes = ('ExpiredToken', 'ExpiredTokenException', 'RequestExpired')
+
+
+class TaskInvokeError(Exception):
+    pass
+
+
+class TaskNotRegistered(Exception):
+    pass
+
+
+class TaskFailed(Exception):
+    pass
+
+
+# botocore and mu.libs.auth (boto3, mu.config) are imported when a client is first needed.  Apps
+# import this module for @task so it's part of every cold start, including ones that never invoke
+# a task.
+
+
+def b3_config():
+    import botocore.config
+
+    # Adaptive retries have the client slow itself down when Lambda starts throttling async
+    # invokes, which keeps large fan-outs from burning through their retries.  The connection pool
+    # needs to be at least as big as the number of threads used by invoke_many().
+    return botocore.config.Config(
+        retries={'total_max_attempts': 10, 'mode': 'adaptive'},
+        max_pool_connections=int(environ.get('MU_TASKS_MAX_POOL_CONNECTIONS', 25)),
+        tcp_keepalive=True,
+    )
+
+
+def client_key() -> tuple:
+    # In Lambda, region and credentials come from the environment.  A different access key means
+    # the credentials were rotated and the client needs to be recreated.
+    return (
+        environ.get('AWS_REGION') or environ.get('AWS_DEFAULT_REGION'),
+        environ.get('AWS_ACCESS_KEY_ID'),
+    )
+
+
+def client(service: str = 'lambda'):
+    """
+    AWS client shared by all tasks in the process.
+
+    Creating a session and client is expensive (loads the service model, opens a new connection)
+    so clients are cached and reused.  boto3 clients are thread safe.
+    """
+    key = (service, *client_key())
+    if (b3c := _clients.get(key)) is not None:
+        return b3c
+
+    from mu.libs import auth
+
+    with _clients_lock:
+        if (b3c := _clients.get(key)) is None:
+            b3c = _clients[key] = auth.b3_sess().client(service, config=b3_config())
+        return b3c
+
+
+def clients_clear():
+    with _clients_lock:
+        _clients.clear()
+
+
+def client_call(service: str, method_name: str, **kwargs) -> dict:
+    from botocore.exceptions import ClientError
+
+    try:
+        return getattr(client(service), method_name)(**kwargs)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in expired_creds_codes:
+            raise
+
+    log.info(f'AWS credentials expired, recreating {service} client')
+    clients_clear()
+    return getattr(client(service), method_name)(**kwargs)
+
+
+def json_tag(value):
+    # datetime is a subclass of date so needs to be checked first
+    if isinstance(value, dt.datetime):
+        return {'__mu__': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, dt.date):
+        return {'__mu__': 'date', 'value': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__mu__': 'decimal', 'value': str(value)}
+    if isinstance(value, uuid.UUID):
+        return {'__mu__': 'uuid', 'value': str(value)}
+    if isinstance(value, set | frozenset):
+        return {'__mu__': 'set', 'value': list(value)}
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def json_untag(obj: dict):
+    match obj.get('__mu__'):
+        case None:
+            return obj
+        case 'datetime':
+            return dt.datetime.fromisoformat(obj['value'])
+        case 'date':
+            return dt.date.fromisoformat(obj['value'])
+        case 'decimal':
+            return Decimal(obj['value'])
+        case 'uuid':
+            return uuid.UUID(obj['value'])
+        case 'set':
+            return set(obj['value'])
+        case tag:
+            raise ValueError(f'Unknown tagged JSON type: {tag}')
+
+
+def zjson_encode(data) -> str:
+    data_json = json.dumps(data, default=json_tag, separators=(',', ':'))
+    return base64.b64encode(zlib.compress(data_json.encode())).decode()
+
+
+def zjson_decode(data: str):
+    return json.loads(zlib.decompress(base64.b64decode(data)), object_hook=json_untag)
+
+
+def payload_args(event: dict) -> tuple[list, dict]:
+    """Args and kwargs from a task payload, decoding them if needed."""
+    encoding = event.get('task-enc')
+    if encoding is None:
+        return event['args'], event['kwargs']
+
+    if encoding != zjson_version:
+        raise ValueError(f'Unknown task encoding: {encoding}')
+
+    data = zjson_decode(event['task-data'])
+    return data['args'], data['kwargs']
+
+
+def spilled_payload(pointer: dict) -> dict:
+    resp = client_call('s3', 'get_object', Bucket=pointer['bucket'], Key=pointer['key'])
+    # Parse from the response's stream instead of reading it into a string first.
+    return json.load(resp['Body'])
+
+
+def backend() -> str:
+    """
+    How tasks get run, from MU_TASKS_BACKEND:
+
+    - lambda: (default) async invoke of the lambda or send to the task's queue
+    - thread: in this process with a thread pool
+    - process: on this machine with a process pool
+    """
+    name = environ.get('MU_TASKS_BACKEND') or 'lambda'
+    if name not in backends:
+        raise ValueError(f'MU_TASKS_BACKEND should be one of {backends}, not: {name}')
+    return name
+
+
+class LocalExecutor:
+    """
+    Run tasks in a local worker pool instead of going over the network.  Intended for local
+    development and for deployments where the worker is co-located with the app.
+    """
+
+    def __init__(self, kind: str, max_workers: int | None = None):
+        exec_cls = cf.ThreadPoolExecutor if kind == 'thread' else cf.ProcessPoolExecutor
+        self.kind = kind
+        self.executor = exec_cls(max_workers=max_workers)
+
+    def submit(self, message: str) -> cf.Future:
+        # The message is decoded the same way it would be in the lambda so tasks don't behave
+        # differently locally.
+        event = json.loads(message)
+        future = self.executor.submit(call_task, event)
+        future.add_done_callback(functools.partial(self.log_failure, event['task-path']))
+        return future
+
+    @staticmethod
+    def log_failure(task_path: str, future: cf.Future):
+        if not future.cancelled() and (exc := future.exception()):
+            log.error(f'Local task failed: {task_path}', exc_info=exc)
+
+    def shutdown(self, wait: bool = True):
+        """Drain: wait for submitted tasks to finish before shutting down the pool."""
+        self.executor.shutdown(wait=wait)
+
+
+def local_executor() -> LocalExecutor:
+    global _local_executor
+
+    with _local_executor_lock:
+        if _local_executor is None:
+            workers = environ.get('MU_TASKS_WORKERS')
+            _local_executor = LocalExecutor(backend(), int(workers) if workers else None)
+        return _local_executor
+
+
+@atexit.register
+def local_shutdown(wait: bool = True):
+    global _local_executor
+
+    with _local_executor_lock:
+        if _local_executor is not None:
+            log.info('Waiting for local tasks to finish...')
+            _local_executor.shutdown(wait=wait)
+            _local_executor = None
+
+
+@dataclass
+class TaskResult:
+    id: str
+    task_path: str
+    # succeeded or failed
+    status: str
+    duration: float
+    result: object = None
+    # Exception type, message, and traceback when the task failed
+    error: dict | None = None
+
+    @property
+    def failed(self):
+        return self.status == 'failed'
+
+    def value(self):
+        if self.failed:
+            raise TaskFailed(f'{self.task_path}: {self.error["type"]}: {self.error["message"]}')
+        return self.result
+
+
+class MemoryResults:
+    """
+    Results kept in this process.  Intended for tests and the thread backend.  Tasks run by the
+    process backend or the lambda can't see it.
+    """
+
+    def __init__(self):
+        self.recs: dict[str, TaskResult] = {}
+        self.joined: dict[str, set[str]] = {}
+        self.claimed: set[str] = set()
+        self.lock = threading.Lock()
+
+    def put(self, rec: TaskResult):
+        self.recs[rec.id] = rec
+
+    def get_many(self, ids: Iterable[str]) -> dict[str, TaskResult]:
+        return {id: self.recs[id] for id in ids if id in self.recs}
+
+    def join(self, key: str, member: str) -> int:
+        """Add member to the set at key and return how many distinct members have joined."""
+        with self.lock:
+            members = self.joined.setdefault(key, set())
+            members.add(member)
+            return len(members)
+
+    def claim(self, key: str) -> bool:
+        """True for only the first caller to claim the key."""
+        with self.lock:
+            if key in self.claimed:
+                return False
+            self.claimed.add(key)
+            return True
+
+
+class DynamoResults:
+    """Results kept in the DynamoDB table provisioned when tasks-results is configured."""
+
+    # Limit for batch_get_item()
+    batch_size = 100
+    # Results are removed by the table's TTL after this many seconds
+    keep_secs = 7 * 24 * 60 * 60
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+
+    def expires_at(self) -> dict:
+        return {'N': str(int(time.time()) + self.keep_secs)}
+
+    def put(self, rec: TaskResult):
+        data = {'result': rec.result, 'error': rec.error}
+        client_call(
+            'dynamodb',
+            'put_item',
+            TableName=self.table_name,
+            Item={
+                'id': {'S': rec.id},
+                'task_path': {'S': rec.task_path},
+                'status': {'S': rec.status},
+                'duration': {'N': str(rec.duration)},
+                'data': {'S': json.dumps(data, default=json_tag)},
+                'expires_at': self.expires_at(),
+            },
+        )
+
+    @staticmethod
+    def from_item(item: dict) -> TaskResult:
+        data = json.loads(item['data']['S'], object_hook=json_untag)
+        return TaskResult(
+            id=item['id']['S'],
+            task_path=item['task_path']['S'],
+            status=item['status']['S'],
+            duration=float(item['duration']['N']),
+            result=data['result'],
+            error=data['error'],
+        )
+
+    def get_many(self, ids: Iterable[str]) -> dict[str, TaskResult]:
+        ids = list(ids)
+        retval = {}
+        for start in range(0, len(ids), self.batch_size):
+            request = {
+                self.table_name: {
+                    'Keys': [{'id': {'S': id}} for id in ids[start : start + self.batch_size]],
+                    'ConsistentRead': True,
+                },
+            }
+            while request:
+                resp = client_call('dynamodb', 'batch_get_item', RequestItems=request)
+                for item in resp['Responses'].get(self.table_name, ()):
+                    rec = self.from_item(item)
+                    retval[rec.id] = rec
+                request = resp.get('UnprocessedKeys')
+
+        return retval
+
+    def join(self, key: str, member: str) -> int:
+        """Add member to the set at key and return how many distinct members have joined."""
+        # A set, not a counter, so a task that's retried after it joined isn't counted twice.
+        resp = client_call(
+            'dynamodb',
+            'update_item',
+            TableName=self.table_name,
+            Key={'id': {'S': key}},
+            UpdateExpression='ADD members :member SET expires_at = :expires_at',
+            ExpressionAttributeValues={
+                ':member': {'SS': [member]},
+                ':expires_at': self.expires_at(),
+            },
+            ReturnValues='UPDATED_NEW',
+        )
+        return len(resp['Attributes']['members']['SS'])
+
+    def claim(self, key: str) -> bool:
+        """True for only the first caller to claim the key."""
+        from botocore.exceptions import ClientError
+
+        try:
+            client_call(
+                'dynamodb',
+                'update_item',
+                TableName=self.table_name,
+                Key={'id': {'S': key}},
+                UpdateExpression='SET claimed = :claimed',
+                ConditionExpression='attribute_not_exists(claimed)',
+                ExpressionAttributeValues={':claimed': {'BOOL': True}},
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+
+def results_store() -> MemoryResults | DynamoResults | None:
+    """
+    Where task results are kept, from MU_TASKS_RESULTS:
+
+    - unset: results aren't kept
+    - memory: in this process
+    - dynamodb: in the table named by MU_TASKS_RESULTS_TABLE
+    """
+    global _results_store
+
+    kind = environ.get('MU_TASKS_RESULTS')
+    if not kind:
+        return None
+
+    with _results_store_lock:
+        if _results_store is None:
+            if kind == 'memory':
+                _results_store = MemoryResults()
+            elif kind == 'dynamodb':
+                _results_store = DynamoResults(environ['MU_TASKS_RESULTS_TABLE'])
+            else:
+                raise ValueError(f'MU_TASKS_RESULTS should be memory or dynamodb, not: {kind}')
+        return _results_store
+
+
+def results_store_req() -> MemoryResults | DynamoResults:
+    if (store := results_store()) is None:
+        raise RuntimeError('Task results need MU_TASKS_RESULTS to be configured')
+    return store
+
+
+def results_store_clear():
+    global _results_store
+
+    with _results_store_lock:
+        _results_store = None
+
+
+def wait_all(
+    handles: Iterable['TaskHandle'],
+    timeout: float | None = None,
+    poll_secs: float = 0.25,
+) -> dict[str, TaskResult]:
+    """
+    Wait for all the tasks to finish and return their results by handle id.  Raises TimeoutError
+    if they aren't all done before the timeout.
+    """
+    store = results_store_req()
+    pending = {handle.id for handle in handles}
+    results = {}
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while True:
+        results.update(store.get_many(pending))
+        pending.difference_update(results)
+        if not pending:
+            return results
+
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f'{len(pending)} tasks not finished after {timeout}s')
+        time.sleep(poll_secs)
+
+
+@dataclass
+class TaskHandle:
+    task_path: str
+    id: str
+    # Lambda request ID or SQS message ID.  None for tasks run locally.
+    request_id: str | None = None
+
+    def poll(self) -> TaskResult | None:
+        """The task's result if it has finished, else None."""
+        return results_store_req().get_many([self.id]).get(self.id)
+
+    def done(self) -> bool:
+        return self.poll() is not None
+
+    def result(self, timeout: float | None = None, poll_secs: float = 0.25):
+        """Wait for the task and return its return value.  Raises TaskFailed if it failed."""
+        return wait_all([self], timeout, poll_secs)[self.id].value()
+
+
+def record_result(
+    task_id: str | None,
+    task_path: str,
+    started: float,
+    *,
+    result=None,
+    exc: Exception | None = None,
+):
+    if task_id is None or (store := results_store()) is None:
+        return
+
+    error = None
+    if exc is not None:
+        error = {
+            'type': type(exc).__name__,
+            'message': str(exc),
+            'traceback': ''.join(traceback.format_exception(exc)),
+        }
+
+    rec = TaskResult(
+        id=task_id,
+        task_path=task_path,
+        status='failed' if exc else 'succeeded',
+        duration=time.perf_counter() - started,
+        result=result,
+        error=error,
+    )
+    try:
+        store.put(rec)
+    except Exception as e:
+        # Raising would have the task retried even though it ran.  Record that the result was
+        # lost instead, e.g. it isn't serializable or is too big for the results table.
+        log.exception(f'Task result not recorded: {task_path}; Task ID: {task_id}')
+        rec.status = 'failed'
+        rec.result = None
+        rec.error = {
+            'type': 'ResultNotRecorded',
+            'message': f'{type(e).__name__}: {e}',
+            'traceback': ''.join(traceback.format_exception(e)),
+        }
+        try:
+            store.put(rec)
+        except Exception:
+            log.exception(f'Task result marker not recorded: {task_path}; Task ID: {task_id}')
 
 
 def func_task_path(func):
@@ -22,36 +541,132 @@ def func_task_path(func):
 
 
 class AsyncTask:
-    def __init__(self, func, *, lambda_func=None):
+    # SQS limits for send_message_batch(): message count and the total size of the messages
+    queue_batch_size = 10
+    queue_batch_bytes = 256 * 1024
+
+    def __init__(self, func, *, lambda_func=None, queue=None, encoding='json'):
+        if encoding not in encodings:
+            raise ValueError(f'encoding should be one of {encodings}, not: {encoding}')
+
         self.func = func
+        self.task_path = func_task_path(func)
         self._lambda_func = lambda_func
+        # Name of a queue listed in the task-queues config.  When given, tasks are sent through the
+        # queue instead of invoking the lambda directly.
+        self.queue = queue
+        # zjson: compress args to fit more under the invoke/message size limits and round trip
+        # dates, datetimes, decimals, UUIDs, and sets.
+        self.encoding = encoding
 
     @property
     def lambda_func(self):
         return self._lambda_func or environ['AWS_LAMBDA_FUNCTION_NAME']
 
-    def payload(self, args, kwargs):
-        return {
-            'task-path': func_task_path(self.func),
-            'args': args,
-            'kwargs': kwargs,
-        }
+    @property
+    def queue_name(self):
+        # Matches the naming used by SQS.sync_config()
+        return f'{environ["MU_RESOURCE_IDENT"]}-{self.queue}'
+
+    @functools.cached_property
+    def queue_url(self):
+        return client_call('sqs', 'get_queue_url', QueueName=self.queue_name)['QueueUrl']
+
+    def s(self, *args, **kwargs) -> 'Signature':
+        """A call of this task that can be used in a chain, group, or chord."""
+        return Signature(self.task_path, args, kwargs)
+
+    def payload(self, args, kwargs, task_id: str | None = None, flow: dict | None = None):
+        # Only needed, and so only sent, when results are being kept
+        task_id = {'task-id': task_id} if task_id else {}
+        # What to do after the task succeeds when it's part of a chain or chord
+        flow = flow or {}
+
+        if self.encoding == 'zjson':
+            return (
+                {
+                    'task-path': self.task_path,
+                    'task-enc': zjson_version,
+                    'task-data': zjson_encode({'args': args, 'kwargs': kwargs}),
+                }
+                | task_id
+                | flow
+            )
 
-    def invoke(self, *args, **kwargs):
-        payload = self.payload(args, kwargs)
-        task_path = payload['task-path']
+        return (
+            {
+                'task-path': self.task_path,
+                'args': args,
+                'kwargs': kwargs,
+            }
+            | task_id
+            | flow
+        )
+
+    def message(self, args, kwargs, task_id: str | None = None, flow: dict | None = None) -> str:
+        return json.dumps(self.payload(args, kwargs, task_id, flow), default=self.json_dump)
+
+    def new_handle(self) -> TaskHandle:
+        return TaskHandle(self.task_path, uuid.uuid4().hex)
+
+    def handle_message(self, handle: TaskHandle, args, kwargs, flow: dict | None = None) -> str:
+        task_id = handle.id if results_store() else None
+        return self.message(args, kwargs, task_id, flow)
+
+    def outgoing(self, handle: TaskHandle, args, kwargs, flow: dict | None = None) -> str:
+        """The message to send, spilling it over to S3 if it's too big to send directly."""
+        message = self.handle_message(handle, args, kwargs, flow)
+        message_bytes = message.encode()
+        if len(message_bytes) <= int(environ.get('MU_TASKS_SPILLOVER_BYTES', spillover_bytes)):
+            return message
+
+        bucket = environ.get('MU_TASKS_BUCKET')
+        if not bucket:
+            log.warning(
+                f'Task payload is {len(message_bytes)} bytes but no tasks bucket is configured:'
+                f' {self.task_path}',
+            )
+            return message
 
-        result = self.response = client().invoke(
+        key = f'tasks/{self.task_path}/{uuid.uuid4().hex}.json'
+        client_call('s3', 'put_object', Bucket=bucket, Key=key, Body=message_bytes)
+        log.info(f'Task payload spilled over: {len(message_bytes)} bytes -> s3://{bucket}/{key}')
+
+        return json.dumps(
+            {'task-path': self.task_path, 'task-s3': {'bucket': bucket, 'key': key}},
+        )
+
+    def _invoke(
+        self,
+        args,
+        kwargs,
+        handle: TaskHandle | None = None,
+        flow: dict | None = None,
+    ) -> TaskHandle:
+        # Chains and chords give the handle so its id is known before the task is invoked
+        handle = handle or self.new_handle()
+
+        if backend() != 'lambda':
+            return self._run_local(handle, args, kwargs, flow)
+
+        if self.queue:
+            return self._enqueue(handle, args, kwargs, flow)
+
+        task_path = self.task_path
+
+        result = client_call(
+            'lambda',
+            'invoke',
             FunctionName=self.lambda_func,
             InvocationType='Event',
-            Payload=json.dumps(payload, default=self.json_dump),
+            Payload=self.outgoing(handle, args, kwargs, flow),
         )
         if result['StatusCode'] == 202:
-            req_id = result['ResponseMetadata']['RequestId']
+            handle.request_id = req_id = result['ResponseMetadata']['RequestId']
             log.info(
                 f'Async task invoke: {self.lambda_func} -> {task_path}; Request ID: {req_id}',
             )
-            return
+            return handle
 
         log.error(
             f'Invoking task {task_path} failed',
@@ -60,17 +675,196 @@ class AsyncTask:
                 'LogResult': result.get('LogResult'),
             },
         )
+        raise TaskInvokeError(f'Invoking task {task_path} failed: {result["StatusCode"]}')
+
+    def _run_local(self, handle: TaskHandle, args, kwargs, flow: dict | None) -> TaskHandle:
+        executor = local_executor()
+        executor.submit(self.handle_message(handle, args, kwargs, flow))
+        log.info(
+            f'Async task submitted: {executor.kind} -> {self.task_path}; Task ID: {handle.id}',
+        )
+        return handle
+
+    def _enqueue(self, handle: TaskHandle, args, kwargs, flow: dict | None) -> TaskHandle:
+        task_path = self.task_path
+
+        result = client_call(
+            'sqs',
+            'send_message',
+            QueueUrl=self.queue_url,
+            MessageBody=self.outgoing(handle, args, kwargs, flow),
+        )
+        handle.request_id = msg_id = result['MessageId']
+        log.info(f'Async task queued: {self.queue_name} -> {task_path}; Message ID: {msg_id}')
+        return handle
+
+    def _enqueue_batch(
+        self,
+        messages: dict[int, tuple[TaskHandle, str]],
+    ) -> dict[int, TaskHandle | Exception]:
+        task_path = self.task_path
+
+        result = client_call(
+            'sqs',
+            'send_message_batch',
+            QueueUrl=self.queue_url,
+            Entries=[
+                {'Id': str(ident), 'MessageBody': body} for ident, (_, body) in messages.items()
+            ],
+        )
+
+        sent = {}
+        for rec in result.get('Successful', ()):
+            handle = sent[int(rec['Id'])] = messages[int(rec['Id'])][0]
+            handle.request_id = rec['MessageId']
+
+        failed = {
+            int(rec['Id']): TaskInvokeError(
+                f'Queueing task {task_path} failed: {rec["Code"]} {rec.get("Message", "")}',
+            )
+            for rec in result.get('Failed', ())
+        }
+        log.info(
+            f'Async task batch queued: {self.queue_name} -> {task_path};'
+            f' {len(sent)} sent, {len(failed)} failed',
+        )
+        return sent | failed
+
+    def batches(self, messages: dict[int, tuple[TaskHandle, str]]) -> list[dict]:
+        """
+        Pack messages into batches within SQS's count and total size limits.  Each message is
+        already under the size limit, see outgoing(), but a batch of them might not be.
+        """
+        batches = []
+        batch, batch_bytes = {}, 0
+        for ident, (handle, body) in messages.items():
+            body_bytes = len(body.encode())
+            full = len(batch) == self.queue_batch_size
+            if batch and (full or batch_bytes + body_bytes > self.queue_batch_bytes):
+                batches.append(batch)
+                batch, batch_bytes = {}, 0
+            batch[ident] = (handle, body)
+            batch_bytes += body_bytes
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _enqueue_many(self, calls: dict[int, tuple], max_workers: int):
+        results = []
+
+        # The messages are needed up front to pack them into batches by size.  Spilling them over
+        # to S3 is done concurrently.
+        handles = {ident: handle or self.new_handle() for ident, (_, _, handle, _) in calls.items()}
+        messages = {}
+        with concurrent.thread_futures(
+            self.outgoing,
+            {
+                ident: (handles[ident], args, kwargs, flow)
+                for ident, (args, kwargs, _, flow) in calls.items()
+            },
+            max_workers=max_workers,
+            cancel_on_exc=False,
+        ) as outgoing_results:
+            for outgoing in outgoing_results:
+                if outgoing.exc:
+                    results.append(outgoing)
+                else:
+                    messages[outgoing.ident] = (handles[outgoing.ident], outgoing.rec)
+
+        # Keep the order of calls for packing
+        messages = {ident: messages[ident] for ident in calls if ident in messages}
+        batches = {batch_num: (batch,) for batch_num, batch in enumerate(self.batches(messages))}
+
+        with concurrent.thread_futures(
+            self._enqueue_batch,
+            batches,
+            max_workers=max_workers,
+            cancel_on_exc=False,
+        ) as batch_results:
+            for batch_result in batch_results:
+                if batch_result.exc:
+                    idents = batches[batch_result.ident][0]
+                    results.extend(
+                        concurrent.FutureResult(ident, exc=batch_result.exc) for ident in idents
+                    )
+                    continue
+
+                results.extend(
+                    concurrent.FutureResult(ident, exc=value)
+                    if isinstance(value, Exception)
+                    else concurrent.FutureResult(ident, value)
+                    for ident, value in batch_result.rec.items()
+                )
+
+        return results
+
+    def invoke(self, *args, **kwargs) -> TaskHandle | None:
+        try:
+            return self._invoke(args, kwargs)
+        except TaskInvokeError:
+            # Already logged
+            return None
+
+    def invoke_many(
+        self,
+        calls: Iterable[tuple[Sequence, dict]],
+        *,
+        max_workers: int = 20,
+    ) -> list[concurrent.FutureResult]:
+        """
+        Invoke the task once for each (args, kwargs) pair in calls.
+
+        Invokes are dispatched concurrently from a thread pool sharing the cached client.  Results
+        are returned in the same order as calls.  FutureResult.ident is the index of the call,
+        FutureResult.rec is the task's TaskHandle and FutureResult.exc is set if the invoke
+        failed.  A failed invoke doesn't stop the others from being dispatched.
+
+        Queued tasks are sent in batches of up to ten messages per API call, fewer when the
+        messages are big.
+        """
+        calls = {ident: (args, kwargs, None, None) for ident, (args, kwargs) in enumerate(calls)}
+        return self._invoke_many(calls, max_workers)
+
+    def _invoke_many(
+        self,
+        calls: dict[int, tuple[Sequence, dict, TaskHandle | None, dict | None]],
+        max_workers: int,
+    ) -> list[concurrent.FutureResult]:
+        # calls values are the args for _invoke()
+        if self.queue and backend() == 'lambda':
+            results = self._enqueue_many(calls, max_workers)
+        else:
+            with concurrent.thread_futures(
+                self._invoke,
+                calls,
+                max_workers=max_workers,
+                cancel_on_exc=False,
+            ) as results:
+                results = list(results)
+
+        results.sort(key=lambda result: result.ident)
+
+        failed = sum(1 for result in results if result.exc)
+        log.info(
+            f'Async task invoke many: {self.task_path};'
+            f' {len(results) - failed} invoked, {failed} failed',
+        )
+        return results
 
     def json_dump(self, value):
         if isinstance(value, dt.date | dt.datetime):
             return value.isoformat()
-        return json.dumps(value)
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
 
 
 def task(func=None, **kwargs):
     def decorator(func):
         func._mu_task = at = AsyncTask(func, **kwargs)
+        _registry[at.task_path] = func
         func.invoke = at.invoke
+        func.invoke_many = at.invoke_many
+        func.s = at.s
         return func
 
     # Called as @task?
@@ -84,15 +878,242 @@ def task(func=None, **kwargs):
     return wrapper
 
 
+def task_func(task_path: str) -> Callable:
+    """
+    Resolve the task path to its function.  Only functions decorated with @task can be called.
+    """
+    if (function := _registry.get(task_path)) is not None:
+        return function
+
+    # Task modules usually won't have been imported yet on a cold start.  Importing the module
+    # runs its @task decorators.
+    mod_path = task_path.rsplit(':', 1)[0]
+    importlib.import_module(mod_path)
+
+    if (function := _registry.get(task_path)) is not None:
+        return function
+
+    raise TaskNotRegistered(f'Not a registered task: {task_path}')
+
+
+@dataclass
+class Signature:
+    """A task and the args to call it with.  Create with the task's s(), e.g. my_task.s(1, 2)."""
+
+    task_path: str
+    args: Sequence = ()
+    kwargs: dict = field(default_factory=dict)
+
+    @property
+    def async_task(self) -> AsyncTask:
+        return task_func(self.task_path)._mu_task
+
+    def link(self, task_id: str) -> dict:
+        """Serialized for sending in another task's payload."""
+        return {
+            'task-path': self.task_path,
+            'args': list(self.args),
+            'kwargs': self.kwargs,
+            'id': task_id,
+        }
+
+    def invoke(self) -> TaskHandle | None:
+        return self.async_task.invoke(*self.args, **self.kwargs)
+
+
+def invoke_link(link: dict, result, links: Sequence[dict] = ()) -> TaskHandle:
+    """Invoke a linked task with the result of the previous one prepended to its args."""
+    sig = Signature(link['task-path'], link['args'], link['kwargs'])
+    # The result can be anything the previous task returned, e.g. a Decimal from DynamoDB.  Send
+    # it with the encoding that round trips those types.
+    async_task = copy.copy(sig.async_task)
+    async_task.encoding = 'zjson'
+    return async_task._invoke(
+        (result, *sig.args),
+        sig.kwargs,
+        TaskHandle(sig.task_path, link['id']),
+        {'task-links': list(links)} if links else None,
+    )
+
+
+class Chain:
+    """
+    Tasks called one after the other.  Each task is invoked by the previous one when it succeeds
+    and is given its result as the first arg.  A failed task ends the chain.
+    """
+
+    def __init__(self, *sigs: Signature):
+        if not sigs:
+            raise ValueError('A chain needs at least one task')
+        self.sigs = sigs
+
+    def invoke(self) -> TaskHandle:
+        """Invoke the first task and return the handle of the last one."""
+        chain_id = uuid.uuid4().hex
+        ids = [f'{chain_id}-{num}' for num in range(len(self.sigs))]
+
+        first, *rest = self.sigs
+        links = [sig.link(task_id) for sig, task_id in zip(rest, ids[1:], strict=True)]
+        first.async_task._invoke(
+            first.args,
+            first.kwargs,
+            TaskHandle(first.task_path, ids[0]),
+            {'task-links': links} if links else None,
+        )
+        log.info(f'Task chain invoked: {" -> ".join(sig.task_path for sig in self.sigs)}')
+
+        return TaskHandle(self.sigs[-1].task_path, ids[-1])
+
+
+class Group:
+    """Tasks called concurrently."""
+
+    def __init__(self, sigs: Iterable[Signature]):
+        self.sigs = list(sigs)
+
+    def _invoke(
+        self,
+        max_workers: int,
+        ids: Sequence[str] | None = None,
+        flow: dict | None = None,
+    ) -> list[concurrent.FutureResult]:
+        # Calls of the same task go through invoke_many() together so queued tasks get batched.
+        by_task: dict[str, dict[int, tuple]] = {}
+        for num, sig in enumerate(self.sigs):
+            handle = TaskHandle(sig.task_path, ids[num]) if ids else None
+            by_task.setdefault(sig.task_path, {})[num] = (sig.args, sig.kwargs, handle, flow)
+
+        results = []
+        for calls in by_task.values():
+            sig = self.sigs[next(iter(calls))]
+            results.extend(sig.async_task._invoke_many(calls, max_workers))
+
+        results.sort(key=lambda result: result.ident)
+        return results
+
+    def invoke(self, *, max_workers: int = 20) -> list[concurrent.FutureResult]:
+        """Invoke all the tasks.  Results are like those from AsyncTask.invoke_many()."""
+        return self._invoke(max_workers)
+
+
+class Chord:
+    """
+    A group of tasks and a callback called once they have all succeeded.  The callback is given a
+    list of the group's results, in order, as its first arg.
+
+    Tasks record joining the chord in the results store and the last one to join invokes the
+    callback.  If a task fails for good, the callback is never called.
+    """
+
+    def __init__(self, header: Group | Iterable[Signature], callback: Signature):
+        self.header = header if isinstance(header, Group) else Group(header)
+        self.callback = callback
+
+    def invoke(self, *, max_workers: int = 20) -> TaskHandle:
+        """Invoke the group and return the handle of the callback."""
+        # The group's results are needed for the callback
+        results_store_req()
+
+        chord_id = uuid.uuid4().hex
+        callback_id = f'{chord_id}-callback'
+        size = len(self.header.sigs)
+
+        if not size:
+            return invoke_link(self.callback.link(callback_id), [])
+
+        flow = {
+            'task-chord': {
+                'id': chord_id,
+                'size': size,
+                'callback': self.callback.link(callback_id),
+            },
+        }
+        results = self.header._invoke(max_workers, chord_member_ids(chord_id, size), flow)
+
+        if failed := sum(1 for result in results if result.exc):
+            log.error(f'Task chord invoke failed: {failed} of {size} tasks failed to invoke')
+            raise TaskInvokeError(
+                f'{failed} of {size} chord tasks failed to invoke, {self.callback.task_path}'
+                ' will not be called',
+            )
+
+        log.info(f'Task chord invoked: {size} tasks -> {self.callback.task_path}')
+        return TaskHandle(self.callback.task_path, callback_id)
+
+
+def chain(*sigs: Signature) -> Chain:
+    return Chain(*sigs)
+
+
+def group(sigs: Iterable[Signature]) -> Group:
+    return Group(sigs)
+
+
+def chord(header: Group | Iterable[Signature], callback: Signature) -> Chord:
+    return Chord(header, callback)
+
+
+def chord_member_ids(chord_id: str, size: int) -> list[str]:
+    return [f'{chord_id}-{num}' for num in range(size)]
+
+
+def chord_join(chord: dict, task_id: str | None):
+    """Record the task finished and invoke the callback if it's the last in the chord."""
+    store = results_store_req()
+    key = f'chord-{chord["id"]}'
+    size = chord['size']
+
+    if task_id is None:
+        raise RuntimeError(f'Task in chord {chord["id"]} was not given a task ID')
+
+    joined = store.join(key, task_id)
+    if joined < size or not store.claim(key):
+        return
+
+    ids = chord_member_ids(chord['id'], size)
+    results = store.get_many(ids)
+    values = [results[id].value() for id in ids]
+
+    log.info(f'Task chord complete: {chord["id"]} -> {chord["callback"]["task-path"]}')
+    invoke_link(chord['callback'], values)
+
+
+def continue_flow(event: dict, task_id: str | None, result):
+    """Invoke whatever comes after the task in a chain or chord."""
+    if links := event.get('task-links'):
+        invoke_link(links[0], result, links[1:])
+
+    if chord := event.get('task-chord'):
+        chord_join(chord, task_id)
+
+
 def call_task(event: dict):
     task_path: str = event['task-path']
-    args: list = event['args']
-    kwargs: dict = event['kwargs']
+    spill_pointer: dict | None = event.get('task-s3')
+    if spill_pointer:
+        event = spilled_payload(spill_pointer)
+
+    args, kwargs = payload_args(event)
+    task_id: str | None = event.get('task-id')
+
+    function = task_func(task_path)
+
+    log.info('Task called: %s', task_path)
+    log.debug('Task event: %s', event)
+
+    started = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    except Exception as e:
+        record_result(task_id, task_path, started, exc=e)
+        raise
 
-    mod_path, func_name = task_path.rsplit(':', 1)
-    module = importlib.import_module(mod_path)
-    function = getattr(module, func_name)
+    record_result(task_id, task_path, started, result=result)
+    continue_flow(event, task_id, result)
 
-    log.info(f'Task called: {task_path}\n%s', event)
+    if spill_pointer:
+        # Only after success so retries can still get the payload.  The bucket's lifecycle rule
+        # cleans up after failures.
+        client_call('s3', 'delete_object', Bucket=spill_pointer['bucket'], Key=spill_pointer['key'])
 
-    return function(*args, **kwargs)
+    return result
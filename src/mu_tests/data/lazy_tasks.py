@@ -0,0 +1,8 @@
+"""Only imported by TestCallTask.test_lazy_import()"""
+
+from mu import tasks
+
+
+@tasks.task
+def warp_speed(factor):
+    return f'warp {factor}'
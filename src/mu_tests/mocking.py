@@ -108,6 +108,18 @@ class GatewayStubs:
     def delete_api(self, **kwargs):
         return self.apis.delete('delete_api', kwargs)
 
+    def get_integrations(self, **kwargs):
+        # The API's quick create integration, invoking the Target it was created with
+        self.apis.calls.append(('get_integrations', kwargs))
+        rec = self.apis.recs[kwargs['ApiId']]
+        return {
+            'Items': [{'IntegrationId': 'fake-int-id', 'IntegrationUri': rec.get('Target')}],
+        }
+
+    def update_integration(self, **kwargs):
+        self.apis.calls.append(('update_integration', kwargs))
+        self.apis.recs[kwargs['ApiId']]['Target'] = kwargs['IntegrationUri']
+
     def fake_domain_name(self, kwargs):
         kwargs = kwargs.copy()
         dnc = 'DomainNameConfigurations'
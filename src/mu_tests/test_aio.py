@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from mu import aio
+
+
+class TestAio:
+    def teardown_method(self):
+        aio.close()
+
+    def test_loop_persists(self):
+        async def loop_id():
+            return id(asyncio.get_running_loop())
+
+        assert aio.run(loop_id()) == aio.run(loop_id())
+
+        first = aio.loop()
+        aio.close()
+        assert first.is_closed()
+        assert aio.loop() is not first
+
+    def test_gather_limit(self):
+        running = []
+        peak = []
+
+        async def fetch(ident):
+            running.append(ident)
+            peak.append(len(running))
+            await asyncio.sleep(0)
+            running.remove(ident)
+            return ident
+
+        assert aio.run(aio.gather(*(fetch(i) for i in range(5)), limit=2)) == [0, 1, 2, 3, 4]
+        assert max(peak) == 2
+
+    def test_gather_exceptions(self):
+        async def fail():
+            raise ValueError('Shields down')
+
+        async def ok():
+            return 'ok'
+
+        results = aio.run(aio.gather(ok(), fail(), limit=1, return_exceptions=True))
+        assert results[0] == 'ok'
+        assert isinstance(results[1], ValueError)
+
+        with pytest.raises(ValueError, match='Shields down'):
+            aio.run(aio.gather(ok(), fail()))
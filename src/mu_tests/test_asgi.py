@@ -0,0 +1,188 @@
+import base64
+import json
+
+import pytest
+
+from mu import ActionHandler, aio, asgi
+from mu.libs.testing import Logs
+from mu_tests.data.event_wsgi import wsgi_event
+
+
+class App:
+    """Minimal ASGI app that echos the request and counts what it's called with."""
+
+    def __init__(self, lifespan=True):
+        self.lifespan = lifespan
+        self.startups = 0
+        self.shutdowns = 0
+        self.loops = set()
+
+    async def __call__(self, scope, receive, send):
+        import asyncio
+
+        self.loops.add(id(asyncio.get_running_loop()))
+
+        if scope['type'] == 'lifespan':
+            if not self.lifespan:
+                raise ValueError('Unsupported scope type: lifespan')
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    self.startups += 1
+                    scope['state']['pool'] = 'db-pool'
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    self.shutdowns += 1
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        request = await receive()
+        if scope['path'] == '/logo.png':
+            await send(
+                {
+                    'type': 'http.response.start',
+                    'status': 200,
+                    'headers': [(b'content-type', b'image/png')],
+                },
+            )
+            await send({'type': 'http.response.body', 'body': b'\x89PNG'})
+            return
+
+        body = json.dumps(
+            {
+                'method': scope['method'],
+                'path': scope['path'],
+                'query': scope['query_string'].decode(),
+                'body': request['body'].decode(),
+                'cookie': dict(scope['headers']).get(b'cookie', b'').decode(),
+                'state': scope['state'],
+                'server': list(scope['server']),
+            },
+        )
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': 201,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'set-cookie', b'a=1'),
+                    (b'set-cookie', b'b=2'),
+                ],
+            },
+        )
+        await send({'type': 'http.response.body', 'body': body[:10].encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': body[10:].encode()})
+
+
+def event(path='/', **kwargs):
+    return {
+        **wsgi_event,
+        'rawPath': path,
+        'requestContext': {
+            **wsgi_event['requestContext'],
+            'http': {**wsgi_event['requestContext']['http'], 'path': path},
+        },
+        **kwargs,
+    }
+
+
+@pytest.fixture(autouse=True)
+def close_loop():
+    yield
+    aio.close()
+
+
+def make_handler(app):
+    class Handler(ActionHandler):
+        asgi_app = app
+
+    return Handler
+
+
+class TestHandler:
+    def test_request(self):
+        app = App()
+        Handler = make_handler(app)
+
+        resp = Handler.on_event(
+            event(
+                '/ships',
+                rawQueryString='class=galaxy',
+                body=base64.b64encode(b'engage').decode(),
+                isBase64Encoded=True,
+                cookies=['c=3', 'd=4'],
+            ),
+            {},
+        )
+        assert resp['statusCode'] == 201
+        assert resp['headers'] == {'content-type': 'application/json'}
+        assert resp['cookies'] == ['a=1', 'b=2']
+        assert resp['isBase64Encoded'] is False
+        assert json.loads(resp['body']) == {
+            'method': 'GET',
+            'path': '/ships',
+            'query': 'class=galaxy',
+            'body': 'engage',
+            'cookie': 'c=3; d=4',
+            'state': {'pool': 'db-pool'},
+            'server': ['pd59z4f1x6.execute-api.us-east-2.amazonaws.com', 443],
+        }
+
+    def test_binary(self):
+        Handler = make_handler(App())
+        resp = Handler.on_event(event('/logo.png'), {})
+        assert resp['isBase64Encoded'] is True
+        assert base64.b64decode(resp['body']) == b'\x89PNG'
+
+    def test_warm_invocations(self):
+        app = App()
+        Handler = make_handler(app)
+
+        Handler.on_event(event(), {})
+        Handler.on_event(event(), {})
+
+        # Startup once and the same loop for all of it
+        assert app.startups == 1
+        assert len(app.loops) == 1
+
+    def test_warmup_runs_startup(self):
+        app = App()
+        Handler = make_handler(app)
+
+        Handler.warmup()
+        assert app.startups == 1
+
+        Handler.on_event(event(), {})
+        assert app.startups == 1
+
+    def test_lifespan_not_supported(self, logs: Logs):
+        Handler = make_handler(App(lifespan=False))
+
+        resp = Handler.on_event(event(), {})
+        assert resp['statusCode'] == 201
+        assert json.loads(resp['body'])['state'] == {}
+        assert logs.messages == [
+            "ASGI app does not support lifespan: ValueError('Unsupported scope type: lifespan')",
+        ]
+
+    def test_wsgi_unaffected(self):
+        resp = ActionHandler.on_event(event(), {})
+        assert resp['error'] == 'No handler for http events'
+
+
+class TestLifespan:
+    def test_shutdown(self):
+        app = App()
+        lifespan = asgi.Lifespan(app)
+
+        aio.run(lifespan.startup())
+        aio.run(lifespan.shutdown())
+        assert (app.startups, app.shutdowns) == (1, 1)
+
+    def test_startup_failed(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({'type': 'lifespan.startup.failed', 'message': 'No database'})
+
+        with pytest.raises(asgi.LifespanFailed, match='No database'):
+            aio.run(asgi.Lifespan(app).startup())
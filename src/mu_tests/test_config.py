@@ -60,6 +60,80 @@ class TestConfig:
         assert sqs['celery']['VisibilityTimeout'] == 3600
         assert sqs['photons']['MessageRetentionPeriod'] == 10
 
+    def test_task_queues(self):
+        conf = load('pkg-sqs')
+        assert conf.task_queues == ['photons', 'jobs']
+        assert conf.sqs_configs == {
+            'celery': {'VisibilityTimeout': 3600},
+            'photons': {'VisibilityTimeout': '300', 'MessageRetentionPeriod': 10},
+            'jobs': {'VisibilityTimeout': '300'},
+        }
+
+        conf.aws_acct_id = '1234'
+        conf.aws_region = 'south'
+        assert conf.tasks_bucket is False
+        assert 'MU_TASKS_BUCKET' not in conf.deployed_env
+
+        queue_arn = conf.sqs_queue_arn('jobs')
+        assert queue_arn == 'arn:aws:sqs:south:1234:starfleet-tng-lambda-func-qa-jobs'
+
+    def test_tasks_bucket(self):
+        conf = config.Config(
+            env='qa',
+            project_org='Greek',
+            project_name='mu',
+            aws_acct_id='1234',
+            tasks_bucket=True,
+        )
+        assert conf.tasks_bucket_name == 'greek-mu-lambda-func-qa-1234'
+        assert conf.tasks_bucket_arn == 'arn:aws:s3:::greek-mu-lambda-func-qa-1234'
+        assert conf.deployed_env['MU_TASKS_BUCKET'] == 'greek-mu-lambda-func-qa-1234'
+
+    def test_tasks_results(self):
+        conf = config.Config(
+            env='qa',
+            project_org='Greek',
+            project_name='mu',
+            aws_acct_id='1234',
+            aws_region='south',
+            tasks_results=True,
+        )
+        assert conf.tasks_results_table_arn == (
+            'arn:aws:dynamodb:south:1234:table/greek-mu-lambda-func-qa-task-results'
+        )
+        assert conf.deployed_env['MU_TASKS_RESULTS'] == 'dynamodb'
+        assert conf.deployed_env['MU_TASKS_RESULTS_TABLE'] == 'greek-mu-lambda-func-qa-task-results'
+
+    def test_lambda_alias(self):
+        conf = config.Config(
+            env='qa',
+            project_org='Greek',
+            project_name='mu',
+            aws_acct_id='1234',
+            aws_region='south',
+        )
+        assert conf.lambda_alias is None
+        assert conf.invoke_arn == conf.function_arn
+
+        # An alias is needed for provisioned concurrency
+        conf.lambda_provisioned_concurrency = 5
+        assert conf.lambda_alias == 'live'
+
+        conf._lambda_alias = 'prod'
+        assert conf.invoke_arn == 'arn:aws:lambda:south:1234:function:greek-mu-func-qa:prod'
+        assert conf.for_print(False)['lambda_alias'] == 'prod'
+
+    def test_keep_warm(self):
+        conf = load('pkg-sqs')
+        assert conf.keep_warm == {'rate': '5 minutes', 'concurrency': 5}
+
+    def test_url_streaming(self):
+        conf = load('pkg-sqs')
+        assert 'MU_URL_STREAMING' not in conf.deployed_env
+
+        conf.lambda_url_streaming = True
+        assert conf.deployed_env['MU_URL_STREAMING'] == 'true'
+
     def test_defaults(self):
         conf = config.Config(
             env='qa',
@@ -1,9 +1,12 @@
+from unittest import mock
+
 import docker
 import docker.errors
 import pytest
 
 from mu.config import Config
-from mu.libs import ecr, iam
+from mu.libs import ecr, iam, testing, waiter
+from mu.libs.testing import mock_patch_obj
 
 
 @pytest.fixture(scope='module')
@@ -82,3 +85,25 @@ class TestECR:
             hw_tag,
         ]
         assert repo.latest_tag('hello-world') == 'hello-world-foo'
+
+
+class TestReposWait:
+    @pytest.fixture
+    def repos(self):
+        repos = ecr.Repos(testing.b3_sess())
+        repos.wait_backoff = waiter.Backoff(first=0.001, max_delay=0.005, deadline=0.5)
+        return repos
+
+    def test_created(self, repos: ecr.Repos):
+        rec = {'repositoryName': 'greek-mu', 'repositoryUri': 'repo-uri'}
+        with (
+            mock_patch_obj(repos.ecr, 'describe_repositories') as m_describe,
+            mock.patch.object(ecr.docker, 'from_env'),
+        ):
+            m_describe.side_effect = [{'repositories': []}, {'repositories': [rec]}]
+            assert repos.get('greek-mu', wait=True).uri == 'repo-uri'
+
+    def test_not_created(self, repos: ecr.Repos):
+        with mock_patch_obj(repos.ecr, 'describe_repositories') as m_describe:
+            m_describe.return_value = {'repositories': []}
+            assert repos.get('greek-mu', wait=True) is None
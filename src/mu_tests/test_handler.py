@@ -1,5 +1,15 @@
-from mu import ActionHandler
-from mu.libs.testing import Logs
+import asyncio
+import json
+from os import environ
+import subprocess
+import sys
+from typing import ClassVar
+from unittest import mock
+
+from mu import ActionHandler, aio, task, tasks
+from mu.handler import EventType, records_from
+from mu.libs.testing import Logs, mock_patch_obj
+from mu.tasks import AsyncTask
 from mu_tests.data.event_wsgi import wsgi_event
 
 
@@ -20,12 +30,18 @@ class Handler(ActionHandler):
     def hello(event, context):
         return 'world'
 
+    @staticmethod
+    def save_event(event, context):
+        SaveArgsTracker.event = event
+
 
 class SaveArgsTracker:
     args = None
     kwargs = None
+    event = None
 
 
+@task
 def save_args(*args, **kwargs):
     """Used by test_task_event()"""
     SaveArgsTracker.args = args
@@ -82,3 +98,310 @@ class TestHandler:
 
         assert SaveArgsTracker.args == ('a',)
         assert SaveArgsTracker.kwargs == {'arg2': 'b'}
+
+    def test_encoded_task_event(self):
+        at = AsyncTask(save_args, encoding='zjson')
+        event = at.payload(['c'], {'arg2': 'd'})
+
+        assert Handler.on_event(event, FakeContext) == 'Called task'
+
+        assert SaveArgsTracker.args == ('c',)
+        assert SaveArgsTracker.kwargs == {'arg2': 'd'}
+
+    def test_sqs_records(self, logs: Logs):
+        def record(msg_id, task_path):
+            body = {'task-path': task_path, 'args': [msg_id], 'kwargs': {}}
+            return {'messageId': msg_id, 'eventSource': 'aws:sqs', 'body': json.dumps(body)}
+
+        event = {
+            'Records': [
+                record('msg-1', 'mu_tests.test_handler:save_args'),
+                record('msg-2', 'mu_tests.test_handler:not_there'),
+                record('msg-3', 'mu_tests.test_handler:save_args'),
+            ],
+        }
+
+        resp = Handler.on_event(event, FakeContext)
+        assert resp == {'batchItemFailures': [{'itemIdentifier': 'msg-2'}]}
+
+        assert SaveArgsTracker.args == ('msg-3',)
+        assert 'ActionHandler.sqs_records() caught an unhandled exception' in logs.messages
+
+    def test_sqs_records_actions(self, logs: Logs):
+        def record(msg_id, body):
+            return {'messageId': msg_id, 'eventSource': 'aws:sqs', 'body': body}
+
+        event = {
+            'Records': [
+                record('msg-1', json.dumps({'do-action': 'save-event', 'ship': 'enterprise'})),
+                record('msg-2', json.dumps({'do-action': 'not-there'})),
+                record('msg-3', json.dumps({'captain': 'picard'})),
+                record('msg-4', 'not json'),
+            ],
+        }
+
+        resp = Handler.on_event(event, FakeContext)
+        assert resp == {
+            'batchItemFailures': [
+                {'itemIdentifier': 'msg-2'},
+                {'itemIdentifier': 'msg-3'},
+                {'itemIdentifier': 'msg-4'},
+            ],
+        }
+
+        assert SaveArgsTracker.event == {'do-action': 'save-event', 'ship': 'enterprise'}
+        assert logs.messages[-1] == 'SQS batch: 3 of 4 records failed'
+
+    def test_sqs_records_fifo(self):
+        def record(msg_id, action):
+            return {
+                'messageId': msg_id,
+                'eventSource': 'aws:sqs',
+                'eventSourceARN': 'arn:aws:sqs:us-east-2:1234:jobs.fifo',
+                'body': json.dumps({'do-action': action, 'msg_id': msg_id}),
+            }
+
+        event = {
+            'Records': [
+                record('msg-1', 'save-event'),
+                record('msg-2', 'error'),
+                record('msg-3', 'save-event'),
+            ],
+        }
+
+        resp = Handler.on_event(event, FakeContext)
+        assert resp == {
+            'batchItemFailures': [{'itemIdentifier': 'msg-2'}, {'itemIdentifier': 'msg-3'}],
+        }
+        # msg-3 was never processed
+        assert SaveArgsTracker.event['msg_id'] == 'msg-1'
+
+
+class AsyncHandler(ActionHandler):
+    loops: ClassVar[set] = set()
+
+    @classmethod
+    async def fetch(cls, event, context):
+        cls.loops.add(id(asyncio.get_running_loop()))
+        ids = await aio.gather(*(cls.fetch_one(i) for i in range(3)), limit=2)
+        return {'ids': ids}
+
+    @staticmethod
+    async def fetch_one(ident):
+        await asyncio.sleep(0)
+        return ident
+
+
+class TestAsyncActions:
+    def teardown_method(self):
+        aio.close()
+
+    def test_action(self):
+        assert AsyncHandler.on_event({'do-action': 'fetch'}, FakeContext) == {'ids': [0, 1, 2]}
+        assert AsyncHandler.on_event({'do-action': 'fetch'}, FakeContext) == {'ids': [0, 1, 2]}
+
+        # Warm invocations reuse the loop
+        assert len(AsyncHandler.loops) == 1
+
+    def test_sqs_record(self):
+        event = {
+            'Records': [
+                {
+                    'messageId': 'msg-1',
+                    'body': json.dumps({'do-action': 'fetch'}),
+                    'eventSource': 'aws:sqs',
+                },
+            ],
+        }
+        assert AsyncHandler.on_event(event, FakeContext) == {'batchItemFailures': []}
+
+    def test_asyncio_not_imported(self):
+        # Only handlers that need it pay for importing asyncio in their cold start
+        code = 'import sys, mu.handler; print("asyncio" in sys.modules)'
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        assert result.stdout.strip() == 'False'
+
+
+class TestWarmup:
+    ping: ClassVar = {'do-action': 'ping'}
+
+    @mock.patch.dict(environ, AWS_LAMBDA_INITIALIZATION_TYPE='on-demand')
+    def test_init_phase(self, logs: Logs):
+        with mock_patch_obj(tasks, 'client') as m_client:
+
+            class WarmHandler(ActionHandler):
+                wsgi_app = wsgi_app
+                warmup_clients = ('lambda', 'sqs')
+
+            m_client.assert_not_called()
+
+            WarmHandler.run_warmup()
+            assert m_client.call_args_list == [mock.call('lambda'), mock.call('sqs')]
+            assert logs.messages[0].startswith('ActionHandler warmup: ')
+
+            # Not again by the first event
+            assert WarmHandler.on_event(self.ping, FakeContext) == 'pong'
+            assert m_client.call_count == 2
+
+    @mock.patch.dict(environ, AWS_LAMBDA_INITIALIZATION_TYPE='on-demand')
+    def test_first_event(self):
+        warmed = []
+
+        class BaseHandler(ActionHandler):
+            @classmethod
+            def warmup(cls):
+                warmed.append(cls)
+
+        class WarmHandler(BaseHandler):
+            pass
+
+        assert warmed == []
+
+        assert WarmHandler.on_event(self.ping, FakeContext) == 'pong'
+        assert WarmHandler.on_event(self.ping, FakeContext) == 'pong'
+        # Only the class called, not its base, once
+        assert warmed == [WarmHandler]
+
+    def test_not_in_lambda(self):
+        with (
+            mock.patch.dict(environ, AWS_LAMBDA_INITIALIZATION_TYPE=''),
+            mock_patch_obj(tasks, 'client') as m_client,
+        ):
+
+            class WarmHandler(ActionHandler):
+                warmup_clients = ('lambda',)
+
+            WarmHandler.run_warmup()
+            assert WarmHandler.on_event(self.ping, FakeContext) == 'pong'
+
+        m_client.assert_not_called()
+
+    @mock.patch.dict(environ, AWS_LAMBDA_INITIALIZATION_TYPE='provisioned-concurrency')
+    def test_exception(self, logs: Logs):
+        class WarmHandler(ActionHandler):
+            @classmethod
+            def warmup(cls):
+                raise RuntimeError('No database')
+
+        assert WarmHandler.on_event(self.ping, FakeContext) == 'pong'
+        assert logs.messages[0] == 'ActionHandler.warmup() caught an unhandled exception'
+
+
+class TestKeepWarm:
+    @mock.patch.object(Handler, 'keep_warm_hold_secs', 0)
+    def test_single(self):
+        with mock_patch_obj(tasks, 'client_call') as m_client_call:
+            assert Handler.on_event({'mu-keep-warm': 1}, FakeContext) == {'warm': 1}
+
+        m_client_call.assert_not_called()
+
+    def test_fan_out(self, logs: Logs):
+        class Context(FakeContext):
+            invoked_function_arn = 'arn:aws:lambda:south:1234:function:greek-mu-func-qa:live'
+
+        with mock_patch_obj(tasks, 'client_call') as m_client_call:
+            assert Handler.on_event({'mu-keep-warm': 3}, Context) == {'warm': 3}
+
+        assert m_client_call.call_count == 2
+        m_client_call.assert_called_with(
+            'lambda',
+            'invoke',
+            FunctionName=Context.invoked_function_arn,
+            Payload='{"mu-keep-warm": 1}',
+        )
+        assert logs.messages == []
+
+    def test_failed_ping(self, logs: Logs):
+        with mock_patch_obj(tasks, 'client_call') as m_client_call:
+            m_client_call.side_effect = [None, RuntimeError('Throttled')]
+            assert Handler.on_event({'mu-keep-warm': 3}, FakeContext) == {'warm': 2}
+
+        assert logs.messages == ['Keep warm: 1 of 2 pings failed: Throttled']
+
+
+class TestDispatch:
+    def event_type(self, handler, event):
+        event_type, _ = handler.dispatch(event)
+        return event_type.name
+
+    def test_builtin_types(self):
+        assert self.event_type(Handler, wsgi_event) == 'http'
+        assert self.event_type(Handler, {'task-path': 'a.b:c'}) == 'task'
+        assert self.event_type(Handler, {'Records': [{'eventSource': 'aws:sqs'}]}) == 'sqs'
+        assert self.event_type(Handler, {'Records': [{'eventSource': 'aws:s3'}]}) == 's3'
+        assert self.event_type(Handler, {'detail-type': 'EC2 State', 'source': 'aws.ec2'}) == (
+            'eventbridge'
+        )
+        assert self.event_type(Handler, {'do-action': 'hello'}) == 'action'
+        assert self.event_type(Handler, {'Records': []}) == 'action'
+
+    def test_unhandled(self, logs: Logs):
+        resp = Handler.on_event({'Records': [{'eventSource': 'aws:s3'}]}, FakeContext)
+        assert resp['error'] == 'No handler for s3 events'
+
+        resp = ActionHandler.on_event(wsgi_event, FakeContext)
+        assert resp['error'] == 'No handler for http events'
+
+        assert logs.messages == ['No handler for s3 events', 'No handler for http events']
+
+    def test_register(self):
+        class DynamoHandler(Handler):
+            @staticmethod
+            def stream_records(event, context):
+                return 'streamed'
+
+        assert DynamoHandler.dispatch_table() is not Handler.dispatch_table()
+
+        DynamoHandler.register_event_type(
+            EventType(
+                'dynamodb',
+                'Records',
+                'stream_records',
+                records_from('aws:dynamodb'),
+            ),
+        )
+        event = {'Records': [{'eventSource': 'aws:dynamodb'}]}
+        assert self.event_type(DynamoHandler, event) == 'dynamodb'
+        assert DynamoHandler.on_event(event, FakeContext) == 'streamed'
+
+        # Parent isn't changed
+        assert self.event_type(Handler, event) == 'action'
+        assert Handler.event_types == ActionHandler.event_types
+
+    def test_register_on_base(self):
+        class BaseHandler(Handler):
+            @staticmethod
+            def stream_records(event, context):
+                return 'streamed'
+
+        class EntryHandler(BaseHandler):
+            pass
+
+        event = {'Records': [{'eventSource': 'aws:dynamodb'}]}
+        # The subclass's table is built before the base registers the type
+        assert self.event_type(EntryHandler, event) == 'action'
+
+        BaseHandler.register_event_type(
+            EventType('dynamodb', 'Records', 'stream_records', records_from('aws:dynamodb')),
+        )
+        assert self.event_type(EntryHandler, event) == 'dynamodb'
+        assert EntryHandler.on_event(event, FakeContext) == 'streamed'
+
+        # The subclass's own types are checked first
+        EntryHandler.register_event_type(
+            EventType('dynamodb-entry', 'Records', 'stream_records', records_from('aws:dynamodb')),
+        )
+        assert self.event_type(EntryHandler, event) == 'dynamodb-entry'
+        assert self.event_type(BaseHandler, event) == 'dynamodb'
+        assert self.event_type(Handler, event) == 'action'
+
+    def test_action_cached(self):
+        assert Handler.action_method('hello') is Handler.action_method('hello')
+        assert Handler.action_method('save-event') == Handler.save_event
+        assert Handler.action_method('nope') is None
+        assert 'nope' not in Handler._actions
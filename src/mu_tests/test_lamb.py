@@ -1,11 +1,13 @@
 import logging
+import threading
+from unittest import mock
 
 import pytest
 
 import mu.config
-from mu.libs import ecr, iam, testing
+from mu.libs import ecr, iam, sts, testing
 from mu.libs.lamb import FunctionPermissions, Lambda, PolicyStatement
-from mu.libs.testing import Logs, data_read
+from mu.libs.testing import Logs, data_read, mock_patch_obj
 from mu_tests.data import log_events
 
 
@@ -32,6 +34,19 @@ def config():
     )
 
 
+@pytest.fixture
+def fake_lamb():
+    """A Lambda whose lambda client is a mock"""
+    lamb = Lambda(config(), testing.b3_sess(), testing=True)
+    lamb.lc = mock.MagicMock()
+    return lamb
+
+
+def not_found(lamb: Lambda, operation: str):
+    exc_cls = lamb.not_found_exc[0]
+    return exc_cls({'Error': {'Code': 'ResourceNotFoundException'}}, operation)
+
+
 class TestLambda:
     res_ident = 'greek-mu-lambda-func-qa'
     logs_policy = f'{res_ident}-logs'
@@ -142,21 +157,35 @@ class TestLambda:
         anon.provision_role()
 
         log_messages = [rec.message for rec in caplog.records]
+        first_run, second_run, _ = '\n'.join(log_messages).split('Step timings:')
+
+        # The role is first, the policies are attached concurrently so their order varies.
+        first_run = first_run.strip().splitlines()
+        assert first_run[0] == f'Role created: {self.res_ident}'
+        assert sorted(first_run[1:]) == sorted(
+            [
+                'Attaching managed policy: AWSLambdaVPCAccessExecutionRole',
+                'Policy created: greek-mu-lambda-func-qa-lambda',
+                'Policy created: greek-mu-lambda-func-qa-sqs-queues',
+                f'Policy created: {self.ecr_repo_policy}',
+                f'Policy created: {self.logs_policy}',
+            ],
+        )
 
-        assert log_messages == [
-            f'Role created: {self.res_ident}',
-            f'Policy created: {self.logs_policy}',
-            f'Policy created: {self.ecr_repo_policy}',
-            'Policy created: greek-mu-lambda-func-qa-sqs-queues',
-            'Attaching managed policy: AWSLambdaVPCAccessExecutionRole',
-            'Policy created: greek-mu-lambda-func-qa-lambda',
-            f'Role existed, assume role policy updated: {self.res_ident}',
-            f'Policy existed, document current: {self.logs_policy}',
-            f'Policy existed, document current: {self.ecr_repo_policy}',
-            'Policy existed, document current: greek-mu-lambda-func-qa-sqs-queues',
-            'Attaching managed policy: AWSLambdaVPCAccessExecutionRole',
-            'Policy existed, document current: greek-mu-lambda-func-qa-lambda',
+        # Skip the timings of the first run
+        second_run = [
+            line for line in second_run.splitlines() if line and not line.startswith('  ')
         ]
+        assert second_run[0] == f'Role existed, assume role policy updated: {self.res_ident}'
+        assert sorted(second_run[1:]) == sorted(
+            [
+                'Attaching managed policy: AWSLambdaVPCAccessExecutionRole',
+                'Policy existed, document current: greek-mu-lambda-func-qa-lambda',
+                'Policy existed, document current: greek-mu-lambda-func-qa-sqs-queues',
+                f'Policy existed, document current: {self.ecr_repo_policy}',
+                f'Policy existed, document current: {self.logs_policy}',
+            ],
+        )
 
     def test_provision_repo(self, b3_sess, repos: ecr.Repos, caplog):
         caplog.set_level(logging.INFO)
@@ -182,6 +211,409 @@ class TestLambda:
         assert logs.messages[-1] == 'Provision finished for: greek-mu-func-qa'
 
 
+class TestAlias:
+    @pytest.fixture
+    def lamb(self, fake_lamb: Lambda):
+        fake_lamb.config.lambda_provisioned_concurrency = 2
+        fake_lamb.lc.publish_version.return_value = {'Version': '7'}
+        fake_lamb.lc.get_paginator.return_value.paginate.return_value = [
+            {'Versions': [{'Version': v} for v in ('$LATEST', '3', '4', '5', '6', '7')]},
+        ]
+        return fake_lamb
+
+    def test_publish_updates(self, lamb: Lambda, logs: Logs):
+        assert lamb.config.lambda_alias == 'live'
+        assert lamb.publish_alias('greek-mu-func-qa') == '7'
+
+        lc = lamb.lc
+        lc.update_alias.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            Name='live',
+            FunctionVersion='7',
+        )
+        lc.create_alias.assert_not_called()
+        lc.put_provisioned_concurrency_config.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            Qualifier='live',
+            ProvisionedConcurrentExecutions=2,
+        )
+        # The aliased version and the ones before it that are kept
+        assert [c.kwargs['Qualifier'] for c in lc.delete_function.call_args_list] == ['3', '4']
+        assert logs.messages == [
+            'Lambda version published: 7',
+            'Lambda alias updated: live -> 7',
+            'Provisioned concurrency set: live -> 2 (see status for allocation)',
+            'Lambda version deleted: 3',
+            'Lambda version deleted: 4',
+        ]
+
+    def test_publish_creates(self, lamb: Lambda, logs: Logs):
+        lamb.lc.update_alias.side_effect = not_found(lamb, 'UpdateAlias')
+        lamb.publish_alias('greek-mu-func-qa')
+
+        lamb.lc.create_alias.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            Name='live',
+            FunctionVersion='7',
+        )
+        assert 'Lambda alias created: live -> 7' in logs.messages
+
+    def test_concurrency_removed_explicit_alias(self, lamb: Lambda, logs: Logs):
+        lamb.config._lambda_alias = 'live'
+        lamb.config.lambda_provisioned_concurrency = 0
+        lamb.provisioned_concurrency('greek-mu-func-qa')
+
+        lamb.lc.delete_provisioned_concurrency_config.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            Qualifier='live',
+        )
+        lamb.lc.put_provisioned_concurrency_config.assert_not_called()
+        assert logs.messages == ['Provisioned concurrency removed: live']
+
+    def test_concurrency_not_set(self, lamb: Lambda, logs: Logs):
+        lamb.config._lambda_alias = 'live'
+        lamb.config.lambda_provisioned_concurrency = 0
+        lamb.lc.delete_provisioned_concurrency_config.side_effect = not_found(
+            lamb,
+            'DeleteProvisionedConcurrencyConfig',
+        )
+        lamb.provisioned_concurrency('greek-mu-func-qa')
+
+        assert logs.messages == []
+
+    def test_prune_keeps_newest(self, lamb: Lambda):
+        lamb.versions_keep = 5
+        lamb.prune_versions('greek-mu-func-qa', 7)
+        lamb.lc.delete_function.assert_not_called()
+
+
+class TestEventRules:
+    rule_name = 'greek-mu-lambda-func-qa-keep-warm'
+    func_arn = 'arn:aws:lambda:us-east-fake:13579:function:greek-mu-func-qa'
+
+    @pytest.fixture
+    def lamb(self, fake_lamb: Lambda):
+        fake_lamb.event_client = mock.MagicMock()
+        fake_lamb.event_client.put_rule.return_value = {'RuleArn': 'arn:rule'}
+        return fake_lamb
+
+    def test_keep_warm(self, lamb: Lambda):
+        lamb.config.keep_warm = {'rate': '5 minutes', 'concurrency': 3}
+        lamb.event_rules('qa', self.func_arn)
+
+        ec = lamb.event_client
+        ec.put_rule.assert_called_once_with(
+            Name=self.rule_name,
+            State='ENABLED',
+            ScheduleExpression='rate(5 minutes)',
+        )
+        [target] = ec.put_targets.call_args.kwargs['Targets']
+        assert target['Input'] == '{"mu-keep-warm": 3}'
+        ec.delete_rule.assert_not_called()
+
+    def test_keep_warm_removed(self, lamb: Lambda, logs: Logs):
+        lamb.event_rules('qa', self.func_arn)
+
+        ec = lamb.event_client
+        ec.put_rule.assert_not_called()
+        ec.remove_targets.assert_called_once_with(Rule=self.rule_name, Ids=['lambda-func'])
+        ec.delete_rule.assert_called_once_with(Name=self.rule_name)
+        lamb.lc.remove_permission.assert_called_once_with(
+            FunctionName=self.func_arn,
+            StatementId=self.rule_name,
+        )
+        assert logs.messages == [f'Deleted event schedule: {self.rule_name}']
+
+    def test_keep_warm_never_set(self, lamb: Lambda, logs: Logs):
+        lamb.event_client.remove_targets.side_effect = lamb.not_found_exc[1](
+            {'Error': {'Code': 'ResourceNotFoundException'}},
+            'RemoveTargets',
+        )
+        lamb.event_rules('qa', self.func_arn)
+
+        lamb.lc.remove_permission.assert_not_called()
+        assert logs.messages == []
+
+
+class TestProvisionSteps:
+    def test_no_clients_in_steps(self, fake_lamb: Lambda):
+        lamb = fake_lamb
+        lamb.config.aws_config = {'sqs': {'photons': {}}}
+        sqs_client = lamb.sqs.sqs
+        queue_url = 'https://sqs.us-east-fake.amazonaws.com/13579/greek-mu-lambda-func-qa-photons'
+
+        def client(*args, **kwargs):
+            # boto3 sessions aren't thread safe
+            assert threading.current_thread() is threading.main_thread()
+            return mock.MagicMock()
+
+        with (
+            mock.patch.object(lamb.b3_sess, 'client', side_effect=client) as m_client,
+            mock.patch.object(sts, 'account_id', return_value='13579'),
+            mock_patch_obj(sqs_client, 'get_queue_attributes') as m_get_attrs,
+            mock_patch_obj(sqs_client, 'list_queues') as m_list_queues,
+        ):
+            m_get_attrs.return_value = {'Attributes': {'VisibilityTimeout': '30'}}
+            m_list_queues.return_value = {'QueueUrls': [queue_url]}
+            lamb.provision_aws_config()
+
+        # The queue used the SQS client created with the Lambda
+        m_get_attrs.assert_called_once_with(QueueUrl=queue_url, AttributeNames=('All',))
+        m_client.assert_not_called()
+
+
+class TestDeploy:
+    @pytest.fixture
+    def lamb(self, fake_lamb: Lambda):
+        lamb = fake_lamb
+        lc = lamb.lc
+
+        self.func_exists = True
+        # The aliases with a URL
+        self.url_aliases = {None}
+
+        # Tags on the function, where the fingerprints are saved
+        self.tags = {}
+
+        def list_tags(Resource):
+            if not self.func_exists:
+                raise not_found(lamb, 'ListTags')
+            return {'Tags': dict(self.tags)}
+
+        lc.list_tags.side_effect = list_tags
+        lc.tag_resource.side_effect = lambda Resource, Tags: self.tags.update(Tags)
+
+        def create_function(**kwargs):
+            self.func_exists = True
+
+        lc.create_function.side_effect = create_function
+
+        def url(qualifier):
+            return f'https://{qualifier or "enterprise"}.example.com/'
+
+        def create_function_url_config(FunctionName, AuthType, InvokeMode, Qualifier=None):
+            if Qualifier in self.url_aliases:
+                raise lamb.exists_exc[0](
+                    {'Error': {'Code': 'ResourceConflictException'}},
+                    'CreateFunctionUrlConfig',
+                )
+            if not self.func_exists or (Qualifier and Qualifier not in self.aliases):
+                raise not_found(lamb, 'CreateFunctionUrlConfig')
+            self.url_aliases.add(Qualifier)
+            return {'FunctionUrl': url(Qualifier)}
+
+        lc.create_function_url_config.side_effect = create_function_url_config
+        lc.get_function_url_config.side_effect = lambda FunctionName, Qualifier=None: {
+            'FunctionUrl': url(Qualifier),
+            'InvokeMode': 'BUFFERED',
+        }
+
+        self.aliases = set()
+
+        def publish_alias(func_name):
+            self.aliases.add(lamb.config.lambda_alias)
+
+        self.repo = mock.Mock(uri='repo-uri')
+        self.repo.tag_local.return_value = 'greek-mu-1'
+
+        with (
+            mock_patch_obj(lamb.repos, 'get', return_value=self.repo),
+            mock_patch_obj(lamb, 'wait_updated') as self.m_wait_updated,
+            mock_patch_obj(lamb, 'wait_active') as self.m_wait_active,
+            mock_patch_obj(lamb, 'event_rules') as self.m_event_rules,
+            mock_patch_obj(lamb, 'task_queue_mappings'),
+            mock_patch_obj(lamb, 'publish_alias', side_effect=publish_alias) as self.m_publish,
+        ):
+            yield lamb
+
+    def deploy(self, lamb: Lambda):
+        lamb.lc.reset_mock()
+        self.m_wait_updated.reset_mock()
+        self.m_wait_active.reset_mock()
+        self.m_event_rules.reset_mock()
+        self.m_publish.reset_mock()
+        lamb.deploy('qa')
+        return lamb.lc
+
+    def test_first_deploy(self, lamb: Lambda):
+        self.func_exists = False
+        self.url_aliases = set()
+        lc = self.deploy(lamb)
+
+        [create_call] = lc.create_function.call_args_list
+        assert create_call.kwargs['Code'] == {'ImageUri': 'repo-uri:greek-mu-1'}
+        assert 'MU_FUNC_URL' not in create_call.kwargs['Environment']['Variables']
+        # Only the config is updated, to add the URL
+        [config_call] = lc.update_function_configuration.call_args_list
+        env_vars = config_call.kwargs['Environment']['Variables']
+        assert env_vars['MU_FUNC_URL'] == 'https://enterprise.example.com/'
+        lc.update_function_code.assert_not_called()
+        self.m_publish.assert_not_called()
+
+        # The redeploy has nothing to do
+        lc = self.deploy(lamb)
+        lc.create_function.assert_not_called()
+        lc.update_function_configuration.assert_not_called()
+        lc.update_function_code.assert_not_called()
+
+    def test_alias_added(self, lamb: Lambda):
+        self.deploy(lamb)
+
+        lamb.config._lambda_alias = 'live'
+        lc = self.deploy(lamb)
+
+        lc.create_function.assert_not_called()
+        # Once so the alias's URL can be created and once for the updated config
+        assert self.m_publish.call_count == 2
+        [config_call] = lc.update_function_configuration.call_args_list
+        env_vars = config_call.kwargs['Environment']['Variables']
+        assert env_vars['MU_FUNC_URL'] == 'https://live.example.com/'
+        lc.update_function_code.assert_not_called()
+        self.m_event_rules.assert_called_once_with(
+            'qa',
+            'arn:aws:lambda:us-east-fake:13579:function:greek-mu-func-qa:live',
+        )
+
+    def test_existing(self, lamb: Lambda):
+        # No fingerprints saved yet
+        lc = self.deploy(lamb)
+
+        lc.create_function.assert_not_called()
+        [config_call] = lc.update_function_configuration.call_args_list
+        env_vars = config_call.kwargs['Environment']['Variables']
+        assert env_vars['MU_FUNC_URL'] == 'https://enterprise.example.com/'
+        assert 'MU_DEPLOYED_AT' in env_vars
+        lc.update_function_code.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            ImageUri='repo-uri:greek-mu-1',
+        )
+        self.repo.push.assert_called_once_with('greek-mu', tag='greek-mu-1')
+        self.m_event_rules.assert_called_once()
+        assert set(self.tags) == {
+            'mu:fingerprint:config',
+            'mu:fingerprint:code',
+            'mu:fingerprint:triggers',
+            'mu:fingerprint:alias',
+        }
+
+    def test_unchanged(self, lamb: Lambda, logs: Logs):
+        self.deploy(lamb)
+        tags = dict(self.tags)
+
+        logs.clear()
+        lc = self.deploy(lamb)
+
+        lc.update_function_configuration.assert_not_called()
+        lc.update_function_code.assert_not_called()
+        self.m_wait_updated.assert_not_called()
+        self.m_wait_active.assert_not_called()
+        self.m_event_rules.assert_not_called()
+        assert self.tags == tags
+        assert 'Lambda function unchanged, not waiting or publishing' in logs.messages
+
+    def test_image_changed(self, lamb: Lambda):
+        self.deploy(lamb)
+        tags = dict(self.tags)
+
+        self.repo.tag_local.return_value = 'greek-mu-2'
+        lc = self.deploy(lamb)
+
+        lc.update_function_configuration.assert_not_called()
+        lc.update_function_code.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            ImageUri='repo-uri:greek-mu-2',
+        )
+        self.m_wait_active.assert_called_once()
+        assert self.tags['mu:fingerprint:code'] != tags['mu:fingerprint:code']
+        assert self.tags['mu:fingerprint:config'] == tags['mu:fingerprint:config']
+
+    def test_config_changed(self, lamb: Lambda):
+        self.deploy(lamb)
+        tags = dict(self.tags)
+
+        lamb.config.lambda_memory += 512
+        lc = self.deploy(lamb)
+
+        lc.update_function_configuration.assert_called_once()
+        lc.update_function_code.assert_not_called()
+        self.m_wait_active.assert_called_once()
+        assert self.tags['mu:fingerprint:config'] != tags['mu:fingerprint:config']
+        assert self.tags['mu:fingerprint:code'] == tags['mu:fingerprint:code']
+
+    def test_streaming(self, lamb: Lambda):
+        lamb.config.lambda_url_streaming = True
+        with mock_patch_obj(lamb, 'runs_mu_runtime', return_value=True):
+            lc = self.deploy(lamb)
+
+        lc.update_function_url_config.assert_called_once_with(
+            FunctionName='arn:aws:lambda:us-east-fake:13579:function:greek-mu-func-qa',
+            InvokeMode='RESPONSE_STREAM',
+        )
+
+    def test_streaming_not_mu_runtime(self, lamb: Lambda, logs: Logs):
+        lamb.config.lambda_url_streaming = True
+        with mock_patch_obj(lamb, 'runs_mu_runtime', return_value=False):
+            lc = self.deploy(lamb)
+
+        lc.update_function_url_config.assert_not_called()
+        lc.update_function_code.assert_not_called()
+        self.repo.push.assert_not_called()
+        assert logs.messages == [
+            'lambda-url-streaming needs the image entrypoint to be mu.runtime: greek-mu',
+        ]
+
+    def test_runs_mu_runtime(self, lamb: Lambda):
+        with (
+            mock.patch.object(ecr.docker, 'from_env'),
+            mock_patch_obj(ecr.LocalImage, 'entrypoint') as m_entrypoint,
+        ):
+            m_entrypoint.return_value = ['/var/lang/bin/python', '-m', 'mu.runtime']
+            assert lamb.runs_mu_runtime('greek-mu')
+
+            m_entrypoint.return_value = ['/lambda-entrypoint.sh']
+            assert not lamb.runs_mu_runtime('greek-mu')
+
+    def test_concurrency_removed(self, lamb: Lambda, logs: Logs):
+        lamb.config.lambda_provisioned_concurrency = 2
+        self.deploy(lamb)
+        assert self.aliases == {'live'}
+
+        # The setting is removed from the config, which leaves the function without an alias
+        lamb.config.lambda_provisioned_concurrency = 0
+        assert lamb.config.lambda_alias is None
+        lamb.lc.list_provisioned_concurrency_configs.return_value = {
+            'ProvisionedConcurrencyConfigs': [
+                {'FunctionArn': 'arn:aws:lambda:us-east-fake:13579:function:greek-mu-func-qa:live'},
+            ],
+        }
+        lc = self.deploy(lamb)
+
+        self.m_publish.assert_not_called()
+        lc.delete_provisioned_concurrency_config.assert_called_once_with(
+            FunctionName='greek-mu-func-qa',
+            Qualifier='live',
+        )
+        assert 'Provisioned concurrency removed: live' in logs.messages
+
+        # Only checked when the alias config changes
+        lc = self.deploy(lamb)
+        lc.list_provisioned_concurrency_configs.assert_not_called()
+
+    def test_concurrency_kept(self, lamb: Lambda):
+        lamb.config.lambda_provisioned_concurrency = 2
+        self.deploy(lamb)
+
+        lamb.config.lambda_provisioned_concurrency = 3
+        lamb.lc.list_provisioned_concurrency_configs.return_value = {
+            'ProvisionedConcurrencyConfigs': [
+                {'FunctionArn': 'arn:aws:lambda:us-east-fake:13579:function:greek-mu-func-qa:live'},
+            ],
+        }
+        lc = self.deploy(lamb)
+
+        lc.delete_provisioned_concurrency_config.assert_not_called()
+
+
 class TestLambdaLogs:
     def check_event(self, capsys, event: dict, fname: str):
         Lambda.log_event_print(event)
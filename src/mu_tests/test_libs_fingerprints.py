@@ -0,0 +1,22 @@
+from mu.libs import fingerprints
+
+
+class TestFingerprints:
+    def test_digest(self):
+        assert fingerprints.digest({'a': 1, 'b': 2}) == fingerprints.digest({'b': 2, 'a': 1})
+        assert fingerprints.digest({'a': 1}) != fingerprints.digest({'a': 2})
+        assert len(fingerprints.digest('image:abc123')) == 16
+
+    def test_tags(self):
+        prints = {'config': 'abc', 'code': 'def'}
+        tags = fingerprints.to_tags(prints)
+        assert tags == {'mu:fingerprint:config': 'abc', 'mu:fingerprint:code': 'def'}
+
+        tags['owner'] = 'picard'
+        assert fingerprints.from_tags(tags) == prints
+
+    def test_unchanged(self):
+        desired = {'config': 'abc', 'code': 'def', 'triggers': 'ghi'}
+        deployed = {'config': 'abc', 'code': 'xyz'}
+        assert fingerprints.unchanged(desired, deployed) == {'config'}
+        assert fingerprints.unchanged(desired, {}) == set()
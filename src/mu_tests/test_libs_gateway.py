@@ -1,3 +1,5 @@
+import re
+
 import pytest
 
 from mu.config import Config
@@ -375,10 +377,10 @@ class TestACMCerts:
             )
             assert certs.ensure('app.example.com')
 
-        assert logs.messages == [
-            'ACMCerts ensure: record created',
-            'Waiting 0.1s for ACMCert to be created',
-        ]
+        created, waiting = logs.messages
+        assert created == 'ACMCerts ensure: record created'
+        # Delays are jittered
+        assert re.fullmatch(r'Waiting 0\.\d+s for ACMCert to be created', waiting)
 
     def test_from_aws_summary(self, certs: gateway.ACMCerts):
         cert = gateway.ACMCert.from_aws(fake.cert_summary())
@@ -413,11 +415,10 @@ class TestACMCerts:
             assert validation.Type == 'CNAME'
             assert validation.Value == '_defake.acm-validations.aws.'
 
-        assert logs.messages == [
-            'ACMCerts hydrate: fetching full cert description',
-            'Waiting 0.1s for full cert description',
-            'Waiting 0.25s for full cert description',
-        ]
+        fetching, *waiting = logs.messages
+        assert fetching == 'ACMCerts hydrate: fetching full cert description'
+        assert len(waiting) == 2
+        assert all(re.fullmatch(r'Waiting 0\.\d+s for full cert description', m) for m in waiting)
 
     def test_log_dns_validation(self, b3s_fake, logs: Logs):
         certs = gateway.ACMCerts(b3s_fake)
@@ -492,6 +493,77 @@ class TestGateway:
             api_key=api_id,
         )
 
+    @pytest.fixture
+    def alias_gw(self):
+        # Not the session's config, it's changed
+        config = testing.config()
+        config.domain_name = 'app.example.com'
+        config.lambda_provisioned_concurrency = 2
+        return gateway.Gateway(config, testing=True)
+
+    def test_provision_alias(self, alias_gw: gateway.Gateway):
+        config = alias_gw.config
+        assert config.invoke_arn == 'arn:aws:lambda:us-east-2:13579:function:greek-mu-func-qa:live'
+
+        with mocking.GatewayStubs().mock_gw(alias_gw) as stub:
+            stub.acm_certs.fake(Status='ISSUED')
+            alias_gw.provision()
+
+            # The integration invokes the alias, which has the provisioned concurrency
+            api = utils.first(stub.apis.recs.values())
+            assert api['Target'] == config.invoke_arn
+            assert stub.apis.call_count('update_integration', ApiId=api['ApiId']) == 0
+
+            stub.m_func_perms_ensure.assert_called_once_with(
+                config.api_invoke_stmt_id,
+                config=config,
+                perm_type='api-invoke',
+                api_key=api['ApiId'],
+            )
+
+    def test_provision_sync_target(self, alias_gw: gateway.Gateway, logs: Logs):
+        config = alias_gw.config
+
+        with mocking.GatewayStubs().mock_gw(alias_gw) as stub:
+            stub.acm_certs.fake(Status='ISSUED')
+            # Created before the function had an alias
+            stub.apis.fake(Name=config.resource_ident, Target=config.function_arn)
+            alias_gw.provision()
+
+            api = utils.first(stub.apis.recs.values())
+            assert api['Target'] == config.invoke_arn
+            assert (
+                stub.apis.call_count(
+                    'update_integration',
+                    ApiId=api['ApiId'],
+                    IntegrationId='fake-int-id',
+                    IntegrationUri=config.invoke_arn,
+                )
+                == 1
+            )
+
+        assert (
+            f'GatewayAPIs sync target: integration now invokes {config.invoke_arn}' in logs.messages
+        )
+
+    def test_permission_on_alias(self, alias_gw: gateway.Gateway):
+        perms = alias_gw.func_perms
+        with (
+            mock_patch_obj(perms.b3c, 'get_policy') as m_get_policy,
+            mock_patch_obj(perms.b3c, 'add_permission') as m_add_permission,
+        ):
+            m_get_policy.return_value = {'Policy': '{"Statement": []}'}
+            perms.ensure(
+                'api-invoke-stmt',
+                config=alias_gw.config,
+                perm_type='api-invoke',
+                api_key='fake-api-id',
+            )
+
+        invoke_arn = alias_gw.config.invoke_arn
+        m_get_policy.assert_any_call(FunctionName=invoke_arn)
+        assert m_add_permission.call_args.kwargs['FunctionName'] == invoke_arn
+
     def test_cert_describe(self, gw: gateway.Gateway):
         with mocking.acm_certs(gw.acm_certs, exists=True):
             cert: dict = gw.cert_describe()
@@ -0,0 +1,76 @@
+import json
+from unittest import mock
+
+import docker
+import pytest
+
+from mu.libs import importtime
+
+
+output = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 | _io
+import time:        50 |         50 |       botocore.compat
+import time:       200 |        250 |     botocore
+import time:       300 |        550 |   boto3
+import time:        20 |         20 |   json
+import time:      1000 |       1000 |   mu.tasks
+import time:        30 |       1600 | app
+"""
+
+
+class TestImportTime:
+    def test_parse(self):
+        roots = importtime.parse(output)
+        assert [rec.module for rec in roots] == ['_io', 'app']
+
+        app = importtime.find(roots, 'app')
+        assert app.cumulative_us == 1600
+        assert [rec.module for rec in app.children] == ['boto3', 'json', 'mu.tasks']
+        assert [rec.module for rec in app.ranked()] == ['mu.tasks', 'boto3', 'json']
+
+        boto3 = app.children[0]
+        assert boto3.children[0].children[0].module == 'botocore.compat'
+
+    def test_find_missing(self):
+        with pytest.raises(ValueError, match='Import of nope not found'):
+            importtime.find(importtime.parse(output), 'nope')
+
+    def test_report(self):
+        app = importtime.find(importtime.parse(output), 'app')
+
+        assert importtime.report(app, max_depth=1, min_us=100).splitlines() == [
+            'Cumulative import time:',
+            '      1.6ms  app',
+            '      1.0ms    mu.tasks',
+            '      0.6ms    boto3  <-- heavy',
+            '',
+            'Heavy imports:',
+            '      0.6ms  boto3',
+            '      0.2ms  botocore',
+        ]
+
+    def test_report_json(self):
+        app = importtime.find(importtime.parse(output), 'app')
+        data = json.loads(importtime.report_json(app, min_us=500))
+
+        assert data['total_us'] == 1600
+        assert data['flagged'] == {'boto3': 550, 'botocore': 250}
+        assert [child['module'] for child in data['tree']['children']] == ['mu.tasks', 'boto3']
+        assert data['tree']['children'][1]['children'] == []
+
+    def test_handler_module(self):
+        assert importtime.handler_module(['app.lambda_handler']) == 'app'
+        assert importtime.handler_module(['pkg.handler.entry']) == 'pkg.handler'
+
+        with pytest.raises(ValueError, match='Image has no CMD'):
+            importtime.handler_module(None)
+
+    @mock.patch.object(importtime.docker, 'from_env')
+    def test_image_handler_module(self, m_from_env):
+        images = m_from_env.return_value.images
+        images.get.return_value.attrs = {'Config': {'Cmd': ['app.lambda_handler']}}
+        assert importtime.image_handler_module('greek-mu') == 'app'
+
+        images.get.side_effect = docker.errors.ImageNotFound('nope')
+        with pytest.raises(ValueError, match='Image not found: greek-mu'):
+            importtime.image_handler_module('greek-mu')
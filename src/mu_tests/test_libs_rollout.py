@@ -0,0 +1,72 @@
+import logging
+import threading
+
+from mu.libs import rollout
+from mu.libs.testing import Logs
+
+
+log = logging.getLogger('mu.testing')
+
+
+class TestRollout:
+    def test_parallel(self, logs: Logs):
+        # Each env waits for the others so they have to run at the same time
+        barrier = threading.Barrier(3, timeout=5)
+
+        def deploy(env):
+            log.info('Deploying')
+            barrier.wait()
+
+        results = rollout.run(deploy, ['qa', 'beta', 'prod'], parallel=3)
+
+        assert [(r.env, r.status) for r in results] == [
+            ('qa', 'ok'),
+            ('beta', 'ok'),
+            ('prod', 'ok'),
+        ]
+        assert all(r.secs is not None for r in results)
+        rollout.check(results)
+
+    def test_fail_fast(self, logs: Logs):
+        def deploy(env):
+            if env == 'qa':
+                raise RuntimeError('Warp core breach')
+
+        results = rollout.run(deploy, ['qa', 'beta', 'prod'], parallel=1)
+
+        assert [r.status for r in results] == ['failed', 'cancelled', 'cancelled']
+        assert str(results[0].error) == 'Warp core breach'
+
+    def test_continue_on_error(self, logs: Logs):
+        def deploy(env):
+            if env == 'qa':
+                raise RuntimeError('Warp core breach')
+
+        results = rollout.run(deploy, ['qa', 'beta', 'prod'], parallel=1, fail_fast=False)
+        assert [r.status for r in results] == ['failed', 'ok', 'ok']
+
+        summary = rollout.summary(results).splitlines()
+        assert summary[0].startswith('qa    failed')
+        assert summary[0].endswith('RuntimeError: Warp core breach')
+        assert summary[1].startswith('beta  ok')
+
+        try:
+            rollout.check(results)
+        except rollout.EnvFailed as e:
+            assert str(e) == 'Not completed: qa'
+        else:
+            raise AssertionError('EnvFailed not raised')
+
+    def test_prefix_filter(self):
+        prefix = rollout.EnvPrefixFilter()
+        record = logging.LogRecord('mu', logging.INFO, 'x.py', 1, 'Deploying', (), None)
+
+        token = rollout.current_env.set('qa')
+        try:
+            prefix.filter(record)
+            # Only once when there are several handlers
+            prefix.filter(record)
+        finally:
+            rollout.current_env.reset(token)
+
+        assert record.getMessage() == '[qa] Deploying'
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from mu.libs import rollout, steps
+from mu.libs.testing import Logs
+
+
+class TestSteps:
+    def test_order(self, logs: Logs):
+        calls = []
+        # The policy steps wait for each other so they have to run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def call(name, wait=False):
+            def step():
+                if wait:
+                    barrier.wait()
+                calls.append(name)
+
+            return step
+
+        results = steps.run(
+            [
+                steps.Step('role', call('role')),
+                steps.Step('policy-logs', call('policy-logs', wait=True), after=('role',)),
+                steps.Step('policy-sqs', call('policy-sqs', wait=True), after=('role',)),
+                steps.Step('done', call('done'), after=('policy-logs', 'policy-sqs')),
+            ],
+        )
+
+        assert calls[0] == 'role'
+        assert sorted(calls[1:3]) == ['policy-logs', 'policy-sqs']
+        assert calls[3] == 'done'
+        assert [r.status for r in results] == ['ok'] * 4
+        assert all(r.secs is not None for r in results)
+        assert logs.messages[0].startswith('Step timings:\n  role         ok')
+
+    def test_failure(self, logs: Logs):
+        calls = []
+
+        def fail():
+            raise RuntimeError('Access denied')
+
+        with pytest.raises(RuntimeError, match='Access denied'):
+            steps.run(
+                [
+                    steps.Step('role', fail),
+                    steps.Step('policy', lambda: calls.append('policy'), after=('role',)),
+                ],
+            )
+
+        assert calls == []
+        assert logs.messages[0] == 'Step failed: role: RuntimeError: Access denied'
+        assert logs.messages[1].endswith('policy  skipped')
+
+    def test_context(self):
+        envs = []
+        token = rollout.current_env.set('qa')
+        try:
+            steps.run([steps.Step('role', lambda: envs.append(rollout.current_env.get()))])
+        finally:
+            rollout.current_env.reset(token)
+
+        assert envs == ['qa']
+
+    def test_check(self):
+        with pytest.raises(ValueError, match='unknown steps'):
+            steps.check([steps.Step('policy', print, after=('role',))])
+
+        with pytest.raises(ValueError, match='circular'):
+            steps.check(
+                [steps.Step('a', print, after=('b',)), steps.Step('b', print, after=('a',))],
+            )
+
+        with pytest.raises(ValueError, match='unique'):
+            steps.check([steps.Step('a', print), steps.Step('a', print)])
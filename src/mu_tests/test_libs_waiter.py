@@ -0,0 +1,91 @@
+import pytest
+
+from mu.libs import utils, waiter
+from mu.libs.testing import Logs
+
+
+fast = waiter.Backoff(first=0.001, max_delay=0.005, deadline=0.05)
+
+
+class TestBackoff:
+    def test_delays(self):
+        backoff = waiter.Backoff(first=0.1, factor=2, max_delay=0.5, jitter=0)
+        delays = backoff.delays()
+        assert [next(delays) for _ in range(5)] == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+    def test_jitter(self):
+        delays = waiter.Backoff(first=1, factor=1, jitter=0.2).delays()
+        assert all(0.8 <= next(delays) <= 1.2 for _ in range(50))
+
+
+class TestWait:
+    def test_ready(self, logs: Logs):
+        results = iter([None, '', 'warp'])
+        progress = []
+
+        assert (
+            waiter.wait(
+                lambda: next(results),
+                waiting_for='warp core',
+                backoff=fast,
+                progress=progress.append,
+            )
+            == 'warp'
+        )
+        assert [p.attempt for p in progress] == [1, 2]
+        assert all(p.waiting_for == 'warp core' for p in progress)
+        assert logs.messages == []
+
+    def test_deadline(self, logs: Logs):
+        with pytest.raises(waiter.WaitTimeout, match='for shields'):
+            waiter.wait(lambda: False, waiting_for='shields', backoff=fast)
+
+        assert logs.messages[0].startswith('Waiting 0.00')
+        assert logs.messages[0].endswith('s for shields')
+
+    def test_retry_on(self):
+        calls = []
+
+        def check():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ValueError('not yet')
+            return None
+
+        assert (
+            waiter.wait(
+                check,
+                waiting_for='sensors',
+                backoff=fast,
+                ready=lambda result: True,
+                retry_on=(ValueError,),
+                retry_if=lambda exc: 'not yet' in str(exc),
+                progress=None,
+            )
+            is None
+        )
+        assert len(calls) == 3
+
+    def test_retry_if(self):
+        def check():
+            raise ValueError('hull breach')
+
+        with pytest.raises(ValueError, match='hull breach'):
+            waiter.wait(
+                check,
+                waiting_for='sensors',
+                backoff=fast,
+                retry_on=(ValueError,),
+                retry_if=lambda exc: 'not yet' in str(exc),
+            )
+
+    def test_last_error_raised(self):
+        def check():
+            raise ValueError('not yet')
+
+        with pytest.raises(ValueError, match='not yet'):
+            waiter.wait(check, waiting_for='sensors', backoff=fast, retry_on=(ValueError,))
+
+    def test_utils_retry(self, logs: Logs):
+        assert utils.retry(lambda: None, waiting_for='transporter', secs=0.005, count=2) is None
+        assert utils.retry(lambda x: x * 2, 21, waiting_for='transporter') == 42
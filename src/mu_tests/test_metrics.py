@@ -0,0 +1,97 @@
+from unittest import mock
+
+import pytest
+
+from mu import ActionHandler, metrics
+from mu.libs.testing import Logs
+from mu_tests.data.event_wsgi import wsgi_event
+
+
+class Handler(ActionHandler):
+    @staticmethod
+    def hello(event, context):
+        return 'world'
+
+
+class Context:
+    aws_request_id = 'req-1'
+
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 2500
+
+
+@pytest.fixture
+def sink():
+    sink = metrics.MemorySink()
+    with (
+        mock.patch.object(Handler, 'metrics_sink', sink),
+        mock.patch.object(metrics, '_cold', True),
+    ):
+        yield sink
+
+
+class TestMetrics:
+    def test_action(self, sink: metrics.MemorySink):
+        Handler.on_event({'do-action': 'hello'}, Context)
+        Handler.on_event({'do-action': 'hello'}, Context)
+
+        first, second = sink.metrics()
+        assert first['EventType'] == 'action'
+        assert first['Name'] == 'hello'
+        assert first['Duration'] >= 0
+        assert first['MaxRSS'] > 0
+        assert first['RemainingTime'] == 2500
+        assert first['requestId'] == 'req-1'
+        assert (first['ColdStart'], first['Errors']) == (1, 0)
+        assert second['ColdStart'] == 0
+
+        emf = sink.records[0]['_aws']['CloudWatchMetrics'][0]
+        assert emf['Namespace'] == 'mu'
+        assert emf['Dimensions'] == [['EventType'], ['EventType', 'Name']]
+        assert {m['Name'] for m in emf['Metrics']} == {
+            'Duration',
+            'ColdStart',
+            'Errors',
+            'MaxRSS',
+            'RemainingTime',
+        }
+
+    def test_error(self, sink: metrics.MemorySink, logs: Logs):
+        Handler.on_event({'do-action': 'error'}, {})
+
+        [rec] = sink.metrics()
+        assert rec['Name'] == 'error'
+        assert rec['Errors'] == 1
+        # Not a lambda context
+        assert 'RemainingTime' not in rec
+
+    def test_http(self, sink: metrics.MemorySink):
+        Handler.on_event(wsgi_event, {})
+
+        [rec] = sink.metrics()
+        assert rec['EventType'] == 'http'
+        assert 'Name' not in rec
+        assert rec['path'] == '/'
+        assert sink.records[0]['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['EventType']]
+
+    def test_keep_warm_skipped(self, sink: metrics.MemorySink):
+        Handler.on_event({'mu-keep-warm': 1}, {})
+        assert sink.records == []
+
+    def test_sink_error(self, sink: metrics.MemorySink, logs: Logs):
+        with mock.patch.object(sink, 'emit', side_effect=RuntimeError('Sensor array offline')):
+            assert Handler.on_event({'do-action': 'hello'}, Context) == 'world'
+
+        assert logs.messages[-1] == 'ActionHandler.record_metrics() caught an unhandled exception'
+
+    def test_off_by_default(self, capsys):
+        assert ActionHandler.metrics_sink is None
+        Handler.on_event({'do-action': 'hello'}, Context)
+        assert capsys.readouterr().out == ''
+
+    def test_stdout(self, capsys):
+        metrics.StdoutSink().emit(
+            metrics.emf('mu', {'EventType': 'action'}, {'Duration': (1, 'Milliseconds')}),
+        )
+        assert '"Duration": 1' in capsys.readouterr().out
@@ -0,0 +1,119 @@
+import base64
+import gzip
+import json
+from unittest import mock
+
+import pytest
+
+from mu import ActionHandler, responses
+from mu_tests.data.event_wsgi import wsgi_event
+
+
+def json_app(environ, start_response):
+    body = json.dumps({'crew': ['picard'] * 500}).encode()
+    start_response(
+        '200 OK',
+        [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Vary', 'Cookie'),
+        ],
+    )
+    return [body]
+
+
+def csv_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/csv; charset=utf-8')])
+    return [b'id,name\n1,picard\n']
+
+
+class Handler(ActionHandler):
+    wsgi_app = json_app
+    compression = responses.Compression()
+
+
+class TestBinary:
+    @pytest.mark.parametrize(
+        'content_type',
+        [
+            'image/png',
+            'IMAGE/WEBP',
+            'application/zip',
+            'application/vnd.ms-excel',
+            'font/woff2',
+            'application/octet-stream; name=x',
+        ],
+    )
+    def test_binary(self, content_type):
+        assert responses.is_binary(content_type, responses.base64_content_types)
+
+    @pytest.mark.parametrize(
+        'content_type',
+        [
+            None,
+            'text/csv; charset=utf-8',
+            'image/svg+xml',
+            'application/json',
+            'application/vnd.api+json',
+            'application/atom+xml',
+        ],
+    )
+    def test_text(self, content_type):
+        assert not responses.is_binary(content_type, responses.base64_content_types)
+
+    def test_undecodable(self):
+        resp = responses.response(200, [('Content-Type', 'text/plain')], b'\x80abc', None)
+        assert resp['isBase64Encoded'] is True
+        assert base64.b64decode(resp['body']) == b'\x80abc'
+
+
+class TestCompression:
+    def test_accept_encodings(self):
+        assert responses.accept_encodings('gzip, deflate;q=0.5, br;q=0') == {
+            'gzip': 1.0,
+            'deflate': 0.5,
+            'br': 0.0,
+        }
+        assert responses.accept_encodings(None) == {}
+
+    # Without the optional brotli package
+    @mock.patch.dict('sys.modules', brotli=None)
+    def test_encoding(self):
+        comp = responses.Compression()
+        assert comp.encoding('gzip, deflate, br, zstd') == 'gzip'
+        assert comp.encoding('*') == 'gzip'
+        assert comp.encoding('gzip;q=0') is None
+        assert comp.encoding('deflate') is None
+        assert comp.encoding(None) is None
+
+    # Without the optional brotli package
+    @mock.patch.dict('sys.modules', brotli=None)
+    def test_wsgi(self):
+        resp = Handler.on_event(wsgi_event, {})
+
+        assert resp['isBase64Encoded'] is True
+        assert resp['headers'] == {
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Vary': 'Cookie, Accept-Encoding',
+        }
+        body = json.loads(gzip.decompress(base64.b64decode(resp['body'])))
+        assert len(body['crew']) == 500
+
+    def test_not_accepted(self):
+        event = {**wsgi_event, 'headers': {**wsgi_event['headers'], 'accept-encoding': 'identity'}}
+        resp = Handler.on_event(event, {})
+
+        assert resp['isBase64Encoded'] is False
+        assert 'Content-Encoding' not in resp['headers']
+        assert resp['headers']['Content-Length'] == str(len(resp['body']))
+
+    @mock.patch.object(Handler, 'wsgi_app', csv_app)
+    def test_min_size(self):
+        resp = Handler.on_event(wsgi_event, {})
+        assert resp['body'] == 'id,name\n1,picard\n'
+
+    @mock.patch.object(Handler, 'compression', None)
+    def test_disabled(self):
+        resp = Handler.on_event(wsgi_event, {})
+        assert resp['isBase64Encoded'] is False
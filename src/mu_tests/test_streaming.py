@@ -0,0 +1,271 @@
+import base64
+import datetime
+import http.server
+import json
+from os import environ
+import threading
+from unittest import mock
+
+import pytest
+
+from mu import ActionHandler, runtime, streaming
+from mu.libs.testing import Logs
+from mu_tests.data.event_wsgi import wsgi_event
+
+
+def export_app(environ, start_response):
+    start_response(
+        '200 OK',
+        [
+            ('Content-Type', 'text/csv'),
+            ('Set-Cookie', 'a=1'),
+            ('Set-Cookie', 'b=2'),
+            ('Vary', 'Accept'),
+            ('Vary', 'Cookie'),
+        ],
+    )
+    return iter((b'id,name\n', b'', b'1,picard\n'))
+
+
+def empty_app(environ, start_response):
+    start_response('204 No Content', [])
+    return []
+
+
+def broken_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/csv')])
+    yield b'id,name\n'
+    raise RuntimeError('Warp core breach')
+
+
+class Handler(ActionHandler):
+    wsgi_app = export_app
+
+
+url_event = {
+    **wsgi_event,
+    'requestContext': {
+        **wsgi_event['requestContext'],
+        'domainName': 'abcdefg.lambda-url.us-east-2.on.aws',
+    },
+}
+
+
+class TestStreamingResponse:
+    def test_chunks(self):
+        writer = streaming.MemoryWriter()
+        streaming.StreamingResponse(export_app, wsgi_event, None).write_to(writer)
+
+        # Written as produced, the prelude goes with the first chunk.
+        assert len(writer.chunks) == 3
+        assert writer.chunks[1:] == [b'id,name\n', b'1,picard\n']
+        assert writer.prelude() == {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'text/csv', 'Vary': 'Accept, Cookie'},
+            'cookies': ['a=1', 'b=2'],
+        }
+        assert writer.body() == b'id,name\n1,picard\n'
+        assert writer.closed
+        assert writer.exc is None
+
+    def test_empty(self):
+        writer = streaming.MemoryWriter()
+        streaming.StreamingResponse(empty_app, wsgi_event, None).write_to(writer)
+
+        assert writer.prelude()['statusCode'] == 204
+        assert writer.body() == b''
+
+    def test_error(self):
+        writer = streaming.MemoryWriter()
+        with pytest.raises(RuntimeError, match='Warp core breach'):
+            streaming.StreamingResponse(broken_app, wsgi_event, None).write_to(writer)
+
+        assert writer.body() == b'id,name\n'
+        assert str(writer.exc) == 'Warp core breach'
+
+
+class TestHandler:
+    @mock.patch.dict(environ, MU_URL_STREAMING='true')
+    @mock.patch.object(streaming, 'runtime_supported', True)
+    def test_streaming(self):
+        resp = Handler.on_event(url_event, {})
+        assert isinstance(resp, streaming.StreamingResponse)
+
+    @mock.patch.dict(environ, MU_URL_STREAMING='true')
+    @mock.patch.object(streaming, 'runtime_supported', True)
+    def test_api_gateway(self, logs: Logs):
+        # Only function URLs stream, the same function can also be behind an HTTP API
+        resp = Handler.on_event(wsgi_event, {})
+        assert resp['body'] == 'id,name\n1,picard\n'
+        assert logs.messages == []
+
+    @mock.patch.dict(environ, MU_URL_STREAMING='true')
+    @mock.patch.object(streaming, '_warned', threading.Event())
+    def test_runtime_not_supported(self, logs: Logs):
+        resp = Handler.on_event(url_event, {})
+        assert resp['body'] == 'id,name\n1,picard\n'
+
+        Handler.on_event(url_event, {})
+        assert logs.messages == [
+            (
+                'MU_URL_STREAMING is set but the runtime is not mu.runtime, responses will not be'
+                ' streamed'
+            ),
+        ]
+
+    def test_not_configured(self):
+        resp = Handler.on_event(wsgi_event, {})
+        assert resp['statusCode'] == 200
+
+
+class FakeRuntimeAPI(http.server.BaseHTTPRequestHandler):
+    """Stand-in for Lambda's runtime API"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        num, event = self.server.events.pop(0)
+        body = json.dumps(event).encode()
+        self.send_response(200)
+        self.send_header('Lambda-Runtime-Aws-Request-Id', f'req-{num}')
+        self.send_header('Lambda-Runtime-Deadline-Ms', '0')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_chunked(self) -> tuple[list[bytes], dict]:
+        chunks = []
+        while size := int(self.rfile.readline(), 16):
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+        trailers = {}
+        while (line := self.rfile.readline()) != b'\r\n':
+            name, value = line.decode().split(': ', 1)
+            trailers[name] = value.strip()
+        return chunks, trailers
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks, trailers = self.read_chunked()
+        else:
+            chunks = [self.rfile.read(int(self.headers['Content-Length']))]
+            trailers = {}
+
+        self.server.posts.append((self.path, dict(self.headers), chunks, trailers))
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def runtime_api():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FakeRuntimeAPI)
+    server.daemon_threads = True
+    server.events = []
+    server.posts = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestRuntime:
+    def run(self, server, *events):
+        server.events.extend(enumerate(events))
+        api = runtime.RuntimeAPI(f'127.0.0.1:{server.server_port}')
+        with mock.patch.dict(environ, MU_URL_STREAMING='true'):
+            runtime.run(api, Handler.on_event, runtime.JSONFormatter(), max_invokes=len(events))
+
+    @mock.patch.object(streaming, 'runtime_supported', True)
+    def test_invokes(self, runtime_api):
+        self.run(runtime_api, url_event, {'do-action': 'ping'})
+
+        (path, headers, chunks, trailers), (path2, _, body, _) = runtime_api.posts
+
+        assert path == '/2018-06-01/runtime/invocation/req-0/response'
+        assert headers['Lambda-Runtime-Function-Response-Mode'] == 'streaming'
+        assert headers['Content-Type'] == streaming.content_type
+        assert chunks[1:] == [b'id,name\n', b'1,picard\n']
+        assert trailers == {}
+
+        assert path2 == '/2018-06-01/runtime/invocation/req-1/response'
+        assert body == [b'"pong"']
+
+    @mock.patch.object(streaming, 'runtime_supported', True)
+    @mock.patch.object(Handler, 'wsgi_app', broken_app)
+    def test_stream_error(self, runtime_api, logs: Logs):
+        self.run(runtime_api, url_event)
+
+        [(_, _, chunks, trailers)] = runtime_api.posts
+        assert chunks[1:] == [b'id,name\n']
+        assert trailers['Lambda-Runtime-Function-Error-Type'] == 'RuntimeError'
+        error = json.loads(base64.b64decode(trailers['Lambda-Runtime-Function-Error-Body']))
+        assert error['errorMessage'] == 'Warp core breach'
+        assert logs.messages == ['Streamed response failed']
+
+    def test_handler_error(self, runtime_api, logs: Logs):
+        def handler(event, context):
+            raise RuntimeError('Warp core breach')
+
+        runtime_api.events.append((0, {}))
+        api = runtime.RuntimeAPI(f'127.0.0.1:{runtime_api.server_port}')
+        runtime.run(api, handler, runtime.JSONFormatter(), max_invokes=1)
+
+        [(path, headers, body, _)] = runtime_api.posts
+        assert path == '/2018-06-01/runtime/invocation/req-0/error'
+        assert headers['Lambda-Runtime-Function-Error-Type'] == 'RuntimeError'
+        assert json.loads(body[0])['errorMessage'] == 'Warp core breach'
+
+    def test_result_not_json(self, runtime_api, logs: Logs):
+        results = iter([datetime.date(2364, 1, 1), 'ok'])
+
+        def handler(event, context):
+            return next(results)
+
+        runtime_api.events.extend([(0, {}), (1, {})])
+        api = runtime.RuntimeAPI(f'127.0.0.1:{runtime_api.server_port}')
+        runtime.run(api, handler, runtime.JSONFormatter(), max_invokes=2)
+
+        (path, headers, body, _), (path2, _, body2, _) = runtime_api.posts
+        assert path == '/2018-06-01/runtime/invocation/req-0/error'
+        assert headers['Lambda-Runtime-Function-Error-Type'] == 'TypeError'
+        assert 'not JSON serializable' in json.loads(body[0])['errorMessage']
+        assert path2 == '/2018-06-01/runtime/invocation/req-1/response'
+        assert body2 == [b'"ok"']
+        assert logs.messages == ['Handler result could not be serialized to JSON']
+
+    def test_invoke_error_continues(self, runtime_api, logs: Logs):
+        runtime_api.events.extend([(0, {}), (1, {})])
+        api = runtime.RuntimeAPI(f'127.0.0.1:{runtime_api.server_port}')
+        respond = api.respond
+
+        def reject_first(request_id, body):
+            if request_id == 'req-0':
+                raise RuntimeError('Runtime API POST: 413')
+            respond(request_id, body)
+
+        with mock.patch.object(api, 'respond', side_effect=reject_first):
+            runtime.run(api, lambda event, context: 'ok', runtime.JSONFormatter(), max_invokes=2)
+
+        [(path, _, body, _)] = runtime_api.posts
+        assert path == '/2018-06-01/runtime/invocation/req-1/response'
+        assert body == [b'"ok"']
+        assert logs.messages == ['Invocation not completed: req-0']
+
+    def test_json_formatter(self):
+        formatter = runtime.JSONFormatter()
+        formatter.request_id = 'req-0'
+        rec = runtime.logging.LogRecord('mu', 20, 'x.py', 1, 'Hi %s', ('Q',), None)
+        rec.event = {'a': 1}
+
+        data = json.loads(formatter.format(rec))
+        assert data['message'] == 'Hi Q'
+        assert data['level'] == 'INFO'
+        assert data['requestId'] == 'req-0'
+        assert data['event'] == {'a': 1}
+        assert data['timestamp'].endswith('Z')
@@ -1,10 +1,17 @@
 import datetime as dt
+from decimal import Decimal
+import io
+import json
 from os import environ
+import sys
 from unittest import mock
+import uuid
 
+from botocore.exceptions import ClientError
 import pytest
 
 from mu import tasks
+from mu.libs import auth
 from mu.libs.testing import mock_patch_obj
 from mu.tasks import AsyncTask
 
@@ -32,6 +39,58 @@ def enterprise_f(arg1, *, arg2):
     return ('ncc-1701-f', arg1, arg2)
 
 
+@tasks.task(queue='jobs')
+def enterprise_g(arg1, *, arg2):
+    return ('ncc-1701-g', arg1, arg2)
+
+
+@tasks.task(encoding='zjson')
+def enterprise_z(*args, **kwargs):
+    return args, kwargs
+
+
+local_calls = []
+
+
+@tasks.task
+def enterprise_local(arg1, *, arg2):
+    if arg1 == 'boom':
+        raise RuntimeError('Warp core breach')
+    local_calls.append((arg1, arg2))
+
+
+@tasks.task
+def warp_factor(speed, *, boost=1):
+    if speed == 'boom':
+        raise RuntimeError('Warp core breach')
+    return speed * boost
+
+
+@tasks.task
+def warp_total(speeds, label=''):
+    return f'{label}{sum(speeds)}'
+
+
+@tasks.task
+def warp_cost(speed):
+    # e.g. read from DynamoDB
+    return Decimal(speed) * Decimal('1.5')
+
+
+@tasks.task
+def warp_audit(cost, tags=()):
+    assert isinstance(cost, Decimal), cost
+    return {'cost': cost, 'tags': {'audited', *tags}}
+
+
+@tasks.task
+def sensor_sweep(kind):
+    if kind == 'anomaly':
+        # Not serializable
+        return object()
+    return kind
+
+
 def invoke_resp():
     return {
         'StatusCode': 202,
@@ -66,16 +125,654 @@ class TestAsyncTask:
             Payload=payload,
         )
 
+    def test_invoke_failed(self, m_invoke, logs):
+        m_invoke.return_value = {'StatusCode': 500, 'FunctionError': 'Unhandled'}
+
+        task = AsyncTask(enterprise_d)
+        assert task.invoke(1, arg2=2) is None
+
+        assert logs.messages == ['Invoking task mu_tests.test_tasks:enterprise_d failed']
+
+    def test_invoke_many(self, m_invoke, logs):
+        def invoke(FunctionName, InvocationType, Payload):
+            if '"args": [2]' in Payload:
+                raise RuntimeError('Rate exceeded')
+            return invoke_resp() | {'ResponseMetadata': {'RequestId': Payload[-5:-3]}}
+
+        m_invoke.side_effect = invoke
+
+        task = AsyncTask(enterprise_d)
+        results = task.invoke_many(((i,), {'arg2': f'b{i}'}) for i in range(4))
+
+        assert [result.ident for result in results] == [0, 1, 2, 3]
+        request_ids = [result.rec.request_id if result.rec else None for result in results]
+        assert request_ids == ['b0', 'b1', None, 'b3']
+        assert [str(result.exc) for result in results if result.exc] == ['Rate exceeded']
+        assert m_invoke.call_count == 4
+        assert logs.messages[-1] == (
+            'Async task invoke many: mu_tests.test_tasks:enterprise_d; 3 invoked, 1 failed'
+        )
+
+
+class TestClient:
+    @pytest.fixture(autouse=True)
+    def m_b3_sess(self):
+        tasks.clients_clear()
+        with (
+            mock_patch_obj(auth, 'b3_sess') as m_b3_sess,
+            mock.patch.dict(environ, AWS_REGION='us-east-2', AWS_ACCESS_KEY_ID='key-1'),
+        ):
+            m_b3_sess.return_value.client.side_effect = lambda *args, **kwargs: mock.Mock()
+            yield m_b3_sess
+        tasks.clients_clear()
+
+    def test_cached(self, m_b3_sess):
+        lc = tasks.client()
+        assert tasks.client() is lc
+        assert m_b3_sess.call_count == 1
+
+        m_client = m_b3_sess.return_value.client
+        m_client.assert_called_once_with('lambda', config=mock.ANY)
+        assert m_client.call_args.kwargs['config'].max_pool_connections == 25
+
+    def test_rotated_creds(self, m_b3_sess):
+        lc = tasks.client()
+
+        with mock.patch.dict(environ, AWS_ACCESS_KEY_ID='key-2'):
+            assert tasks.client() is not lc
+
+        assert m_b3_sess.call_count == 2
+
+    @mock.patch.dict(environ, MU_TASKS_MAX_POOL_CONNECTIONS='50')
+    def test_max_pool_connections(self, m_b3_sess):
+        tasks.client()
+        config = m_b3_sess.return_value.client.call_args.kwargs['config']
+        assert config.max_pool_connections == 50
+
+    def test_expired_creds(self, m_b3_sess, logs):
+        expired = ClientError({'Error': {'Code': 'ExpiredTokenException'}}, 'Invoke')
+        tasks.client().invoke.side_effect = expired
+
+        result = tasks.client_call('lambda', 'invoke', FunctionName='foo')
+        assert result is tasks.client().invoke.return_value
+        assert m_b3_sess.call_count == 2
+        assert logs.messages == ['AWS credentials expired, recreating lambda client']
+
+
+class TestQueuedTask:
+    @pytest.fixture
+    def m_client(self):
+        with (
+            mock_patch_obj(tasks, 'client') as m_client,
+            mock.patch.dict(environ, MU_RESOURCE_IDENT='starfleet-lambda-func-qa'),
+        ):
+            m_client.return_value.get_queue_url.return_value = {'QueueUrl': 'https://jobs'}
+            yield m_client.return_value
 
-def test_call_task():
-    result = tasks.call_task(
-        {
-            'task-path': 'mu_tests.test_tasks:enterprise_d',
-            'args': ['a'],
-            'kwargs': {'arg2': 'b'},
-        },
-    )
-    assert result == ('ncc-1701-d', 'a', 'b')
+        # Don't let the cached url leak into other tests
+        enterprise_g._mu_task.__dict__.pop('queue_url', None)
+
+    def test_invoke(self, m_client, logs):
+        m_client.send_message.return_value = {'MessageId': 'msg-1'}
+
+        handle = enterprise_g.invoke('a', arg2='b')
+        assert handle.request_id == 'msg-1'
+        assert handle.task_path == 'mu_tests.test_tasks:enterprise_g'
+
+        m_client.get_queue_url.assert_called_once_with(QueueName='starfleet-lambda-func-qa-jobs')
+        m_client.send_message.assert_called_once_with(
+            QueueUrl='https://jobs',
+            MessageBody='{"task-path": "mu_tests.test_tasks:enterprise_g", "args": ["a"],'
+            ' "kwargs": {"arg2": "b"}}',
+        )
+        m_client.invoke.assert_not_called()
+        assert logs.messages == [
+            (
+                'Async task queued: starfleet-lambda-func-qa-jobs ->'
+                ' mu_tests.test_tasks:enterprise_g; Message ID: msg-1'
+            ),
+        ]
+
+    def test_invoke_many(self, m_client):
+        def send_batch(QueueUrl, Entries):
+            if Entries[0]['Id'] == '20':
+                raise RuntimeError('Service unavailable')
+
+            return {
+                'Successful': [
+                    {'Id': entry['Id'], 'MessageId': f'msg-{entry["Id"]}'}
+                    for entry in Entries
+                    if entry['Id'] != '3'
+                ],
+                'Failed': [
+                    {'Id': entry['Id'], 'Code': 'Throttled', 'SenderFault': False}
+                    for entry in Entries
+                    if entry['Id'] == '3'
+                ],
+            }
+
+        m_client.send_message_batch.side_effect = send_batch
+
+        results = enterprise_g.invoke_many(((i,), {'arg2': i}) for i in range(25))
+
+        assert m_client.send_message_batch.call_count == 3
+        batch_sizes = [
+            len(call.kwargs['Entries']) for call in m_client.send_message_batch.call_args_list
+        ]
+        assert sorted(batch_sizes) == [5, 10, 10]
+
+        assert [result.ident for result in results] == list(range(25))
+        assert results[0].rec.request_id == 'msg-0'
+        assert str(results[3].exc) == (
+            'Queueing task mu_tests.test_tasks:enterprise_g failed: Throttled '
+        )
+        assert [str(result.exc) for result in results[20:]] == ['Service unavailable'] * 5
+        assert sum(1 for result in results if result.exc) == 6
+
+    def test_invoke_many_batch_bytes(self, m_client):
+        m_client.send_message_batch.side_effect = lambda QueueUrl, Entries: {
+            'Successful': [{'Id': entry['Id'], 'MessageId': 'msg'} for entry in Entries],
+        }
+
+        # Each message is about 90 bytes, well under the per-message spillover limit
+        with mock.patch.object(AsyncTask, 'queue_batch_bytes', 300):
+            results = enterprise_g.invoke_many(((i,), {'arg2': 'x' * 10}) for i in range(10))
+
+        assert not any(result.exc for result in results)
+        batches = [call.kwargs['Entries'] for call in m_client.send_message_batch.call_args_list]
+        assert len(batches) == 4
+        for entries in batches:
+            assert sum(len(entry['MessageBody']) for entry in entries) <= 300
+
+
+class TestEncoding:
+    def test_zjson_round_trip(self, m_invoke):
+        m_invoke.return_value = invoke_resp()
+        args = (dt.date(2026, 5, 19), Decimal('1.10'), uuid.UUID(int=1701))
+        kwargs = {'at': dt.datetime(2026, 5, 19, 13, 30, tzinfo=dt.UTC), 'ids': list(range(500))}
+
+        enterprise_z.invoke(*args, **kwargs)
+
+        payload = json.loads(m_invoke.call_args.kwargs['Payload'])
+        assert payload.keys() == {'task-path', 'task-enc', 'task-data'}
+        assert payload['task-enc'] == 'zjson1'
+
+        assert tasks.call_task(payload) == (args, kwargs)
+
+    def test_zjson_smaller(self):
+        args = ([f'record-{i}' for i in range(5000)],)
+        plain = AsyncTask(enterprise_d).message(args, {})
+        compact = AsyncTask(enterprise_d, encoding='zjson').message(args, {})
+
+        assert len(compact) < len(plain) / 4
+
+    def test_unknown_encoding(self):
+        event = {'task-path': 'mu_tests.test_tasks:enterprise_z', 'task-enc': 'zjson9'}
+        with pytest.raises(ValueError, match='Unknown task encoding: zjson9'):
+            tasks.call_task(event)
+
+    def test_invalid_encoding(self):
+        with pytest.raises(ValueError, match='encoding should be one of'):
+            AsyncTask(enterprise_d, encoding='pickle')
+
+    def test_json_unserializable(self):
+        with pytest.raises(TypeError, match='Object of type object is not JSON serializable'):
+            AsyncTask(enterprise_d).message((object(),), {})
+
+
+class TestSpillover:
+    @pytest.fixture
+    def m_client(self):
+        with (
+            mock_patch_obj(tasks, 'client') as m_client,
+            mock.patch.dict(
+                environ,
+                AWS_LAMBDA_FUNCTION_NAME='mu-task-func',
+                MU_TASKS_BUCKET='mu-tasks-bucket',
+                MU_TASKS_SPILLOVER_BYTES='100',
+            ),
+        ):
+            m_client.return_value.invoke.return_value = invoke_resp()
+            yield m_client.return_value
+
+    def test_small_payload(self, m_client):
+        enterprise_e.invoke('a', arg2='b')
+
+        m_client.put_object.assert_not_called()
+        payload = json.loads(m_client.invoke.call_args.kwargs['Payload'])
+        assert payload['args'] == ['a']
+
+    def test_spillover(self, m_client, logs):
+        enterprise_e.invoke('a' * 100, arg2='b')
+
+        put_kwargs = m_client.put_object.call_args.kwargs
+        assert put_kwargs['Bucket'] == 'mu-tasks-bucket'
+        assert put_kwargs['Key'].startswith('tasks/mu_tests.test_tasks:enterprise_e/')
+
+        payload = json.loads(m_client.invoke.call_args.kwargs['Payload'])
+        assert payload == {
+            'task-path': 'mu_tests.test_tasks:enterprise_e',
+            'task-s3': {'bucket': 'mu-tasks-bucket', 'key': put_kwargs['Key']},
+        }
+        assert logs.messages[0].startswith('Task payload spilled over: 188 bytes -> s3://')
+
+        # The task resolves the pointer and then cleans up
+        m_client.get_object.return_value = {'Body': io.BytesIO(put_kwargs['Body'])}
+        assert tasks.call_task(payload) == ('ncc-1701-e', 'a' * 100, 'b')
+
+        m_client.get_object.assert_called_once_with(
+            Bucket='mu-tasks-bucket',
+            Key=put_kwargs['Key'],
+        )
+        m_client.delete_object.assert_called_once_with(
+            Bucket='mu-tasks-bucket',
+            Key=put_kwargs['Key'],
+        )
+
+    def test_spillover_task_fails(self, m_client):
+        payload = {'task-path': 'mu_tests.test_tasks:enterprise_e', 'args': ['a'], 'kwargs': {}}
+        m_client.get_object.return_value = {'Body': io.BytesIO(json.dumps(payload).encode())}
+
+        pointer = {'task-path': payload['task-path'], 'task-s3': {'bucket': 'b', 'key': 'k'}}
+        with pytest.raises(TypeError):
+            tasks.call_task(pointer)
+
+        # Left for retries
+        m_client.delete_object.assert_not_called()
+
+    def test_no_bucket(self, m_client, logs):
+        with mock.patch.dict(environ, MU_TASKS_BUCKET=''):
+            enterprise_e.invoke('a' * 100, arg2='b')
+
+        m_client.put_object.assert_not_called()
+        assert logs.messages[0] == (
+            'Task payload is 188 bytes but no tasks bucket is configured:'
+            ' mu_tests.test_tasks:enterprise_e'
+        )
+
+
+class TestResults:
+    @pytest.fixture(autouse=True)
+    def memory_results(self):
+        tasks.results_store_clear()
+        with mock.patch.dict(
+            environ,
+            MU_TASKS_RESULTS='memory',
+            MU_TASKS_BACKEND='thread',
+        ):
+            yield
+            tasks.local_shutdown()
+        tasks.results_store_clear()
+
+    def test_result(self):
+        handle = enterprise_e.invoke('a', arg2=dt.date(2026, 5, 19))
+        assert handle.result(timeout=5) == ('ncc-1701-e', 'a', '2026-05-19')
+        assert handle.done()
+
+        rec = handle.poll()
+        assert rec.status == 'succeeded'
+        assert rec.task_path == 'mu_tests.test_tasks:enterprise_e'
+        assert rec.duration >= 0
+
+    def test_failed(self):
+        handle = enterprise_local.invoke('boom', arg2=1)
+
+        with pytest.raises(tasks.TaskFailed, match='enterprise_local: RuntimeError: Warp core'):
+            handle.result(timeout=5)
+
+        rec = handle.poll()
+        assert rec.failed
+        assert 'Traceback' in rec.error['traceback']
+
+    def test_wait_all(self):
+        results = enterprise_e.invoke_many(((i,), {'arg2': i}) for i in range(10))
+        handles = [result.rec for result in results]
+
+        recs = tasks.wait_all(handles, timeout=5)
+        assert [recs[handle.id].value()[1] for handle in handles] == list(range(10))
+
+    def test_timeout(self):
+        handle = tasks.TaskHandle('mu_tests.test_tasks:enterprise_e', 'never-invoked')
+        assert handle.poll() is None
+
+        with pytest.raises(TimeoutError, match=r'1 tasks not finished after 0\.1s'):
+            handle.result(timeout=0.1, poll_secs=0.05)
+
+    def test_task_id_in_payload(self, m_invoke):
+        m_invoke.return_value = invoke_resp()
+
+        with mock.patch.dict(environ, MU_TASKS_BACKEND='lambda'):
+            handle = enterprise_e.invoke('a', arg2='b')
+
+        payload = json.loads(m_invoke.call_args.kwargs['Payload'])
+        assert payload['task-id'] == handle.id
+
+    def test_not_configured(self):
+        handle = enterprise_e.invoke('a', arg2='b')
+
+        with (
+            mock.patch.dict(environ, MU_TASKS_RESULTS=''),
+            pytest.raises(RuntimeError, match='Task results need MU_TASKS_RESULTS'),
+        ):
+            handle.result()
+
+
+class TestDynamoResults:
+    def test_round_trip(self):
+        store = tasks.DynamoResults('results-table')
+        rec = tasks.TaskResult(
+            id='abc',
+            task_path='mu_tests.test_tasks:enterprise_e',
+            status='succeeded',
+            duration=0.5,
+            result={'on': dt.date(2026, 5, 19), 'cost': Decimal('1.10')},
+        )
+
+        with mock_patch_obj(tasks, 'client') as m_client:
+            store.put(rec)
+            item = m_client.return_value.put_item.call_args.kwargs['Item']
+            assert item['id'] == {'S': 'abc'}
+            assert int(item['expires_at']['N']) > 0
+
+            m_client.return_value.batch_get_item.side_effect = [
+                {
+                    'Responses': {'results-table': []},
+                    'UnprocessedKeys': {'results-table': {'Keys': [{'id': {'S': 'abc'}}]}},
+                },
+                {'Responses': {'results-table': [item]}, 'UnprocessedKeys': {}},
+            ]
+            assert store.get_many(['abc']) == {'abc': rec}
+
+        assert m_client.return_value.batch_get_item.call_count == 2
+
+    def test_join_claim(self):
+        store = tasks.DynamoResults('results-table')
+
+        with mock_patch_obj(tasks, 'client') as m_client:
+            m_update = m_client.return_value.update_item
+            m_update.return_value = {'Attributes': {'members': {'SS': ['abc-0', 'abc-1']}}}
+            assert store.join('chord-abc', 'abc-1') == 2
+            assert m_update.call_args.kwargs['ExpressionAttributeValues'][':member'] == {
+                'SS': ['abc-1'],
+            }
+
+            m_update.return_value = {}
+            assert store.claim('chord-abc')
+
+            m_update.side_effect = ClientError(
+                {'Error': {'Code': 'ConditionalCheckFailedException'}},
+                'UpdateItem',
+            )
+            assert not store.claim('chord-abc')
+
+
+class TestResultNotRecorded:
+    @pytest.fixture
+    def m_put(self):
+        tasks.results_store_clear()
+        with (
+            mock_patch_obj(tasks, 'client') as m_client,
+            mock.patch.dict(
+                environ,
+                MU_TASKS_RESULTS='dynamodb',
+                MU_TASKS_RESULTS_TABLE='results-table',
+            ),
+        ):
+            yield m_client.return_value.put_item
+        tasks.results_store_clear()
+
+    def call(self, kind):
+        event = {
+            'task-path': 'mu_tests.test_tasks:sensor_sweep',
+            'args': [kind],
+            'kwargs': {},
+            'task-id': 'abc',
+        }
+        return tasks.call_task(event)
+
+    def marker(self, m_put) -> tasks.TaskResult:
+        rec = tasks.DynamoResults.from_item(m_put.call_args.kwargs['Item'])
+        assert rec.status == 'failed'
+        assert rec.error['type'] == 'ResultNotRecorded'
+        return rec
+
+    def test_unserializable(self, m_put, logs):
+        # The task succeeded so it isn't retried
+        assert self.call('anomaly')
+
+        # The result failed to serialize, only the marker was put
+        m_put.assert_called_once()
+        rec = self.marker(m_put)
+        assert rec.error['message'] == 'TypeError: Object of type object is not JSON serializable'
+        assert 'Task result not recorded: mu_tests.test_tasks:sensor_sweep; Task ID: abc' in (
+            logs.messages
+        )
+
+    def test_too_big(self, m_put):
+        m_put.side_effect = [
+            ClientError(
+                {
+                    'Error': {
+                        'Code': 'ValidationException',
+                        'Message': 'Item size has exceeded the maximum allowed size',
+                    },
+                },
+                'PutItem',
+            ),
+            {},
+        ]
+        assert self.call('nebula' * 100_000) == 'nebula' * 100_000
+
+        assert m_put.call_count == 2
+        assert 'maximum allowed size' in self.marker(m_put).error['message']
+
+    def test_marker_fails(self, m_put, logs):
+        m_put.side_effect = ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException'}},
+            'PutItem',
+        )
+        assert self.call('nebula') == 'nebula'
+        assert logs.messages[-1] == (
+            'Task result marker not recorded: mu_tests.test_tasks:sensor_sweep; Task ID: abc'
+        )
+
+
+class TestFlows:
+    @pytest.fixture(autouse=True)
+    def memory_results(self):
+        tasks.results_store_clear()
+        with mock.patch.dict(
+            environ,
+            MU_TASKS_RESULTS='memory',
+            MU_TASKS_BACKEND='thread',
+        ):
+            yield
+            tasks.local_shutdown()
+        tasks.results_store_clear()
+
+    def test_signature(self):
+        sig = warp_factor.s(2, boost=3)
+        assert sig == tasks.Signature('mu_tests.test_tasks:warp_factor', (2,), {'boost': 3})
+        assert sig.invoke().result(timeout=5) == 6
+
+    def test_chain(self):
+        handle = tasks.chain(
+            warp_factor.s(2),
+            warp_factor.s(boost=3),
+            warp_factor.s(boost=4),
+        ).invoke()
+
+        assert handle.task_path == 'mu_tests.test_tasks:warp_factor'
+        assert handle.result(timeout=5) == 24
+
+    def test_chain_tagged_types(self):
+        handle = tasks.chain(
+            warp_cost.s(3),
+            warp_audit.s(tags=['warp']),
+        ).invoke()
+
+        assert handle.result(timeout=5) == {'cost': Decimal('4.5'), 'tags': {'audited', 'warp'}}
+
+    def test_chord_tagged_types(self):
+        handle = tasks.chord([warp_cost.s(1), warp_cost.s(2)], warp_total.s()).invoke()
+        assert handle.result(timeout=5) == '4.5'
+
+    def test_chain_failed(self):
+        handle = tasks.chain(warp_factor.s('boom'), warp_factor.s(boost=3)).invoke()
+
+        with pytest.raises(TimeoutError):
+            handle.result(timeout=0.5, poll_secs=0.05)
+
+    def test_chain_empty(self):
+        with pytest.raises(ValueError, match='A chain needs at least one task'):
+            tasks.chain()
+
+    def test_group(self):
+        results = tasks.group(
+            [warp_factor.s(1), warp_total.s([1, 2]), warp_factor.s(3, boost=2)],
+        ).invoke()
+
+        handles = [result.rec for result in results]
+        recs = tasks.wait_all(handles, timeout=5)
+        assert [recs[handle.id].value() for handle in handles] == [1, '3', 6]
+
+    def test_chord(self):
+        handle = tasks.chord(
+            [warp_factor.s(speed, boost=2) for speed in range(10)],
+            warp_total.s(label='total: '),
+        ).invoke()
+
+        assert handle.task_path == 'mu_tests.test_tasks:warp_total'
+        assert handle.result(timeout=5) == 'total: 90'
+
+    def test_chord_empty(self):
+        handle = tasks.chord([], warp_total.s()).invoke()
+        assert handle.result(timeout=5) == '0'
+
+    def test_chord_failed(self):
+        handle = tasks.chord([warp_factor.s(1), warp_factor.s('boom')], warp_total.s()).invoke()
+
+        with pytest.raises(TimeoutError):
+            handle.result(timeout=0.5, poll_secs=0.05)
+
+    def test_chord_join_once(self):
+        chord = {'id': 'abc', 'size': 2, 'callback': warp_total.s().link('abc-callback')}
+        store = tasks.results_store()
+        for num in range(2):
+            tasks.record_result(f'abc-{num}', 'mu_tests.test_tasks:warp_factor', 0, result=num)
+
+        with mock_patch_obj(tasks, 'invoke_link') as m_invoke_link:
+            tasks.chord_join(chord, 'abc-0')
+            # Retried task doesn't complete the chord
+            tasks.chord_join(chord, 'abc-0')
+            m_invoke_link.assert_not_called()
+
+            tasks.chord_join(chord, 'abc-1')
+            tasks.chord_join(chord, 'abc-1')
+            m_invoke_link.assert_called_once_with(chord['callback'], [0, 1])
+
+        assert store.joined['chord-abc'] == {'abc-0', 'abc-1'}
+
+    def test_chord_needs_results(self):
+        with (
+            mock.patch.dict(environ, MU_TASKS_RESULTS=''),
+            pytest.raises(RuntimeError, match='Task results need MU_TASKS_RESULTS'),
+        ):
+            tasks.chord([warp_factor.s(1)], warp_total.s()).invoke()
+
+    def test_chain_payload(self, m_invoke):
+        m_invoke.return_value = invoke_resp()
+
+        with mock.patch.dict(environ, MU_TASKS_BACKEND='lambda', MU_TASKS_RESULTS=''):
+            handle = tasks.chain(warp_factor.s(2), warp_factor.s(boost=3)).invoke()
+            event = json.loads(m_invoke.call_args.kwargs['Payload'])
+            assert event['task-links'] == [
+                {
+                    'task-path': 'mu_tests.test_tasks:warp_factor',
+                    'args': [],
+                    'kwargs': {'boost': 3},
+                    'id': handle.id,
+                },
+            ]
+
+            # The lambda running the first task invokes the next one
+            assert tasks.call_task(event) == 2
+
+        event = json.loads(m_invoke.call_args.kwargs['Payload'])
+        assert event['task-path'] == 'mu_tests.test_tasks:warp_factor'
+        # Links are sent with tagged JSON so any result round trips
+        assert event['task-enc'] == 'zjson1'
+        assert tasks.payload_args(event) == ([2], {'boost': 3})
+
+
+class TestLocalBackend:
+    @pytest.fixture(autouse=True)
+    def thread_backend(self):
+        local_calls.clear()
+        with mock.patch.dict(environ, MU_TASKS_BACKEND='thread', MU_TASKS_WORKERS='2'):
+            yield
+            tasks.local_shutdown()
+
+    def test_invoke(self, logs):
+        with mock_patch_obj(tasks, 'client') as m_client:
+            handle = enterprise_local.invoke('a', arg2=dt.date(2026, 5, 19))
+            tasks.local_shutdown()
+
+        m_client.assert_not_called()
+        assert len(handle.id) == 32
+        assert handle.request_id is None
+        # Same serialization as a lambda invoke
+        assert local_calls == [('a', '2026-05-19')]
+        assert (
+            'Async task submitted: thread -> mu_tests.test_tasks:enterprise_local;'
+            f' Task ID: {handle.id}'
+        ) in logs.messages
+
+    def test_invoke_many(self, logs):
+        results = enterprise_local.invoke_many([(('a',), {'arg2': 1}), (('boom',), {'arg2': 2})])
+        tasks.local_shutdown()
+
+        assert all(result.rec for result in results)
+        assert local_calls == [('a', 1)]
+        assert 'Local task failed: mu_tests.test_tasks:enterprise_local' in logs.messages
+
+    @mock.patch.dict(environ, MU_TASKS_BACKEND='warp')
+    def test_invalid_backend(self):
+        with pytest.raises(ValueError, match='MU_TASKS_BACKEND should be one of'):
+            enterprise_local.invoke('a', arg2=1)
+
+
+class TestCallTask:
+    def test_call(self, logs):
+        result = tasks.call_task(
+            {
+                'task-path': 'mu_tests.test_tasks:enterprise_e',
+                'args': ['a'],
+                'kwargs': {'arg2': 'b'},
+            },
+        )
+        assert result == ('ncc-1701-e', 'a', 'b')
+        assert logs.messages == ['Task called: mu_tests.test_tasks:enterprise_e']
+
+    def test_lazy_import(self):
+        task_path = 'mu_tests.data.lazy_tasks:warp_speed'
+        with mock.patch.dict(sys.modules), mock.patch.dict(tasks._registry):
+            sys.modules.pop('mu_tests.data.lazy_tasks', None)
+            assert task_path not in tasks._registry
+
+            event = {'task-path': task_path, 'args': [9], 'kwargs': {}}
+            assert tasks.call_task(event) == 'warp 9'
+            assert task_path in tasks._registry
+
+    def test_not_registered(self):
+        event = {'task-path': 'mu_tests.test_tasks:enterprise_d', 'args': [], 'kwargs': {}}
+        with pytest.raises(tasks.TaskNotRegistered, match='enterprise_d'):
+            tasks.call_task(event)
+
+    def test_not_registered_builtin(self):
+        event = {'task-path': 'os:system', 'args': ['echo'], 'kwargs': {}}
+        with pytest.raises(tasks.TaskNotRegistered, match='os:system'):
+            tasks.call_task(event)
 
 
 class TestTask:
@@ -108,3 +805,11 @@ class TestTask:
             InvocationType='Event',
             Payload=payload,
         )
+
+    def test_decorator_invoke_many(self, m_invoke):
+        m_invoke.return_value = invoke_resp()
+
+        results = enterprise_e.invoke_many([(('a',), {'arg2': 'b'}), (('c',), {'arg2': 'd'})])
+
+        assert [result.rec.request_id for result in results] == ['abc-123', 'abc-123']
+        assert m_invoke.call_count == 2